@@ -0,0 +1,169 @@
+import json
+import os
+import threading
+import time
+
+from collections import OrderedDict, namedtuple
+from shutil import rmtree
+from typing import Dict, Optional
+from urllib.parse import quote, unquote
+
+import supervisely as sly
+
+# Entry of the cache: updated_at of the annotation, path to the file, size of the file
+# in bytes and the time when the entry was stored.
+CacheEntry = namedtuple("CacheEntry", ["updated_at", "path", "size", "stored_at"])
+
+
+class AnnotationCache:
+    """Disk-backed cache of the annotation JSONs, keyed by image ID and updated_at of the
+    annotation. Annotations are stored while filtering images on comparison and are read on
+    upload instead of downloading them again. If the total size of the cached files exceeds
+    the limit, least recently used entries are evicted. updated_at is stored in the names of
+    the files, so the entries are restored from the directory after the restart.
+
+    :param directory: path to the directory where annotation files will be stored
+    :type directory: str
+    :param max_bytes: maximum total size of the cached files in bytes
+    :type max_bytes: int
+    :param ttl: time in seconds after which the entry is considered stale
+    :type ttl: int
+    """
+
+    def __init__(self, directory: str, max_bytes: int, ttl: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+
+        self._entries: Dict[int, CacheEntry] = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        """Restores the entries from the files in the directory, older files are evicted first.
+        Stale files and files with unknown names are removed."""
+        entries = []
+        for filename in os.listdir(self.directory):
+            path = os.path.join(self.directory, filename)
+            image_id, _, updated_at = filename[: -len(".json")].partition("@")
+            if not filename.endswith(".json") or not image_id.isdigit():
+                sly.logger.debug(f"Removing unknown file {filename} from annotation cache.")
+                self._unlink(path)
+                continue
+
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+
+            if time.time() - stat.st_mtime > self.ttl:
+                self._unlink(path)
+                continue
+
+            entry = CacheEntry(unquote(updated_at) or None, path, stat.st_size, stat.st_mtime)
+            entries.append((int(image_id), entry))
+
+        for image_id, entry in sorted(entries, key=lambda item: item[1].stored_at):
+            # Only the latest file of the image is kept.
+            self._remove(image_id)
+            self._entries[image_id] = entry
+            self._total_bytes += entry.size
+
+        while self._total_bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+
+        sly.logger.debug(f"Restored {len(self._entries)} annotations in the cache.")
+
+    def put(self, image_id: int, updated_at: str, annotation: dict):
+        """Stores annotation JSON in the cache, evicting least recently used entries
+        if the size limit is exceeded.
+
+        :param image_id: ID of the image in the source instance
+        :type image_id: int
+        :param updated_at: updated_at field of the image
+        :type updated_at: str
+        :param annotation: annotation JSON
+        :type annotation: dict
+        """
+        data = json.dumps(annotation, ensure_ascii=False).encode("utf-8")
+        if len(data) > self.max_bytes:
+            return
+
+        filename = f"{image_id}@{quote(updated_at or '', safe='')}.json"
+        path = os.path.join(self.directory, filename)
+        with open(path, "wb") as f:
+            f.write(data)
+
+        with self._lock:
+            entry = self._entries.get(image_id)
+            self._remove(image_id, delete_file=entry is not None and entry.path != path)
+            self._entries[image_id] = CacheEntry(updated_at, path, len(data), time.time())
+            self._total_bytes += len(data)
+
+            while self._total_bytes > self.max_bytes:
+                evicted_id = next(iter(self._entries))
+                self._remove(evicted_id)
+                sly.logger.debug(f"Evicted annotation of image {evicted_id} from cache.")
+
+    def get(self, image_id: int, updated_at: Optional[str] = None) -> Optional[dict]:
+        """Returns annotation JSON from the cache or None if the entry is missing, stale
+        (older than TTL or updated_at doesn't match) or the file can't be read.
+
+        :param image_id: ID of the image in the source instance
+        :type image_id: int
+        :param updated_at: updated_at field of the image, if known
+        :type updated_at: Optional[str]
+        :return: annotation JSON or None
+        :rtype: Optional[dict]
+        """
+        with self._lock:
+            entry = self._entries.get(image_id)
+            if entry is None:
+                return
+
+            is_stale = time.time() - entry.stored_at > self.ttl
+            if updated_at is not None and entry.updated_at != updated_at:
+                is_stale = True
+
+            if is_stale:
+                self._remove(image_id)
+                return
+
+            # Marking entry as recently used.
+            self._entries.move_to_end(image_id)
+
+        try:
+            with open(entry.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            sly.logger.warning(f"Can't read cached annotation of image {image_id}.")
+            with self._lock:
+                self._remove(image_id)
+
+    def clear(self):
+        """Removes all entries and files from the cache."""
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+            rmtree(self.directory, ignore_errors=True)
+            os.makedirs(self.directory, exist_ok=True)
+
+    def _remove(self, image_id: int, delete_file: bool = True):
+        """Removes the entry from the cache, should be called under the lock."""
+        entry = self._entries.pop(image_id, None)
+        if entry is None:
+            return
+        self._total_bytes -= entry.size
+        if delete_file:
+            self._unlink(entry.path)
+
+    @staticmethod
+    def _unlink(path: str):
+        """Removes the file, if it exists."""
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,195 @@
+import multiprocessing
+import threading
+
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, repeat
+from typing import Dict, List, Optional, Tuple
+
+import supervisely as sly
+
+# Pool of processes for the validation of annotations, it's created on the first use.
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+# Parsed project metas in the worker process, keyed by the meta fingerprint,
+# so the meta is parsed once per process and not for each chunk.
+_worker_metas: Dict[str, sly.ProjectMeta] = {}
+
+
+def meta_ids(meta_json: dict) -> Tuple[Dict[str, int], Dict[str, int]]:
+    """Returns IDs of the classes and tags of the project meta, mapped to their names.
+
+    :param meta_json: project meta JSON with IDs (as it was received from the instance)
+    :type meta_json: dict
+    :return: IDs of the classes mapped to the class titles and IDs of the tags mapped to the tag names
+    :rtype: Tuple[Dict[str, int], Dict[str, int]]
+    """
+    class_ids = {
+        obj_class["title"]: obj_class["id"]
+        for obj_class in meta_json.get("classes", [])
+        if "id" in obj_class
+    }
+    tag_ids = {
+        tag_meta["name"]: tag_meta["id"]
+        for tag_meta in meta_json.get("tags", [])
+        if "id" in tag_meta
+    }
+    return class_ids, tag_ids
+
+
+def remap_annotation(
+    annotation: dict, class_ids: Dict[str, int], tag_ids: Dict[str, int]
+) -> dict:
+    """Replaces IDs of the classes and tags in the annotation JSON with the IDs from the target
+    project meta. Geometries are not decoded, only the dicts of objects and tags are copied.
+    If the class or tag is missing in the target meta, its ID is removed and the server
+    resolves it by the name.
+
+    :param annotation: annotation JSON from the source instance
+    :type annotation: dict
+    :param class_ids: IDs of the classes in the target meta, mapped to the class titles
+    :type class_ids: Dict[str, int]
+    :param tag_ids: IDs of the tags in the target meta, mapped to the tag names
+    :type tag_ids: Dict[str, int]
+    :return: annotation JSON for the target instance
+    :rtype: dict
+    """
+    remapped = dict(annotation)
+    remapped["tags"] = [remap_tag(tag, tag_ids) for tag in annotation.get("tags", [])]
+    remapped["objects"] = [
+        remap_object(obj, class_ids, tag_ids) for obj in annotation.get("objects", [])
+    ]
+    return remapped
+
+
+def remap_object(obj: dict, class_ids: Dict[str, int], tag_ids: Dict[str, int]) -> dict:
+    """Replaces IDs of the class and tags of the object, IDs of the source object is removed."""
+    remapped = {key: value for key, value in obj.items() if key not in ("id", "classId")}
+    class_id = class_ids.get(obj.get("classTitle"))
+    if class_id is not None:
+        remapped["classId"] = class_id
+    remapped["tags"] = [remap_tag(tag, tag_ids) for tag in obj.get("tags", [])]
+    return remapped
+
+
+def remap_tag(tag: dict, tag_ids: Dict[str, int]) -> dict:
+    """Replaces ID of the tag meta, ID of the source tag is removed."""
+    remapped = {key: value for key, value in tag.items() if key not in ("id", "tagId")}
+    tag_id = tag_ids.get(tag.get("name"))
+    if tag_id is not None:
+        remapped["tagId"] = tag_id
+    return remapped
+
+
+def validate_annotations(
+    annotation_jsons: List[Optional[dict]],
+    meta_json: dict,
+    meta_key: Optional[str] = None,
+) -> List[Optional[dict]]:
+    """Builds full Annotation objects to validate the annotation JSONs against the project
+    meta and returns normalized JSONs. Invalid annotations are returned as None.
+    Function is picklable, so it can be called in the worker process.
+
+    :param annotation_jsons: annotation JSONs, None for the missing annotations
+    :type annotation_jsons: List[Optional[dict]]
+    :param meta_json: project meta JSON of the source project
+    :type meta_json: dict
+    :param meta_key: fingerprint of the meta, if set the parsed meta is reused between calls
+    :type meta_key: Optional[str]
+    :return: normalized annotation JSONs, None for the missing and invalid annotations
+    :rtype: List[Optional[dict]]
+    """
+    if meta_key is None:
+        project_meta = sly.ProjectMeta.from_json(meta_json)
+    else:
+        project_meta = _worker_metas.get(meta_key)
+        if project_meta is None:
+            project_meta = sly.ProjectMeta.from_json(meta_json)
+            _worker_metas[meta_key] = project_meta
+
+    validated = []
+    for annotation_json in annotation_jsons:
+        if annotation_json is None:
+            validated.append(None)
+            continue
+        try:
+            annotation = sly.Annotation.from_json(annotation_json, project_meta)
+        except Exception as e:
+            sly.logger.error(f"Annotation is not valid for the project meta: {e}")
+            validated.append(None)
+            continue
+        validated.append(annotation.to_json())
+    return validated
+
+
+def validate_annotations_in_pool(
+    annotation_jsons: List[Optional[dict]],
+    meta_json: dict,
+    meta_key: str,
+    workers: int,
+    chunk_size: int,
+) -> List[Optional[dict]]:
+    """Validates annotation JSONs in the pool of processes, so the validation of the heavy
+    annotations (e.g. bitmaps) is not limited by GIL. Annotations are split into chunks,
+    which are validated in parallel, results are returned in the order of the annotations.
+
+    :param annotation_jsons: annotation JSONs, None for the missing annotations
+    :type annotation_jsons: List[Optional[dict]]
+    :param meta_json: project meta JSON of the source project
+    :type meta_json: dict
+    :param meta_key: fingerprint of the meta, used to cache the parsed meta in the workers
+    :type meta_key: str
+    :param workers: number of worker processes
+    :type workers: int
+    :param chunk_size: number of annotations in one work unit
+    :type chunk_size: int
+    :return: normalized annotation JSONs, None for the missing and invalid annotations
+    :rtype: List[Optional[dict]]
+    """
+    chunks = [
+        annotation_jsons[idx : idx + chunk_size]
+        for idx in range(0, len(annotation_jsons), chunk_size)
+    ]
+    if len(chunks) <= 1:
+        # Sending one chunk to the process is slower than validating it in place.
+        return validate_annotations(annotation_jsons, meta_json, meta_key)
+
+    pool = get_validation_pool(workers)
+    results = pool.map(validate_annotations, chunks, repeat(meta_json), repeat(meta_key))
+
+    return list(chain.from_iterable(results))
+
+
+def get_validation_pool(workers: int) -> ProcessPoolExecutor:
+    """Returns the pool of processes for the validation, creates it on the first call.
+    Processes are spawned instead of forked, since the app runs many threads.
+
+    :param workers: number of worker processes
+    :type workers: int
+    :return: pool of processes
+    :rtype: ProcessPoolExecutor
+    """
+    global _pool, _pool_workers
+
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            )
+            _pool_workers = workers
+            sly.logger.debug(f"Started pool of {workers} processes for the validation.")
+        return _pool
+
+
+def shutdown_validation_pool():
+    """Stops the processes of the validation pool, if it was started."""
+    global _pool
+
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
+            sly.logger.debug("Pool of processes for the validation is stopped.")
@@ -0,0 +1,313 @@
+import functools
+import os
+import threading
+import time
+
+from concurrent.futures import Future
+from typing import Callable, Dict, Optional, Tuple
+
+import requests
+import supervisely as sly
+
+from requests.adapters import HTTPAdapter
+from supervisely.io.network_exceptions import process_requests_exception
+
+from src.batching import inside_batch_call
+
+# Read methods of sly.Api, which results are cached for a short time: information about
+# entities by their IDs doesn't change while the app works with them.
+CACHED_METHODS = [
+    ("workspace", "get_info_by_id"),
+    ("project", "get_info_by_id"),
+    ("dataset", "get_info_by_id"),
+    ("image", "get_info_by_id"),
+]
+
+
+class ThreadSessions:
+    """HTTP sessions of the threads: each thread sends requests through its own session,
+    so it reuses its connections (and TLS handshakes) instead of opening a new connection
+    for each request.
+
+    :param pool_size: maximum number of connections to one host in the session
+    :type pool_size: int
+    """
+
+    def __init__(self, pool_size: int):
+        self.pool_size = pool_size
+        self._local = threading.local()
+
+    def session(self) -> requests.Session:
+        """Returns the session of the current thread, creates it on the first call."""
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            # Retries are done by the API object and by the batch controllers.
+            adapter = HTTPAdapter(
+                pool_connections=self.pool_size, pool_maxsize=self.pool_size, max_retries=0
+            )
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            self._local.session = session
+            sly.logger.debug(
+                f"Created HTTP session for thread {threading.current_thread().name}."
+            )
+        return session
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        return self.session().request(method, url, **kwargs)
+
+
+class SessionApi(sly.Api):
+    """sly.Api, which sends requests through its own sessions of the threads. Sessions belong
+    to the API object, so other API objects and the requests module are not affected.
+    Requests are retried and errors are raised in the same way as in sly.Api.
+
+    :param pool_size: maximum number of connections to one host in the session of the thread
+    :type pool_size: int
+    """
+
+    def __init__(self, *args, pool_size: int = 32, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.sessions = ThreadSessions(pool_size)
+
+    def post(
+        self,
+        method: str,
+        data,
+        retries: Optional[int] = None,
+        stream: bool = False,
+        raise_error: bool = False,
+    ) -> requests.Response:
+        """Sends POST request to the API method, same as sly.Api.post."""
+        url = f"{self.server_address}/public/api/v3/{method}"
+        headers = self.headers
+        if isinstance(data, bytes):
+            kwargs = {"data": data}
+        elif hasattr(data, "content_type"):
+            # Multipart encoder of the uploaded files.
+            kwargs = {"data": data}
+            headers = {**self.headers, "Content-Type": data.content_type}
+        elif isinstance(data, dict):
+            kwargs = {"json": {**data, **self.additional_fields}}
+        else:
+            kwargs = {"json": data}
+        return self._send(
+            "POST", method, url, retries, raise_error, headers=headers, stream=stream, **kwargs
+        )
+
+    def get(
+        self,
+        method: str,
+        params,
+        retries: Optional[int] = None,
+        stream: bool = False,
+        use_public_api: bool = True,
+    ) -> requests.Response:
+        """Sends GET request to the API method, same as sly.Api.get."""
+        if use_public_api:
+            url = f"{self.server_address}/public/api/v3/{method}"
+        else:
+            url = os.path.join(self.server_address, method)
+        if isinstance(params, dict):
+            params = {**params, **self.additional_fields}
+        return self._send(
+            "GET",
+            method,
+            url,
+            retries,
+            False,
+            headers=self.headers,
+            stream=stream,
+            params=params,
+        )
+
+    def _send(
+        self,
+        http_method: str,
+        method: str,
+        url: str,
+        retries: Optional[int],
+        raise_error: bool,
+        **kwargs,
+    ) -> requests.Response:
+        """Sends the request through the session of the current thread with retries.
+        The error of the last attempt is raised as is, so the callers can check if it's
+        transient. Requests inside the calls of the batch controller are sent once,
+        since the controller retries them itself."""
+        if retries is None:
+            retries = 1 if inside_batch_call() else self.retry_count
+
+        for retry_idx in range(retries):
+            response = None
+            try:
+                response = self.sessions.request(http_method, url, **kwargs)
+                if response.status_code != requests.codes.ok:
+                    sly.Api._raise_for_status(response)
+                return response
+            except requests.exceptions.RequestException as exc:
+                if raise_error or retry_idx == retries - 1:
+                    raise
+                process_requests_exception(
+                    sly.logger,
+                    exc,
+                    method,
+                    url,
+                    verbose=True,
+                    swallow_exc=True,
+                    sleep_sec=min(self.retry_sleep_sec * (2**retry_idx), 60),
+                    response=response,
+                    retry_info={"retry_idx": retry_idx + 1, "retry_limit": retries},
+                )
+
+        raise requests.exceptions.RetryError(f"Retry limit exceeded ({url!r})")
+
+
+class CoalescingCache:
+    """Thread-safe cache of the results of the read calls with a short time to live.
+    Identical calls, which are made at the same time, are merged into one network call:
+    the first thread sends the request and the others wait for its result.
+    Errors are not cached, each waiting thread receives the error of the call.
+    Expired results are removed, when they are read or when the cache is full.
+
+    :param ttl: time in seconds for which the results are kept
+    :type ttl: float
+    :param max_size: maximum number of the cached results, the oldest ones are removed first
+    :type max_size: int
+    """
+
+    def __init__(self, ttl: float, max_size: int = 10000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.calls = 0
+
+        self._results: Dict[Tuple, Tuple[float, object]] = {}
+        self._pending: Dict[Tuple, Future] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple, load: Callable[[], object]):
+        """Returns the cached result for the key, calls the function if it's not cached yet,
+        or waits for the result of the same call from another thread.
+
+        :param key: hashable key of the call
+        :type key: Tuple
+        :param load: function which makes the call
+        :type load: Callable[[], object]
+        :return: result of the call
+        """
+        with self._lock:
+            cached = self._results.get(key)
+            if cached is not None:
+                if time.monotonic() - cached[0] < self.ttl:
+                    self.hits += 1
+                    return cached[1]
+                del self._results[key]
+
+            future = self._pending.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._pending[key] = future
+                self.calls += 1
+            else:
+                self.hits += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = load()
+        except Exception as e:
+            with self._lock:
+                self._pending.pop(key, None)
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            self._results[key] = (time.monotonic(), result)
+            self._pending.pop(key, None)
+            if len(self._results) > self.max_size:
+                self._evict()
+        future.set_result(result)
+        return result
+
+    def _evict(self):
+        """Removes expired results and the oldest results over the size limit,
+        should be called under the lock."""
+        now = time.monotonic()
+        expired = [
+            key
+            for key, (stored_at, _) in self._results.items()
+            if now - stored_at >= self.ttl
+        ]
+        for key in expired:
+            del self._results[key]
+
+        # Results are stored in the order of the calls, so the first ones are the oldest.
+        while len(self._results) > self.max_size:
+            del self._results[next(iter(self._results))]
+
+    def clear(self):
+        """Removes all cached results."""
+        with self._lock:
+            self._results.clear()
+
+
+def cache_read_methods(api: sly.Api, cache: CoalescingCache):
+    """Wraps the read methods of the API object from CACHED_METHODS with the cache.
+
+    :param api: API object
+    :type api: sly.Api
+    :param cache: cache for the results of the calls
+    :type cache: CoalescingCache
+    """
+    for entity, method_name in CACHED_METHODS:
+        entity_api = getattr(api, entity)
+        method = getattr(entity_api, method_name)
+
+        def cached(*args, _method=method, _key=(entity, method_name), **kwargs):
+            key = (api.server_address, *_key, args, tuple(sorted(kwargs.items())))
+            return cache.get(key, lambda: _method(*args, **kwargs))
+
+        setattr(entity_api, method_name, functools.wraps(method)(cached))
+
+
+def create_api(
+    server_address: Optional[str] = None,
+    token: Optional[str] = None,
+    pool_size: int = 32,
+    cache_ttl: float = 30,
+    cache_size: int = 10000,
+    **kwargs,
+) -> sly.Api:
+    """Creates API object, which sends requests through its sessions of the threads and
+    caches the results of the read calls. If the address and token are not set,
+    they are loaded from the environment.
+
+    :param server_address: address of the instance
+    :type server_address: Optional[str]
+    :param token: API token
+    :type token: Optional[str]
+    :param pool_size: maximum number of connections to one host in the session of the thread
+    :type pool_size: int
+    :param cache_ttl: time in seconds for which the results of the read calls are kept
+    :type cache_ttl: float
+    :param cache_size: maximum number of the cached results of the read calls
+    :type cache_size: int
+    :return: API object
+    :rtype: sly.Api
+    """
+    if server_address is None and token is None:
+        api = SessionApi.from_env(**kwargs)
+        # from_env doesn't pass the pool size to the constructor.
+        api.sessions = ThreadSessions(pool_size)
+    else:
+        api = SessionApi(
+            server_address=server_address, token=token, pool_size=pool_size, **kwargs
+        )
+
+    if cache_ttl > 0:
+        cache_read_methods(api, CoalescingCache(cache_ttl, cache_size))
+
+    return api
@@ -0,0 +1,351 @@
+import asyncio
+import io
+import json
+import threading
+
+from typing import List, Optional, Union
+
+import requests
+import supervisely as sly
+
+from supervisely.api.module_api import ApiField
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+# Event loop, which sends requests of all clients, it runs in the background thread
+# and is started on the first request.
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+# Number of annotations in one request to the bulk endpoints.
+ANNOTATIONS_CHUNK_SIZE = 50
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """Returns the shared event loop, starts it in the background thread on the first call.
+
+    :return: running event loop
+    :rtype: asyncio.AbstractEventLoop
+    """
+    global _loop
+
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            thread = threading.Thread(
+                target=_loop.run_forever, name="async-api", daemon=True
+            )
+            thread.start()
+            sly.logger.debug("Started event loop for the asynchronous API requests.")
+        return _loop
+
+
+class AsyncApi:
+    """Asynchronous client for the endpoints, which are called most often by the app: listing of
+    the images, download of annotations and images, upload of images and annotations.
+    Requests of all threads are sent from one event loop, connections to the instance are kept
+    alive in the pool and the number of simultaneous requests to the host is limited, so one
+    batch is sent as many parallel requests without a thread for each of them.
+    Methods are blocking, so they can be called from the threads of the pipeline, and raise
+    the same exceptions as sly.Api, so the batch controllers can retry them.
+    If aiohttp is not installed or the client is disabled, blocking sly.Api calls are used.
+
+    :param api: API object for the instance, its address and headers are used
+    :type api: sly.Api
+    :param connections: maximum number of simultaneous requests to the instance
+    :type connections: int
+    :param timeout: timeout of one request in seconds
+    :type timeout: float
+    :param enabled: if False, blocking sly.Api calls are used
+    :type enabled: bool
+    """
+
+    def __init__(
+        self,
+        api: sly.Api,
+        connections: int = 100,
+        timeout: float = 300,
+        enabled: bool = True,
+    ):
+        self.api = api
+        self.connections = connections
+        self.timeout = timeout
+        self.enabled = enabled and aiohttp is not None
+
+        if enabled and aiohttp is None:
+            sly.logger.warning(
+                "aiohttp is not installed, blocking API requests will be used instead."
+            )
+
+        self._session = None
+
+    def list_images(self, dataset_id: int) -> List[sly.ImageInfo]:
+        """Returns the list of images in the dataset, all pages are requested at the same time.
+
+        :param dataset_id: ID of the dataset
+        :type dataset_id: int
+        :return: list of objects with information about images
+        :rtype: List[sly.ImageInfo]
+        """
+        if not self.enabled:
+            return self.api.image.get_list(dataset_id)
+
+        async def list_pages():
+            data = {"datasetId": dataset_id, "sort": "id", "sort_order": "asc"}
+            first_page = await self._post("images.list", {**data, "page": 1})
+            pages = [first_page] + await asyncio.gather(
+                *[
+                    self._post("images.list", {**data, "page": page})
+                    for page in range(2, first_page["pagesCount"] + 1)
+                ]
+            )
+            entities = [entity for page in pages for entity in page["entities"]]
+            return first_page["total"], entities
+
+        total, entities = self._run(list_pages())
+        if len(entities) != total:
+            # Pages were shifted by the images, which were added or removed during the listing.
+            sly.logger.warning(
+                f"Listed {len(entities)} images of {total} in dataset {dataset_id}, "
+                "the dataset is listed again page by page."
+            )
+            return self.api.image.get_list(dataset_id)
+        return [self.api.image._convert_json_info(entity) for entity in entities]
+
+    def download_annotations(
+        self, dataset_id: int, image_ids: List[int]
+    ) -> List[sly.api.annotation_api.AnnotationInfo]:
+        """Downloads annotations of the images, chunks of annotations are requested at the same time.
+
+        :param dataset_id: ID of the dataset
+        :type dataset_id: int
+        :param image_ids: IDs of the images
+        :type image_ids: List[int]
+        :return: list of objects with annotations
+        :rtype: List[sly.api.annotation_api.AnnotationInfo]
+        """
+        if not self.enabled:
+            return self.api.annotation.download_batch(dataset_id, image_ids)
+
+        # Same payload as in download_batch with its default arguments.
+        data = {
+            ApiField.DATASET_ID: dataset_id,
+            ApiField.WITH_CUSTOM_DATA: False,
+            ApiField.FORCE_METADATA_FOR_LINKS: True,
+        }
+        chunks = sly.batched(image_ids, batch_size=ANNOTATIONS_CHUNK_SIZE)
+        responses = self._run_all(
+            [
+                self._post("annotations.bulk.info", {**data, ApiField.IMAGE_IDS: chunk_ids})
+                for chunk_ids in chunks
+            ]
+        )
+        return [
+            self.api.annotation._convert_json_info(info)
+            for response in responses
+            for info in response
+        ]
+
+    def download_images(self, dataset_id: int, image_ids: List[int]) -> List[bytes]:
+        """Downloads bytes of the images, each image is requested separately and all requests
+        are sent at the same time.
+
+        :param dataset_id: ID of the dataset (used by the blocking fallback)
+        :type dataset_id: int
+        :param image_ids: IDs of the images
+        :type image_ids: List[int]
+        :return: bytes of the images in the order of IDs
+        :rtype: List[bytes]
+        """
+        if not self.enabled:
+            return self.api.image.download_bytes(dataset_id, image_ids)
+
+        return self._run_all(
+            [self._post("images.download", {"id": image_id}, raw=True) for image_id in image_ids]
+        )
+
+    def upload_images(
+        self,
+        dataset_id: int,
+        names: List[str],
+        images_bytes: List[bytes],
+        hashes: List[str],
+        metas: List[dict],
+    ) -> List[sly.ImageInfo]:
+        """Uploads bytes of the images to the instance and adds them to the dataset by hashes.
+
+        :param dataset_id: ID of the dataset
+        :type dataset_id: int
+        :param names: names of the images
+        :type names: List[str]
+        :param images_bytes: bytes of the images
+        :type images_bytes: List[bytes]
+        :param hashes: hashes of the images
+        :type hashes: List[str]
+        :param metas: metas of the images
+        :type metas: List[dict]
+        :return: list of objects with information about uploaded images in the order of names,
+            None for the images which failed to upload or were not added to the dataset
+        :rtype: List[Optional[sly.ImageInfo]]
+        """
+        if not self.enabled:
+            self.api.image._upload_data_bulk(io.BytesIO, zip(images_bytes, hashes))
+            return self.api.image.upload_hashes(dataset_id, names, hashes, metas=metas)
+
+        async def upload():
+            form = aiohttp.FormData()
+            for idx, image_bytes in enumerate(images_bytes):
+                form.add_field(
+                    f"{idx}-file",
+                    image_bytes,
+                    filename=str(idx),
+                    content_type="image/*",
+                )
+            results = await self._post("images.bulk.upload", form)
+
+            # Images which failed to upload are not added to the dataset.
+            uploaded = [
+                idx
+                for idx, result in enumerate(results)
+                if "hash" in result and not result.get("errors")
+            ]
+            if not uploaded:
+                return []
+
+            images = [
+                {"title": names[idx], "hash": hashes[idx], "meta": metas[idx] or {}}
+                for idx in uploaded
+            ]
+            return await self._post(
+                "images.bulk.add", {"datasetId": dataset_id, "images": images}
+            )
+
+        infos = [self.api.image._convert_json_info(info) for info in self._run(upload())]
+        # Server doesn't guarantee the order of the images, so they are sorted by names.
+        infos_by_name = {info.name: info for info in infos}
+        missing_names = [name for name in names if name not in infos_by_name]
+        if missing_names:
+            sly.logger.warning(
+                f"Images {missing_names} failed to upload to dataset {dataset_id}."
+            )
+        return [infos_by_name.get(name) for name in names]
+
+    def upload_annotations(
+        self, dataset_id: int, image_ids: List[int], annotations: List[dict]
+    ):
+        """Uploads annotation JSONs for the images, chunks are sent at the same time.
+
+        :param dataset_id: ID of the dataset
+        :type dataset_id: int
+        :param image_ids: IDs of the images in the dataset
+        :type image_ids: List[int]
+        :param annotations: annotation JSONs in the order of the image IDs
+        :type annotations: List[dict]
+        """
+        if not self.enabled:
+            self.api.annotation.upload_jsons(image_ids, annotations)
+            return
+
+        items = [
+            {"imageId": image_id, "annotation": annotation}
+            for image_id, annotation in zip(image_ids, annotations)
+        ]
+        self._run_all(
+            [
+                self._post("annotations.bulk.add", {"datasetId": dataset_id, "annotations": chunk})
+                for chunk in sly.batched(items, batch_size=ANNOTATIONS_CHUNK_SIZE)
+            ]
+        )
+
+    def close(self):
+        """Closes the pool of connections."""
+        if self._session is not None:
+            self._run(self._session.close())
+            self._session = None
+
+    def _run(self, coroutine):
+        """Runs the coroutine in the shared event loop and waits for the result."""
+        return asyncio.run_coroutine_threadsafe(coroutine, get_loop()).result()
+
+    def _run_all(self, coroutines: list) -> list:
+        """Runs the coroutines at the same time in the shared event loop and waits for all
+        results. If any request fails, the first error is raised."""
+
+        async def gather():
+            return await asyncio.gather(*coroutines)
+
+        return self._run(gather())
+
+    async def _get_session(self) -> "aiohttp.ClientSession":
+        """Returns the session, creates it in the event loop on the first call."""
+        if self._session is None:
+            connector = aiohttp.TCPConnector(
+                limit=self.connections, limit_per_host=self.connections
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                headers=self.api.headers,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+            sly.logger.debug(
+                f"Opened pool of {self.connections} connections to {self.api.server_address}."
+            )
+        return self._session
+
+    async def _post(
+        self, method: str, data: Union[dict, "aiohttp.FormData"], raw: bool = False
+    ) -> Union[dict, list, bytes]:
+        """Sends POST request to the API method, raises exceptions of requests library,
+        so errors are handled the same way as errors of sly.Api.
+
+        :param method: name of the API method, e.g. "images.list"
+        :type method: str
+        :param data: JSON body or multipart form of the request
+        :type data: Union[dict, aiohttp.FormData]
+        :param raw: if True, bytes of the response are returned instead of JSON
+        :type raw: bool
+        :return: JSON or bytes of the response
+        :rtype: Union[dict, list, bytes]
+        """
+        session = await self._get_session()
+        url = f"{self.api.server_address.rstrip('/')}/public/api/v3/{method}"
+        kwargs = {"json": data} if isinstance(data, dict) else {"data": data}
+
+        try:
+            async with session.post(url, **kwargs) as response:
+                content = await response.read()
+                status = response.status
+        except asyncio.TimeoutError as e:
+            raise requests.exceptions.Timeout(f"Request to {url} timed out.") from e
+        except aiohttp.ClientConnectionError as e:
+            raise requests.exceptions.ConnectionError(str(e)) from e
+
+        if status >= 400:
+            raise http_error(url, status, content)
+
+        return content if raw else json.loads(content)
+
+
+def http_error(url: str, status: int, content: bytes) -> requests.exceptions.HTTPError:
+    """Builds HTTPError of requests library for the failed response, so it's checked
+    the same way as errors of sly.Api.
+
+    :param url: URL of the request
+    :type url: str
+    :param status: HTTP status code of the response
+    :type status: int
+    :param content: body of the response
+    :type content: bytes
+    :return: error with the response
+    :rtype: requests.exceptions.HTTPError
+    """
+    response = requests.Response()
+    response.status_code = status
+    response.url = url
+    response._content = content
+    return requests.exceptions.HTTPError(
+        f"{status} Error for url {url}: {content[:500]!r}", response=response
+    )
@@ -0,0 +1,301 @@
+import random
+import threading
+import time
+
+from typing import Callable, List, Optional
+
+import requests
+import supervisely as sly
+
+# HTTP status codes of the errors which are worth retrying.
+TRANSIENT_STATUS_CODES = [408, 429, 500, 502, 503, 504]
+
+# HTTP status codes of the errors which mean that the request is too large.
+SIZE_STATUS_CODES = [413]
+
+# State of the thread: True while the thread calls the function of the batch controller.
+_local = threading.local()
+
+
+def inside_batch_call() -> bool:
+    """Checks if the current thread calls the function of the batch controller. Such calls
+    are retried by the controller, so the API client should send the request only once.
+
+    :return: True if the thread is inside the call of the batch controller
+    :rtype: bool
+    """
+    return getattr(_local, "inside_call", False)
+
+
+def is_transient(error: Exception) -> bool:
+    """Checks if the error is transient (timeout, connection error, rate limit or server error),
+    so the request can be retried.
+
+    :param error: exception raised by the request
+    :type error: Exception
+    :return: True if the request can be retried, False otherwise
+    :rtype: bool
+    """
+    if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+        return True
+    if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+        return error.response.status_code in TRANSIENT_STATUS_CODES
+    return False
+
+
+def is_size_error(error: Exception) -> bool:
+    """Checks if the request failed because its payload is too large, so the smaller batch
+    can succeed.
+
+    :param error: exception raised by the request
+    :type error: Exception
+    :return: True if the payload of the request was too large, False otherwise
+    :rtype: bool
+    """
+    if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+        return error.response.status_code in SIZE_STATUS_CODES
+    return False
+
+
+class BatchController:
+    """Adaptive batch size and retry controller for one API endpoint. Items are sent to the
+    endpoint in batches, the size of the batch is adjusted after each call: it grows while
+    the calls are fast and successful and shrinks when they are slow, too heavy or fail.
+    Failed batches are retried with jittered exponential backoff, if the batch still fails
+    it's split in half to isolate the items which can't be processed. Only errors of the
+    requests are retried, other errors are raised, since they are bugs, not bad items.
+
+    :param name: name of the endpoint (for logging and metrics)
+    :type name: str
+    :param batch_size: initial size of the batch
+    :type batch_size: int
+    :param min_size: minimum size of the batch
+    :type min_size: int
+    :param max_size: maximum size of the batch
+    :type max_size: int
+    :param target_latency: desired duration of one call in seconds
+    :type target_latency: float
+    :param max_bytes: maximum payload of one batch in bytes, if item sizes are known
+    :type max_bytes: int
+    :param retries: number of retries for the failed batch before it's split
+    :type retries: int
+    :param backoff: base delay in seconds for the exponential backoff
+    :type backoff: float
+    """
+
+    def __init__(
+        self,
+        name: str,
+        batch_size: int,
+        min_size: int = 1,
+        max_size: int = 500,
+        target_latency: float = 10.0,
+        max_bytes: int = 256 * 1024 * 1024,
+        retries: int = 3,
+        backoff: float = 1.0,
+    ):
+        self.name = name
+        self.batch_size = batch_size
+        self.min_size = min_size
+        self.max_size = max_size
+        self.target_latency = target_latency
+        self.max_bytes = max_bytes
+        self.retries = retries
+        self.backoff = backoff
+
+        self._lock = threading.Lock()
+        self._metrics = {
+            "calls": 0,
+            "items": 0,
+            "bytes": 0,
+            "errors": 0,
+            "retries": 0,
+            "splits": 0,
+            "failed_items": 0,
+            "latency": 0.0,
+        }
+
+    def run(
+        self,
+        items: list,
+        func: Callable[[list], list],
+        sizes: Optional[List[int]] = None,
+        recover: Optional[Callable[[list], list]] = None,
+    ) -> list:
+        """Processes items with the function in adaptive batches and returns the list of results
+        in the order of the items. Results of the items which failed after all retries and splits
+        are None. Function receives the batch of items and must return the list of results of the
+        same length.
+
+        If the function is not idempotent (e.g. it adds images to the dataset), the failed call
+        could have processed some items. In this case recover function should be passed: it
+        receives the items of the failed batch and returns their results if they were processed,
+        None otherwise. Only the items which were not processed are sent again.
+
+        :param items: items to process
+        :type items: list
+        :param func: function which processes the batch of items
+        :type func: Callable[[list], list]
+        :param sizes: sizes of the items in bytes, used to limit the payload of the batch
+        :type sizes: Optional[List[int]]
+        :param recover: function which returns results of the items processed by the failed call
+        :type recover: Optional[Callable[[list], list]]
+        :return: list of results in the order of the items
+        :rtype: list
+        """
+        if sizes is None:
+            sizes = [0] * len(items)
+
+        results = []
+        start = 0
+        while start < len(items):
+            end = self._batch_end(sizes, start)
+            results.extend(self._call(items[start:end], sizes[start:end], func, recover))
+            start = end
+        return results
+
+    def metrics(self) -> dict:
+        """Returns the current batch size and counters of the controller.
+
+        :return: dict with the metrics of the controller
+        :rtype: dict
+        """
+        with self._lock:
+            return {"endpoint": self.name, "batch_size": self.batch_size, **self._metrics}
+
+    def _batch_end(self, sizes: List[int], start: int) -> int:
+        """Returns the end index of the batch, which starts from the start index."""
+        end = min(start + self.batch_size, len(sizes))
+        payload = 0
+        for idx in range(start, end):
+            payload += sizes[idx] or 0
+            if payload > self.max_bytes and idx > start:
+                return idx
+        return end
+
+    def _call(
+        self,
+        batch: list,
+        sizes: List[int],
+        func: Callable[[list], list],
+        recover: Optional[Callable[[list], list]],
+    ) -> list:
+        """Calls the function with retries, splits the batch in half if it still fails."""
+        results = [None] * len(batch)
+        pending = list(range(len(batch)))
+        last_error = None
+
+        for attempt in range(self.retries + 1):
+            if last_error is not None and recover is not None:
+                pending = self._recover(batch, pending, results, recover)
+                if not pending:
+                    return results
+
+            started = time.monotonic()
+            outer_call = inside_batch_call()
+            _local.inside_call = True
+            try:
+                batch_results = func([batch[idx] for idx in pending])
+            except requests.exceptions.RequestException as e:
+                last_error = e
+                self._on_error(e)
+                if not is_transient(e) or attempt == self.retries:
+                    break
+                delay = self.backoff * 2**attempt * random.uniform(0.5, 1.5)
+                sly.logger.warning(
+                    f"Batch of {len(pending)} items for {self.name} failed: {e}. "
+                    f"Retrying in {delay:.1f} seconds."
+                )
+                with self._lock:
+                    self._metrics["retries"] += 1
+                time.sleep(delay)
+                continue
+            finally:
+                _local.inside_call = outer_call
+
+            payload = sum(sizes[idx] or 0 for idx in pending)
+            self._on_success(len(pending), payload, time.monotonic() - started)
+            for idx, result in zip(pending, batch_results):
+                results[idx] = result
+            return results
+
+        if recover is not None:
+            pending = self._recover(batch, pending, results, recover)
+            if not pending:
+                return results
+
+        if len(pending) == 1:
+            sly.logger.error(f"Item can't be processed by {self.name}: {last_error}.")
+            with self._lock:
+                self._metrics["failed_items"] += 1
+            return results
+
+        # Splitting the batch in half to isolate the items which can't be processed.
+        with self._lock:
+            self._metrics["splits"] += 1
+        middle = len(pending) // 2
+        sly.logger.warning(
+            f"Batch of {len(pending)} items for {self.name} failed, splitting it in half."
+        )
+        for part in (pending[:middle], pending[middle:]):
+            part_results = self._call(
+                [batch[idx] for idx in part], [sizes[idx] for idx in part], func, recover
+            )
+            for idx, result in zip(part, part_results):
+                results[idx] = result
+        return results
+
+    def _recover(
+        self,
+        batch: list,
+        pending: List[int],
+        results: list,
+        recover: Callable[[list], list],
+    ) -> List[int]:
+        """Fills results of the items, which were processed by the failed call, and returns
+        indices of the items which still should be processed."""
+        try:
+            recovered = recover([batch[idx] for idx in pending])
+        except requests.exceptions.RequestException as e:
+            sly.logger.warning(f"Can't check processed items of {self.name}: {e}.")
+            return pending
+
+        still_pending = []
+        for idx, result in zip(pending, recovered):
+            if result is None:
+                still_pending.append(idx)
+            else:
+                results[idx] = result
+
+        if len(still_pending) < len(pending):
+            sly.logger.debug(
+                f"{len(pending) - len(still_pending)} items of the failed batch for "
+                f"{self.name} were already processed, they are not sent again."
+            )
+        return still_pending
+
+    def _on_success(self, items: int, payload: int, latency: float):
+        """Updates metrics and adjusts the batch size after the successful call."""
+        with self._lock:
+            self._metrics["calls"] += 1
+            self._metrics["items"] += items
+            self._metrics["bytes"] += payload
+            # Exponential moving average of the latency.
+            self._metrics["latency"] = 0.8 * self._metrics["latency"] + 0.2 * latency
+
+            if items < self.batch_size:
+                # Latency of the incomplete batch says nothing about the full one.
+                return
+            if latency > self.target_latency:
+                self.batch_size = max(self.min_size, self.batch_size // 2)
+            elif latency < self.target_latency / 2:
+                self.batch_size = min(self.max_size, int(self.batch_size * 1.5) + 1)
+
+    def _on_error(self, error: Exception):
+        """Updates metrics and shrinks the batch size after the failed call, if the error is
+        transient or the batch is too large. Other errors are caused by the items, so the size
+        of the batch is kept."""
+        with self._lock:
+            self._metrics["errors"] += 1
+            if is_transient(error) or is_size_error(error):
+                self.batch_size = max(self.min_size, self.batch_size // 2)
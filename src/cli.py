@@ -0,0 +1,447 @@
+"""Headless comparison and transfer of the teams without the GUI.
+
+    python -m src.cli compare --source-team-id 8 --target-team primitives
+    python -m src.cli transfer --config transfer.json --compare
+
+Settings are passed as options or in the JSON config file (keys are the names of the options
+with underscores, e.g. "target_team", the "env" key sets environment variables for tuning,
+e.g. {"env": {"SCHEDULER_WORKERS": 8}}), options override the config file. Progress is written
+to the log as structured records with the "event" field. Each run should have its own work
+directory, so several transfers can run on the same machine at the same time.
+"""
+
+import argparse
+import json
+import os
+import signal
+import sys
+
+from typing import List, Optional
+
+import requests
+
+from src.scheduler import PRIORITY_POLICIES
+
+# Exit codes: finished successfully, failed with an unexpected error, invalid settings,
+# no connection to the target instance, finished with failed images or errors in the projects.
+# Interrupted runs exit with 128 + number of the signal (130 for Ctrl+C).
+EXIT_OK = 0
+EXIT_ERROR = 1
+EXIT_INVALID_SETTINGS = 2
+EXIT_CONNECTION_FAILED = 3
+EXIT_INCOMPLETE = 4
+
+COMPARE = "compare"
+TRANSFER = "transfer"
+
+
+class SettingsError(ValueError):
+    """Raised when the settings of the run are invalid."""
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Builds the parser of the command line options.
+
+    :return: parser with compare and transfer commands
+    :rtype: argparse.ArgumentParser
+    """
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--config", help="path to the JSON file with settings")
+    common.add_argument(
+        "--source-team-id", type=int, help="ID of the source team (default: TEAM_ID)"
+    )
+    common.add_argument(
+        "--source-server", help="address of the source instance (default: SERVER_ADDRESS)"
+    )
+    common.add_argument(
+        "--source-token", help="API token for the source instance (default: API_TOKEN)"
+    )
+    common.add_argument(
+        "--target-server", help="address of the target instance (default: TARGET_SERVER_ADDRESS)"
+    )
+    common.add_argument(
+        "--target-token", help="API token for the target instance (default: TARGET_API_TOKEN)"
+    )
+    common.add_argument("--target-team", help="name of the team in the target instance")
+    common.add_argument(
+        "--work-dir",
+        help="directory for the plan, the ledger and temporary files (default: WORK_DIR)",
+    )
+
+    # Settings of the comparison, used by the transfer when it compares the teams first.
+    common.add_argument(
+        "--custom-settings",
+        action="store_true",
+        default=None,
+        help="don't use the default settings for Assets, implied by the filter options",
+    )
+    common.add_argument(
+        "--annotation-types", help="comma-separated geometry types of the objects to filter by"
+    )
+    common.add_argument("--tag-name", help="name of the tag to filter by")
+    common.add_argument("--filter", help="filter expression, used instead of the other filters")
+    common.add_argument(
+        "--create-missing",
+        action="store_true",
+        default=None,
+        help="create missing team, workspaces, projects and datasets while comparing",
+    )
+    common.add_argument(
+        "--replace-changed",
+        action="store_true",
+        default=None,
+        help="replace target images with the same names, but different content",
+    )
+
+    parser = argparse.ArgumentParser(
+        prog="python -m src.cli", description="Compares and transfers teams between instances."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser(
+        COMPARE, parents=[common], help="compare the teams and write the transfer plan"
+    )
+    transfer = commands.add_parser(
+        TRANSFER, parents=[common], help="transfer the images from the plan"
+    )
+    transfer.add_argument(
+        "--compare",
+        action="store_true",
+        default=None,
+        help="compare the teams before the transfer, otherwise the plan of the previous "
+        "comparison in the work directory is used",
+    )
+    transfer.add_argument(
+        "--normalize-metadata",
+        action="store_true",
+        default=None,
+        help="normalize metadata of the images with the custom settings",
+    )
+    transfer.add_argument(
+        "--validate-annotations",
+        action="store_true",
+        default=None,
+        help="validate annotations against the project meta before the upload",
+    )
+    transfer.add_argument(
+        "--policy",
+        choices=PRIORITY_POLICIES,
+        help="order of the work units (default: TRANSFER_PRIORITY_POLICY)",
+    )
+    transfer.add_argument(
+        "--pinned-projects",
+        help="comma-separated names of the projects to transfer first (default: PINNED_PROJECTS)",
+    )
+    return parser
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parses the options and merges them with the settings from the config file.
+
+    :param argv: command line arguments, sys.argv is used if None
+    :type argv: Optional[List[str]]
+    :raises SettingsError: if the config file can't be read or contains unknown settings
+    :return: settings of the run
+    :rtype: argparse.Namespace
+    """
+    args = build_parser().parse_args(argv)
+    args.env = {}
+    if args.config:
+        load_config(args)
+
+    # Target instance can be set in the environment, like in the target.env file of the app.
+    args.target_server = args.target_server or os.getenv("TARGET_SERVER_ADDRESS")
+    args.target_token = args.target_token or os.getenv("TARGET_API_TOKEN")
+    return args
+
+
+def load_config(args: argparse.Namespace):
+    """Reads the config file and fills the settings, which are not set by the options.
+
+    :param args: settings of the run
+    :type args: argparse.Namespace
+    :raises SettingsError: if the config file can't be read or contains unknown settings
+    """
+    try:
+        with open(args.config, "r", encoding="utf-8") as f:
+            config = json.load(f)
+    except (OSError, ValueError) as e:
+        raise SettingsError(f"Can't read the config file {args.config}: {e}")
+
+    if not isinstance(config, dict):
+        raise SettingsError("Config file should contain JSON object.")
+
+    args.env = config.pop("env", {})
+    for key, value in config.items():
+        if key in ("command", "config", "env") or not hasattr(args, key):
+            raise SettingsError(f"Unknown setting {key} in the config file.")
+        if getattr(args, key) is None:
+            # Options from the command line override the config file.
+            setattr(args, key, value)
+
+
+def prepare_environment(args: argparse.Namespace):
+    """Sets the environment variables, which are read by the app on import.
+
+    :param args: settings of the run
+    :type args: argparse.Namespace
+    """
+    for key, value in args.env.items():
+        os.environ[key] = str(value)
+
+    variables = {
+        "TEAM_ID": args.source_team_id,
+        "SERVER_ADDRESS": args.source_server,
+        "API_TOKEN": args.source_token,
+        "WORK_DIR": args.work_dir,
+    }
+    for key, value in variables.items():
+        if value is not None:
+            os.environ[key] = str(value)
+
+
+def split_names(value: Optional[str]) -> List[str]:
+    """Splits comma-separated names, the value from the config file can be a list."""
+    if not value:
+        return []
+    if isinstance(value, list):
+        return [str(name).strip() for name in value if str(name).strip()]
+    return [name.strip() for name in value.split(",") if name.strip()]
+
+
+def apply_settings(args: argparse.Namespace):
+    """Writes the settings of the run to the state of the app.
+
+    :param args: settings of the run
+    :type args: argparse.Namespace
+    :raises SettingsError: if the settings are invalid
+    """
+    import src.globals as g
+
+    annotation_types = split_names(args.annotation_types)
+    unknown_types = set(annotation_types) - set(g.GEOMETRIES)
+    if unknown_types:
+        raise SettingsError(
+            f"Unknown annotation types {sorted(unknown_types)}, expected {g.GEOMETRIES}."
+        )
+
+    g.STATE.default_settings = not (
+        args.custom_settings or annotation_types or args.tag_name or args.filter
+    )
+    if g.STATE.default_settings:
+        g.STATE.filter_by_annotation_type = True
+        g.STATE.filter_by_tag_name = True
+        g.STATE.filter_by_expression = False
+    else:
+        # With the custom settings and without filters all new images are transferred.
+        g.STATE.filter_by_annotation_type = bool(annotation_types)
+        g.STATE.filter_by_tag_name = bool(args.tag_name)
+        g.STATE.filter_by_expression = bool(args.filter)
+        g.STATE.annotation_types = annotation_types
+        g.STATE.tag_name = args.tag_name or ""
+        g.STATE.filter_expression = args.filter or ""
+
+    g.STATE.read_only_comparison = not args.create_missing
+    g.STATE.replace_changed_images = bool(args.replace_changed)
+
+    if args.command == TRANSFER:
+        g.STATE.normalize_image_metadata = bool(
+            g.STATE.default_settings or args.normalize_metadata
+        )
+        if args.validate_annotations is not None:
+            g.STATE.validate_annotations = bool(args.validate_annotations)
+        if args.policy:
+            if args.policy not in PRIORITY_POLICIES:
+                raise SettingsError(
+                    f"Unknown policy {args.policy}, expected one of {PRIORITY_POLICIES}."
+                )
+            g.STATE.transfer_policy = args.policy
+        if args.pinned_projects is not None:
+            g.STATE.pinned_projects = split_names(args.pinned_projects)
+
+
+def handle_signals() -> dict:
+    """Stops the comparison and the transfer gracefully on SIGINT and SIGTERM: running work
+    is finished, so the transfer can be resumed. The second signal stops the process at once.
+
+    :return: dict, where the number of the received signal is stored
+    :rtype: dict
+    """
+    import src.globals as g
+
+    received = {}
+
+    def stop(signum, frame):
+        if received:
+            raise KeyboardInterrupt
+        received["signal"] = signum
+        g.STATE.reporter.event("stop_requested", signal=signal.Signals(signum).name)
+        g.STATE.continue_comparsion = False
+        g.STATE.continue_upload = False
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    return received
+
+
+def prepare_run(args: argparse.Namespace):
+    """Checks the settings of the run and prepares the filters before connecting to the target.
+
+    :param args: settings of the run
+    :type args: argparse.Namespace
+    :raises ValueError: if the settings are invalid
+    """
+    import src.globals as g
+    import src.engine as engine
+
+    apply_settings(args)
+    engine.prepare_filters()
+
+    if not args.target_server or not args.target_token:
+        raise SettingsError("Address and API token of the target instance are required.")
+
+    if args.command == TRANSFER and not args.compare:
+        if not os.path.exists(g.DIFFERENCES_PLAN) and not os.path.exists(
+            g.LEGACY_DIFFERENCES_JSON
+        ):
+            raise SettingsError(
+                f"Transfer plan is not found in {g.TMP_DIR}, run compare first or use --compare."
+            )
+        if not args.target_team:
+            # Resuming the unfinished transfer to the same team.
+            args.target_team = engine.unfinished_transfer()
+
+    g.STATE.target_team_name = args.target_team or g.DEFAULT_TEAM_NAME
+
+
+def run_compare(received: dict) -> int:
+    """Compares the teams and writes the transfer plan.
+
+    :param received: dict with the number of the received signal
+    :type received: dict
+    :return: exit code
+    :rtype: int
+    """
+    import src.globals as g
+    import src.engine as engine
+
+    g.STATE.continue_comparsion = True
+    engine.compare_teams(g.TEAM_ID)
+
+    if received:
+        return 128 + received["signal"]
+
+    if g.STATE.error_report:
+        with open(g.ERROR_JSON, "w", encoding="utf-8") as f:
+            json.dump(g.STATE.error_report, f, ensure_ascii=False, indent=4)
+        g.STATE.reporter.error(
+            "Errors in the projects",
+            f"Comparison found errors in the projects, the report was saved to {g.ERROR_JSON}.",
+        )
+        return EXIT_INCOMPLETE
+
+    return EXIT_OK
+
+
+def run_transfer(args: argparse.Namespace, received: dict) -> int:
+    """Transfers the images from the plan, compares the teams first if requested.
+
+    :param args: settings of the run
+    :type args: argparse.Namespace
+    :param received: dict with the number of the received signal
+    :type received: dict
+    :return: exit code
+    :rtype: int
+    """
+    import src.globals as g
+    import src.engine as engine
+
+    if args.compare:
+        exit_code = run_compare(received)
+        if exit_code != EXIT_OK:
+            return exit_code
+
+    g.STATE.continue_upload = True
+    engine.transfer()
+
+    if received:
+        return 128 + received["signal"]
+    if g.STATE.failed_images:
+        return EXIT_INCOMPLETE
+    return EXIT_OK
+
+
+def run(args: argparse.Namespace, received: dict) -> int:
+    """Checks the settings, connects to the target instance and runs the command.
+
+    :param args: settings of the run
+    :type args: argparse.Namespace
+    :param received: dict with the number of the received signal
+    :type received: dict
+    :return: exit code
+    :rtype: int
+    """
+    import src.globals as g
+    import src.engine as engine
+
+    try:
+        prepare_run(args)
+    except ValueError as e:
+        # Invalid filters are reported by the engine with ValueError (FilterError).
+        g.STATE.reporter.error("Invalid settings", str(e))
+        return EXIT_INVALID_SETTINGS
+
+    try:
+        engine.connect_target(args.target_server, args.target_token)
+    except (ValueError, requests.exceptions.RequestException) as e:
+        g.STATE.reporter.error(
+            "Connection failed", f"The connection to the Target API failed: {e}"
+        )
+        return EXIT_CONNECTION_FAILED
+
+    if args.command == COMPARE:
+        return run_compare(received)
+    return run_transfer(args, received)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Runs the command and returns the exit code.
+
+    :param argv: command line arguments, sys.argv is used if None
+    :type argv: Optional[List[str]]
+    :return: exit code
+    :rtype: int
+    """
+    try:
+        args = parse_args(argv)
+    except SettingsError as e:
+        print(e, file=sys.stderr)
+        return EXIT_INVALID_SETTINGS
+
+    prepare_environment(args)
+
+    # The app reads the environment on import, so it's imported after the environment is set.
+    import supervisely as sly
+
+    try:
+        import src.globals as g
+    except Exception as e:
+        # Source instance and team are required to create the API objects on import.
+        print(f"Can't connect to the source instance: {e}", file=sys.stderr)
+        return EXIT_INVALID_SETTINGS
+
+    received = handle_signals()
+
+    try:
+        exit_code = run(args, received)
+    except KeyboardInterrupt:
+        exit_code = 128 + received.get("signal", signal.SIGINT)
+    except Exception as e:
+        sly.logger.exception(f"The {args.command} failed: {e}")
+        exit_code = EXIT_ERROR
+
+    g.STATE.reporter.event("finished", command=args.command, exit_code=exit_code)
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,69 @@
+from collections import namedtuple
+from typing import Dict, List
+
+import supervisely as sly
+
+# Result of the comparison of images in source and target datasets.
+# new: images which names and contents are missing in the target dataset.
+# identical: images with the same name and the same content in the target dataset.
+# changed: images with the same name, but different content in the target dataset.
+# renamed: images which content is in the target dataset under another name.
+# changed_targets: names of the changed images mapped to IDs of the target images.
+ImagesDiff = namedtuple(
+    "ImagesDiff", ["new", "identical", "changed", "renamed", "changed_targets"]
+)
+
+
+def same_content(source_image: sly.ImageInfo, target_image: sly.ImageInfo) -> bool:
+    """Checks if source and target images have the same content. Hashes are compared if
+    both images have them (e.g. images added by links may have no hash), otherwise sizes.
+
+    :param source_image: object with information about source image
+    :type source_image: sly.ImageInfo
+    :param target_image: object with information about target image
+    :type target_image: sly.ImageInfo
+    :return: True if images have the same content, False otherwise
+    :rtype: bool
+    """
+    if source_image.hash and target_image.hash:
+        return source_image.hash == target_image.hash
+    return source_image.size == target_image.size
+
+
+def diff_images(
+    source_images: List[sly.ImageInfo], target_images: List[sly.ImageInfo]
+) -> ImagesDiff:
+    """Classifies images of the source dataset as new, identical, changed or renamed
+    comparing to the images of the target dataset. Target images are indexed by names and
+    hashes, so the comparison takes linear time.
+
+    :param source_images: list of images in the source dataset
+    :type source_images: List[sly.ImageInfo]
+    :param target_images: list of images in the target dataset
+    :type target_images: List[sly.ImageInfo]
+    :return: ImagesDiff namedtuple with lists of classified source images
+    :rtype: ImagesDiff
+    """
+    target_by_name: Dict[str, sly.ImageInfo] = {
+        image.name: image for image in target_images
+    }
+    target_hashes = {image.hash for image in target_images if image.hash}
+
+    new, identical, changed, renamed = [], [], [], []
+    changed_targets = {}
+
+    for image in source_images:
+        target_image = target_by_name.get(image.name)
+
+        if target_image is not None:
+            if same_content(image, target_image):
+                identical.append(image)
+            else:
+                changed.append(image)
+                changed_targets[image.name] = target_image.id
+        elif image.hash and image.hash in target_hashes:
+            renamed.append(image)
+        else:
+            new.append(image)
+
+    return ImagesDiff(new, identical, changed, renamed, changed_targets)
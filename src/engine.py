@@ -0,0 +1,2359 @@
+import json
+import os
+
+from shutil import rmtree
+from functools import lru_cache, partial
+from collections import defaultdict, deque, namedtuple
+from itertools import chain
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from typing import List, Tuple, Dict, Iterator, Optional, Union
+
+import supervisely as sly
+
+from supervisely._utils import get_bytes_hash
+
+import src.globals as g
+import src.ledger as ledger
+
+from src.annotations import (
+    meta_ids,
+    remap_annotation,
+    shutdown_validation_pool,
+    validate_annotations,
+    validate_annotations_in_pool,
+)
+from src.api_factory import create_api
+from src.async_api import AsyncApi
+from src.diff import diff_images
+from src.filters import FilterError, compile_filter
+from src.hierarchy import HierarchyIndex
+from src.meta_cache import ProjectMetaCache
+from src.pipeline import Pipeline
+from src.plan import (
+    IMAGE_GROUPS,
+    PlanWriter,
+    convert_legacy_plan,
+    load_index,
+    read_dataset,
+    read_plan,
+)
+from src.reporting import COMPARE_STAGE, UPLOAD_STAGE
+from src.scheduler import PriorityPolicy, Scheduler, Task, TransferEstimate
+
+# Comparison and transfer of the teams, which are used by the GUI and by the headless CLI.
+# Settings are read from g.STATE and progress is sent to g.STATE.reporter, so the engine
+# doesn't depend on the widgets.
+
+# Lists of image ids, names, paths, metas, hashes and sizes of the images which are going to be uploaded.
+ImagesData = namedtuple(
+    "ImagesData", ["ids", "names", "paths", "metas", "hashes", "sizes", "updated_at"]
+)
+
+# Batch of images in the transfer pipeline with downloaded annotations and IDs of uploaded images.
+# Data contains bytes of the images kept in memory or paths to the images on disk.
+TransferBatch = namedtuple(
+    "TransferBatch", ["images", "mode", "data", "annotations", "uploaded_ids"]
+)
+
+# Modes of the batches: image bytes are uploaded, images which are already on the target instance
+# are added by hashes, images were uploaded before the restart and only annotations are attached.
+UPLOAD_BYTES = "bytes"
+UPLOAD_HASHES = "hashes"
+ATTACH_ONLY = "attach"
+
+# Cached metas of the source project and the target project after the update.
+ProjectMetas = namedtuple("ProjectMetas", ["source", "target"])
+
+# Results of the filtering: image has object of the specified type or the tag with specified name.
+ANNOTATED = "annotated"
+TAGGED = "tagged"
+
+# Kind of the scheduler task, which is finished after all images of the dataset are transferred.
+DATASET_TASK = "dataset"
+
+# Suffix of the temporary names of the images, which replace changed images in the target dataset.
+REPLACEMENT_SUFFIX = ".replacement"
+
+
+def connect_target(instance: str, api_key: str):
+    """Connects to the target instance and prepares the API objects for it.
+
+    :param instance: address of the target instance
+    :type instance: str
+    :param api_key: API key for the target instance
+    :type api_key: str
+    :raises ValueError: if the address or the key is invalid
+    :raises requests.exceptions.HTTPError: if the instance rejected the key
+    """
+    g.STATE.target_api = create_api(
+        instance,
+        api_key,
+        pool_size=g.API_POOL_SIZE,
+        cache_ttl=g.API_CACHE_TTL,
+        cache_size=g.API_CACHE_SIZE,
+        ignore_task_id=True,
+    )
+    g.STATE.target_api.team.get_info_by_name(g.DEFAULT_TEAM_NAME)
+    sly.logger.info("The connection to the Target API was successful.")
+
+    g.STATE.target_meta_cache = ProjectMetaCache(g.STATE.target_api)
+
+    if g.STATE.target_client is not None:
+        # Closing connections to the previous target instance.
+        g.STATE.target_client.close()
+    g.STATE.target_client = AsyncApi(
+        g.STATE.target_api, g.ASYNC_HTTP_CONNECTIONS, enabled=g.ASYNC_HTTP
+    )
+
+    g.STATE.same_instance = g.is_same_instance(g.source_api.server_address, instance)
+    if g.STATE.same_instance:
+        sly.logger.info(
+            "Target instance is the same as the source instance, "
+            "images will be copied on the server side."
+        )
+
+
+def prepare_filters():
+    """Checks the filter settings and compiles the filter expression. With the default settings,
+    default tag name and annotation types are used.
+
+    :raises ValueError: if the settings are invalid, FilterError if the expression is invalid
+    """
+    g.STATE.image_filter = None
+    if g.STATE.default_settings:
+        sly.logger.debug("Using the default settings for comparison.")
+        g.STATE.tag_name = g.DEFAULT_TAG_NAME
+        g.STATE.annotation_types = g.DEFAULT_ANNOTATION_TYPES
+        return
+
+    sly.logger.debug("Using custom settings for comparison.")
+    if g.STATE.filter_by_expression:
+        # Expression replaces the filters by annotation types and tag name,
+        # so their settings are not checked.
+        sly.logger.debug("Filtering by expression is enabled.")
+        try:
+            g.STATE.image_filter = compile_filter(g.STATE.filter_expression)
+        except FilterError as e:
+            sly.logger.debug(f"Filter expression is invalid: {e}")
+            raise FilterError(f"Filter expression is invalid: {e}") from e
+        return
+
+    if g.STATE.filter_by_annotation_type and not g.STATE.annotation_types:
+        sly.logger.debug("No annotation types selected.")
+        raise ValueError("No annotation types selected.")
+    if g.STATE.filter_by_tag_name and not g.STATE.tag_name:
+        raise ValueError("No tag name was entered.")
+
+
+def compare_teams(source_team_id: int):
+    """Calculates difference between source and target teams and writes it to the plan.
+    Filters should be prepared with prepare_filters() before the comparison.
+
+    :param source_team_id: id of the source team in Supervisely instance.
+    :type source_team_id: int
+    """
+    # Resetting all counters.
+    g.STATE.reset_counters()
+    g.STATE.annotation_cache.clear()
+    g.STATE.source_meta_cache.clear()
+    if g.STATE.target_meta_cache is not None:
+        g.STATE.target_meta_cache.clear()
+
+    sly.logger.debug(
+        f"Comparsion starting. Filter by annotation type: {g.STATE.filter_by_annotation_type}. "
+        f"Filter by tag name: {g.STATE.filter_by_tag_name}. "
+        f"Filter by expression: {g.STATE.filter_by_expression}."
+    )
+
+    team_name = g.STATE.target_team_name
+    sly.logger.debug(f"Readed team name as {team_name}.")
+
+    # Trying to find team with specified name in target instance.
+    target_team = g.STATE.target_api.team.get_info_by_name(team_name)
+
+    if target_team:
+        target_team_id = target_team.id
+        sly.logger.debug(
+            f"Team {team_name} is found in target instance with ID {target_team_id}."
+        )
+    elif g.STATE.read_only_comparison:
+        # If team is not found, it will be created during the upload.
+        sly.logger.debug(
+            f"Team {team_name} is not found in target instance. Will be created on upload."
+        )
+        target_team_id = None
+    else:
+        # If team is not found, it will be created.
+        sly.logger.debug(
+            f"Team {team_name} is not found in target instance. Will create it."
+        )
+        target_team_id = g.STATE.target_api.team.create(team_name).id
+        sly.logger.debug(
+            f"Team {team_name} is created in target instance with ID {target_team_id}."
+        )
+
+    # Indices of source and target teams, which are used instead of per-entity API calls.
+    g.STATE.source_index = HierarchyIndex(g.source_api, source_team_id)
+    g.STATE.target_index = HierarchyIndex(g.STATE.target_api, target_team_id)
+
+    # Getting list of workspaces in source team.
+    source_workspaces = g.STATE.source_index.workspaces()
+    sly.logger.debug(
+        f"Found {len(source_workspaces)} workspaces in source team, starting workspace comparison."
+    )
+
+    # Dataset comparisons are running in the thread pool, while the hierarchy is being walked.
+    # Each comparison writes its differences to the plan, so futures don't keep the images.
+    dataset_futures = {}
+
+    # Differences of each dataset are written to the plan as soon as it's compared.
+    with PlanWriter(g.DIFFERENCES_PLAN) as plan_writer, ThreadPoolExecutor(
+        max_workers=g.STATE.compare_workers
+    ) as executor:
+        for workspace in source_workspaces:
+            if not g.STATE.continue_comparsion:
+                break
+            workspace_difference(
+                workspace, target_team_id, executor, plan_writer, dataset_futures
+            )
+
+        collect_dataset_differences(dataset_futures)
+
+    sly.logger.debug(
+        f"Finished workspaces comparison. Found new {g.STATE.annotated_images} annotated images "
+        f"and {g.STATE.tagged_images} tagged images."
+    )
+
+    g.STATE.reporter.event(
+        "comparison_finished",
+        annotated_images=g.STATE.annotated_images,
+        tagged_images=g.STATE.tagged_images,
+        errors=sum(len(errors) for errors in g.STATE.error_report.values()),
+        cancelled=not g.STATE.continue_comparsion,
+    )
+
+
+def compare_dataset(
+    plan_writer: PlanWriter,
+    source_dataset: sly.DatasetInfo,
+    target_dataset: Optional[sly.DatasetInfo],
+    names: Tuple[str, str, str],
+) -> bool:
+    """Compares the dataset and writes its differences to the plan right away in the thread
+    of the comparison, so the lists of images are released as soon as the dataset is compared.
+
+    :param plan_writer: writer of the transfer plan
+    :type plan_writer: PlanWriter
+    :param source_dataset: object with information about source dataset
+    :type source_dataset: sly.DatasetInfo
+    :param target_dataset: object with information about target dataset,
+        None if it will be created on upload
+    :type target_dataset: Optional[sly.DatasetInfo]
+    :param names: names of the workspace, project and dataset
+    :type names: Tuple[str, str, str]
+    :return: True if the differences were written, False if the comparison was cancelled
+    :rtype: bool
+    """
+    dataset_differences = dataset_difference(source_dataset, target_dataset)
+    if dataset_differences is None:
+        # Comparison was cancelled before the dataset was processed.
+        return False
+
+    plan_writer.write(*names, dataset_differences)
+    report_found_images(dataset_differences, *names)
+    return True
+
+
+def collect_dataset_differences(dataset_futures: Dict[Future, Tuple[str, str, str]]):
+    """Waits for the dataset comparisons, which are running in the thread pool. Comparisons
+    write their results to the plan themselves, so futures only report if the dataset was
+    written. If the comparsion was cancelled, pending comparisons are cancelled.
+
+    :param dataset_futures: futures mapped to the workspace, project and dataset names
+    :type dataset_futures: Dict[Future, Tuple[str, str, str]]
+    """
+    datasets_count = len(dataset_futures)
+
+    with g.STATE.reporter.progress(
+        COMPARE_STAGE, "Comparing datasets...", datasets_count
+    ) as pbar:
+        for future in as_completed(list(dataset_futures)):
+            dataset_futures.pop(future)
+
+            if not g.STATE.continue_comparsion:
+                # Cancelling all comparisons which are not started yet.
+                for pending_future in dataset_futures:
+                    pending_future.cancel()
+
+            if future.cancelled():
+                continue
+
+            try:
+                written = future.result()
+            except Exception:
+                for pending_future in dataset_futures:
+                    pending_future.cancel()
+                raise
+
+            if written:
+                pbar.update(1)
+
+    sly.logger.debug(f"Finished comparison of {datasets_count} datasets.")
+
+
+def report_found_images(
+    dataset_differences: dict, workspace_name: str, project_name: str, dataset_name: str
+):
+    """Reports the number of found images after the dataset comparison.
+
+    :param dataset_differences: information about difference between source and target dataset.
+    :type dataset_differences: dict
+    :param workspace_name: name of the workspace
+    :type workspace_name: str
+    :param project_name: name of the project
+    :type project_name: str
+    :param dataset_name: name of the dataset
+    :type dataset_name: str
+    """
+    with g.STATE.lock:
+        annotated_images = g.STATE.annotated_images
+        tagged_images = g.STATE.tagged_images
+
+    g.STATE.reporter.event(
+        "dataset_compared",
+        workspace=workspace_name,
+        project=project_name,
+        dataset=dataset_name,
+        new_annotated_images=len(dataset_differences["annotated_images"]),
+        new_tagged_images=len(dataset_differences["tagged_images"]),
+        annotated_images=annotated_images,
+        tagged_images=tagged_images,
+    )
+
+
+def workspace_difference(
+    source_workspace: sly.WorkspaceInfo,
+    target_team_id: int,
+    executor: ThreadPoolExecutor,
+    plan_writer: PlanWriter,
+    dataset_futures: Dict[Future, Tuple[str, str, str]],
+):
+    """Calculates difference between source and target workspace. Dataset comparisons
+    are submitted to the executor and their futures are stored in the dataset futures.
+
+    :param source_workspace: object with information about source workspace.
+    :type source_workspace: sly.WorkspaceInfo
+    :param target_team_id: id of the target team in Supervisely instance,
+        None if the team will be created on upload.
+    :type target_team_id: int
+    :param executor: thread pool for dataset comparisons.
+    :type executor: ThreadPoolExecutor
+    :param plan_writer: writer of the transfer plan.
+    :type plan_writer: PlanWriter
+    :param dataset_futures: futures mapped to the workspace, project and dataset names.
+    :type dataset_futures: Dict[Future, Tuple[str, str, str]]
+    """
+    workspace_name = source_workspace.name
+    sly.logger.debug(f"Working on a workspace {workspace_name}.")
+
+    # Trying to find workspace with specified name in target team.
+    target_workspace = g.STATE.target_index.workspace(workspace_name)
+
+    if target_workspace:
+        target_workspace_id = target_workspace.id
+        sly.logger.debug(
+            f"Workspace {workspace_name} is found in target team with ID {target_workspace_id}."
+        )
+    elif g.STATE.read_only_comparison:
+        # If workspace is not found, it will be created during the upload.
+        sly.logger.debug(
+            f"Workspace {workspace_name} is not found in target team. Will be created on upload."
+        )
+        target_workspace_id = None
+    else:
+        # If workspace is not found, it will be created.
+        sly.logger.debug(
+            f"Workspace {workspace_name} is not found in target team. Will create it."
+        )
+        target_workspace = g.STATE.target_api.workspace.create(
+            target_team_id, workspace_name
+        )
+        g.STATE.target_index.add_workspace(target_workspace)
+        target_workspace_id = target_workspace.id
+        sly.logger.debug(
+            f"Workspace {workspace_name} is created in target team with ID {target_workspace_id}."
+        )
+
+    # Getting list of projects in source workspace.
+    source_projects = g.STATE.source_index.projects(source_workspace.id)
+    sly.logger.debug(
+        f"Found {len(source_projects)} projects in source workspace, starting project comparison."
+    )
+    with g.STATE.reporter.progress(
+        COMPARE_STAGE,
+        f"Comparing projects in workspace {source_workspace.name}...",
+        len(source_projects),
+    ) as pbar:
+        for project in source_projects:
+            if g.STATE.continue_comparsion:
+                project_difference(
+                    project, target_workspace_id, executor, plan_writer, dataset_futures
+                )
+                pbar.update(1)
+
+    sly.logger.debug("Finished projects comparison.")
+
+
+def project_difference(
+    source_project: sly.ProjectInfo,
+    target_workspace_id: int,
+    executor: ThreadPoolExecutor,
+    plan_writer: PlanWriter,
+    dataset_futures: Dict[Future, Tuple[str, str, str]],
+):
+    """Calculates difference between source and target project. Dataset comparisons
+    are submitted to the executor and their futures are stored in the dataset futures.
+
+    :param source_project: object with information about source project.
+    :type source_project: sly.ProjectInfo
+    :param target_workspace_id: id of the target workspace in Supervisely instance,
+        None if the workspace will be created on upload.
+    :type target_workspace_id: int
+    :param executor: thread pool for dataset comparisons.
+    :type executor: ThreadPoolExecutor
+    :param plan_writer: writer of the transfer plan.
+    :type plan_writer: PlanWriter
+    :param dataset_futures: futures mapped to the workspace, project and dataset names.
+    :type dataset_futures: Dict[Future, Tuple[str, str, str]]
+    """
+    project_name = source_project.name
+    sly.logger.debug(f"Working on a project {project_name}.")
+
+    # Trying to find project with specified name in target workspace.
+    target_project = g.STATE.target_index.project(target_workspace_id, project_name)
+
+    workspace_name = g.STATE.source_index.workspace_name(source_project.workspace_id)
+
+    if g.STATE.default_settings:
+        source_project_meta = g.STATE.source_meta_cache.get(source_project.id).meta
+        class_titles = [obj_class.name for obj_class in source_project_meta.obj_classes]
+
+        error = None
+
+        if len(class_titles) > 1:
+            sly.logger.error(
+                f"Default settings are enabled, but project {project_name} has more than one class."
+            )
+            error = "Project has more than one class."
+
+        elif len(class_titles) == 1:
+            class_name = str(class_titles[0]).lower()
+            unified_class_name = class_name.rsplit("_", 1)[0]
+            unified_project_name = project_name.replace(" ", "_").lower()
+
+            sly.logger.debug(
+                f"Checking if unified class name {unified_class_name} is equal "
+                f"to unified project name {unified_project_name}."
+            )
+
+            if unified_class_name != unified_project_name:
+                error = "Class name is incorrect."
+                sly.logger.error(
+                    "Unified class name is not equal to unified project name."
+                )
+
+        if error:
+            error_report = {
+                "project_name": project_name,
+                "error": error,
+            }
+            g.STATE.error_report[workspace_name].append(error_report)
+
+    if target_project:
+        target_project_id = target_project.id
+        sly.logger.debug(
+            f"Project {project_name} is found in target workspace with ID {target_project_id}."
+        )
+    elif g.STATE.read_only_comparison:
+        # If project is not found, it will be created during the upload.
+        sly.logger.debug(
+            f"Project {project_name} is not found in target workspace. Will be created on upload."
+        )
+        target_project_id = None
+    else:
+        # If project is not found, it will be created.
+        sly.logger.debug(
+            f"Project {project_name} is not found in target workspace. Will create it."
+        )
+        target_project = g.STATE.target_api.project.create(
+            target_workspace_id, project_name
+        )
+        g.STATE.target_index.add_project(target_project)
+        target_project_id = target_project.id
+        sly.logger.debug(
+            f"Project {project_name} is created in target workspace with ID {target_project_id}."
+        )
+
+    # Getting list of datasets in source project.
+    source_datasets = g.STATE.source_index.datasets(source_project.id)
+    sly.logger.debug(
+        f"Found {len(source_datasets)} datasets in source project, starting dataset comparison."
+    )
+    for dataset in source_datasets:
+        if g.STATE.continue_comparsion:
+            target_dataset = find_target_dataset(dataset.name, target_project_id)
+            names = (workspace_name, project_name, dataset.name)
+            future = executor.submit(
+                compare_dataset, plan_writer, dataset, target_dataset, names
+            )
+            dataset_futures[future] = names
+
+    sly.logger.debug("Submitted datasets for comparison.")
+
+
+def find_target_dataset(
+    dataset_name: str, target_project_id: Optional[int]
+) -> Optional[sly.DatasetInfo]:
+    """Finds dataset with specified name in the target project. If the dataset is not found,
+    it will be created, unless read-only comparison is enabled.
+
+    :param dataset_name: name of the dataset
+    :type dataset_name: str
+    :param target_project_id: id of the target project in Supervisely instance,
+        None if the project will be created on upload.
+    :type target_project_id: Optional[int]
+    :return: object with information about target dataset, None if it will be created on upload.
+    :rtype: Optional[sly.DatasetInfo]
+    """
+    # Trying to find dataset with specified name in target project.
+    target_dataset = g.STATE.target_index.dataset(target_project_id, dataset_name)
+
+    if target_dataset:
+        sly.logger.debug(
+            f"Dataset {dataset_name} is found in target project with ID {target_dataset.id}."
+        )
+    elif g.STATE.read_only_comparison:
+        # If dataset is not found, it will be created during the upload.
+        sly.logger.debug(
+            f"Dataset {dataset_name} is not found in target project. Will be created on upload."
+        )
+    else:
+        # If dataset is not found, it will be created.
+        sly.logger.debug(
+            f"Dataset {dataset_name} is not found in target project. Will create it."
+        )
+        target_dataset = g.STATE.target_api.dataset.create(
+            target_project_id, dataset_name
+        )
+        g.STATE.target_index.add_dataset(target_dataset)
+        sly.logger.debug(
+            f"Dataset {dataset_name} is created in target project with ID {target_dataset.id}."
+        )
+
+    return target_dataset
+
+
+def dataset_difference(
+    source_dataset: sly.DatasetInfo, target_dataset: Optional[sly.DatasetInfo]
+) -> defaultdict:
+    """Calculates difference between source and target dataset, while filtering out images
+    that doesn't have bitmap annotation or tag with specified name.
+
+    :param source_dataset: object with information about source dataset.
+    :type source_dataset: sly.DatasetInfo
+    :param target_dataset: object with information about target dataset,
+        None if the dataset will be created on upload.
+    :type target_dataset: Optional[sly.DatasetInfo]
+    :return: defaultdict with information about difference between source and target dataset.
+    :rtype: defaultdict
+    """
+    if not g.STATE.continue_comparsion:
+        return
+
+    dataset_name = source_dataset.name
+    sly.logger.debug(f"Working on a dataset {dataset_name}.")
+
+    # Getting list of images in source dataset.
+    with g.STATE.source_limit:
+        source_images = g.STATE.source_client.list_images(source_dataset.id)
+    sly.logger.debug(f"Found {len(source_images)} images in source dataset.")
+
+    # Getting list of images in target dataset, dataset which is not created yet has no images.
+    target_images = []
+    if target_dataset is not None:
+        with g.STATE.target_limit:
+            target_images = g.STATE.target_client.list_images(target_dataset.id)
+    sly.logger.debug(f"Found {len(target_images)} images in target dataset.")
+
+    # Classifying images by names, hashes and sizes of the images in target dataset.
+    images_diff = diff_images(source_images, target_images)
+
+    sly.logger.debug(
+        f"Found {len(images_diff.new)} new, {len(images_diff.changed)} changed, "
+        f"{len(images_diff.renamed)} renamed and {len(images_diff.identical)} identical "
+        f"images in dataset {dataset_name}."
+    )
+
+    # New images, renamed images (their content is already on the target instance, so they
+    # are added by hashes) and images with changed content (if they should be replaced)
+    # are uploaded.
+    new_images = images_diff.new + images_diff.renamed
+    if g.STATE.replace_changed_images:
+        new_images = new_images + images_diff.changed
+
+    if target_dataset is not None and images_diff.identical:
+        # Images which were uploaded without annotations by the interrupted transfer
+        # are kept, so annotations will be attached to them on upload.
+        records = g.STATE.ledger.get(
+            target_dataset.id, [image.id for image in images_diff.identical]
+        )
+        new_images = new_images + [
+            image
+            for image in images_diff.identical
+            if records.get(image.id, (None, None))[1] == ledger.UPLOADED
+        ]
+
+    # Launching function to filter out images that doesn't have bitmap annotation or tag with specified name.
+    if (
+        g.STATE.filter_by_annotation_type
+        or g.STATE.filter_by_tag_name
+        or g.STATE.image_filter is not None
+    ):
+        new_annotated_images, new_tagged_images = filter_images(
+            new_images, source_dataset
+        )
+
+    else:
+        new_annotated_images = new_images
+        new_tagged_images = []
+
+    # Updating counters for annotated and tagged images, text widgets are updated
+    # from the main thread after the comparison is finished.
+    with g.STATE.lock:
+        g.STATE.annotated_images += len(new_annotated_images)
+        g.STATE.tagged_images += len(new_tagged_images)
+
+    # IDs of the target images, which will be replaced with changed images on upload.
+    replaced_images = {
+        image.name: images_diff.changed_targets[image.name]
+        for image in new_annotated_images + new_tagged_images
+        if image.name in images_diff.changed_targets
+    }
+
+    dataset_differences = {
+        "source": source_dataset,
+        "target": target_dataset,
+        # If True, target dataset (and its parents) will be created on upload.
+        "create_target": target_dataset is None,
+        "annotated_images": new_annotated_images,
+        "tagged_images": new_tagged_images,
+        "replaced_images": replaced_images,
+        "summary": {
+            "new": len(images_diff.new),
+            "identical": len(images_diff.identical),
+            "changed": len(images_diff.changed),
+            "renamed": len(images_diff.renamed),
+        },
+    }
+
+    sly.logger.debug(f"Prepared all data for dataset {dataset_name}.")
+
+    return dataset_differences
+
+
+def filter_images(
+    new_images: List[sly.ImageInfo], source_dataset: sly.DatasetInfo
+) -> Tuple[List[sly.ImageInfo], List[sly.ImageInfo]]:
+    """Filters out images that doesn't have bitmap annotation or tag with specified name.
+    Annotations are downloaded in chunks and evaluated one by one, only annotations of the
+    matched images are kept (in the annotation cache).
+
+    :param new_images: list of images that are not in target dataset.
+    :type new_images: List[sly.ImageInfo]
+    :param source_dataset: object with information about source dataset.
+    :type source_dataset: sly.DatasetInfo
+    :return: tuple with two lists of images that have bitmap annotation and tag with specified name.
+    :rtype: Tuple[List[sly.ImageInfo], List[sly.ImageInfo]]
+    """
+    sly.logger.debug(f"Starting filtering images in dataset {source_dataset.name}.")
+
+    # Dropping images which can't match the filters by their listing fields.
+    candidate_images = prefilter_images(new_images, source_dataset)
+
+    if not candidate_images:
+        sly.logger.debug(
+            f"No images in dataset {source_dataset.name} can match the filters."
+        )
+        return [], []
+
+    if g.STATE.image_filter is not None and not g.STATE.image_filter.needs_annotation:
+        # Expression uses only listing fields, so the result is already known.
+        return candidate_images, []
+
+    annotated_image_ids = set()
+    tagged_image_ids = set()
+
+    images_by_id = {image.id: image for image in candidate_images}
+
+    for annotation_info in stream_annotations(source_dataset.id, list(images_by_id)):
+        # Iterating over annotations and checking if they have bitmap annotation or tag with specified name.
+        match = match_annotation(
+            images_by_id[annotation_info.image_id], annotation_info.annotation
+        )
+        if match is None:
+            continue
+
+        image_id = annotation_info.image_id
+        sly.logger.debug(f"Found {match} image with ID {image_id}.")
+
+        if match == ANNOTATED:
+            annotated_image_ids.add(image_id)
+        else:
+            tagged_image_ids.add(image_id)
+
+        g.STATE.annotation_cache.put(
+            image_id, images_by_id[image_id].updated_at, annotation_info.annotation
+        )
+
+    sly.logger.debug(f"Finished filtering images in dataset {source_dataset.name}.")
+    sly.logger.debug(
+        f"Found {len(annotated_image_ids)} annotated images and {len(tagged_image_ids)} tagged images."
+    )
+
+    new_annotated_images = [
+        image for image in new_images if image.id in annotated_image_ids
+    ]
+    new_tagged_images = [image for image in new_images if image.id in tagged_image_ids]
+
+    sly.logger.debug(
+        f"Prepared lists of annotated and tagged images in dataset {source_dataset.name}."
+    )
+
+    return new_annotated_images, new_tagged_images
+
+
+def match_annotation(image: sly.ImageInfo, annotation: dict) -> Optional[str]:
+    """Checks if the annotation has object of the specified type or the tag with specified name.
+    If the filter expression is set, images which match it are counted as annotated.
+
+    :param image: object with information about image
+    :type image: sly.ImageInfo
+    :param annotation: annotation JSON
+    :type annotation: dict
+    :return: ANNOTATED or TAGGED if the annotation matches the filters, None otherwise
+    :rtype: Optional[str]
+    """
+    if g.STATE.image_filter is not None:
+        if g.STATE.image_filter.matches(image, annotation):
+            return ANNOTATED
+        return
+
+    if any(
+        obj["geometryType"] in g.STATE.annotation_types for obj in annotation["objects"]
+    ):
+        return ANNOTATED
+
+    if any(tag["name"] == g.STATE.tag_name for tag in annotation["tags"]):
+        return TAGGED
+
+
+def stream_annotations(
+    source_dataset_id: int, image_ids: List[int]
+) -> Iterator[sly.api.annotation_api.AnnotationInfo]:
+    """Downloads annotations in chunks and yields them one by one, so only a few chunks are
+    kept in memory. If more than one filter worker is set, chunks are downloaded in the thread
+    pool, with a limited number of chunks which are downloaded ahead.
+
+    :param source_dataset_id: ID of the source dataset in Supervisely instance
+    :type source_dataset_id: int
+    :param image_ids: IDs of the images
+    :type image_ids: List[int]
+    :return: generator of objects with annotations
+    :rtype: Iterator[sly.api.annotation_api.AnnotationInfo]
+    """
+
+    def download(chunk_ids: List[int]) -> list:
+        with g.STATE.source_limit:
+            return g.STATE.source_client.download_annotations(source_dataset_id, chunk_ids)
+
+    chunks = sly.batched(image_ids, batch_size=g.FILTER_CHUNK_SIZE)
+
+    if g.FILTER_WORKERS <= 1:
+        for chunk_ids in chunks:
+            yield from download(chunk_ids)
+        return
+
+    with ThreadPoolExecutor(max_workers=g.FILTER_WORKERS) as executor:
+        # Chunks are consumed in order, while next chunks are downloaded in the background.
+        window = deque()
+        for chunk_ids in chunks:
+            window.append(executor.submit(download, chunk_ids))
+            if len(window) >= g.FILTER_WORKERS * 2:
+                yield from window.popleft().result()
+        while window:
+            yield from window.popleft().result()
+
+
+def prefilter_images(
+    new_images: List[sly.ImageInfo], source_dataset: sly.DatasetInfo
+) -> List[sly.ImageInfo]:
+    """Returns images which can match the filters, using only the fields from the images
+    listing and the project meta, so annotations are downloaded only for the candidates.
+    Image can have annotation of the specified type only if it has labels and the project has
+    a class of this type, image can have the tag only if the tag is in its listing tags.
+
+    :param new_images: list of images that are not in target dataset.
+    :type new_images: List[sly.ImageInfo]
+    :param source_dataset: object with information about source dataset.
+    :type source_dataset: sly.DatasetInfo
+    :return: list of images which can match the filters.
+    :rtype: List[sly.ImageInfo]
+    """
+    if g.STATE.image_filter is not None:
+        # Predicates on the listing fields are checked, the rest are unknown (None).
+        candidate_images = [
+            image
+            for image in new_images
+            if g.STATE.image_filter.matches_listing(image) is not False
+        ]
+        sly.logger.debug(
+            f"Filter expression dropped {len(new_images) - len(candidate_images)} of "
+            f"{len(new_images)} images in dataset {source_dataset.name} by listing fields."
+        )
+        return candidate_images
+
+    with g.STATE.source_limit:
+        project_meta_json = g.STATE.source_meta_cache.get(source_dataset.project_id).json
+
+    # Classes with "any_shape" can contain objects of any geometry type.
+    class_shapes = {obj_class["shape"] for obj_class in project_meta_json["classes"]}
+    project_has_type = "any_shape" in class_shapes or bool(
+        class_shapes & set(g.STATE.annotation_types)
+    )
+
+    tag_ids = {
+        tag_meta.get("id")
+        for tag_meta in project_meta_json["tags"]
+        if tag_meta["name"] == g.STATE.tag_name
+    }
+
+    sly.logger.debug(
+        f"Project of dataset {source_dataset.name} has classes of the specified types: "
+        f"{project_has_type}, has tag {g.STATE.tag_name}: {bool(tag_ids)}."
+    )
+
+    def has_tag(image: sly.ImageInfo) -> bool:
+        if not tag_ids or image.tags is None:
+            # Listing without tags can't be used to drop the image.
+            return bool(tag_ids)
+        return any(
+            tag.get("tagId") in tag_ids or tag.get("name") == g.STATE.tag_name
+            for tag in image.tags
+        )
+
+    candidate_images = [
+        image
+        for image in new_images
+        if (project_has_type and image.labels_count != 0) or has_tag(image)
+    ]
+
+    sly.logger.debug(
+        f"Pre-filter dropped {len(new_images) - len(candidate_images)} of {len(new_images)} "
+        f"images in dataset {source_dataset.name}, annotations will be downloaded "
+        f"for {len(candidate_images)} images."
+    )
+
+    return candidate_images
+
+
+def transfer():
+    """Uploads images from source datasets to target datasets using the plan with differences
+    between source and target datasets. Settings of the transfer (normalization of metadata,
+    order of the work units) should be set in g.STATE before the transfer."""
+    sly.logger.debug("Starting upload of images.")
+
+    sly.logger.debug(
+        f"Normalize image metadata is set to {g.STATE.normalize_image_metadata}."
+    )
+    sly.logger.debug(
+        f"Transfer order is set to {g.STATE.transfer_policy}, "
+        f"pinned projects: {g.STATE.pinned_projects}."
+    )
+
+    g.STATE.saved_bytes = 0
+    g.STATE.failed_images = 0
+
+    # Resetting memory budget, which could be left reserved by the interrupted upload.
+    g.STATE.memory_budget.release(g.STATE.memory_budget.used_bytes)
+
+    if not os.path.exists(g.DIFFERENCES_PLAN) and os.path.exists(g.LEGACY_DIFFERENCES_JSON):
+        # Converting differences, which were saved by the previous version of the app.
+        convert_legacy_plan(g.LEGACY_DIFFERENCES_JSON, g.DIFFERENCES_PLAN)
+
+    # Storing the target team name, so the transfer can be resumed after the restart.
+    g.STATE.ledger.set_info("target_team_name", g.STATE.target_team_name)
+
+    if g.STATE.target_index is None:
+        # Building index of the target team, if the transfer is resumed after the restart.
+        target_team = g.STATE.target_api.team.get_info_by_name(g.STATE.target_team_name)
+        g.STATE.target_index = HierarchyIndex(
+            g.STATE.target_api, target_team.id if target_team else None
+        )
+
+    # Datasets are transferred by the scheduler, which runs independent datasets at the same time.
+    scheduler = build_transfer_graph(g.DIFFERENCES_PLAN)
+    datasets_count = scheduler.count(DATASET_TASK)
+
+    sly.logger.debug(f"Found {datasets_count} datasets with new images in the transfer plan.")
+
+    # Estimating duration of the upload from the sizes of the images before it starts.
+    estimate = TransferEstimate(scheduler.total_size(), expected_transfer_rate())
+
+    eta = estimate.eta()
+    sly.logger.info(
+        f"{format_size(estimate.total_bytes)} of images will be transferred, "
+        f"estimated time: {format_duration(eta) if eta is not None else 'unknown'}."
+    )
+    g.STATE.reporter.event(
+        "transfer_started",
+        datasets=datasets_count,
+        total_bytes=estimate.total_bytes,
+        eta=eta,
+    )
+
+    with g.STATE.reporter.progress(
+        UPLOAD_STAGE, "Uploading datasets...", datasets_count
+    ) as pbar:
+
+        def on_done(task: Task):
+            if task.kind == DATASET_TASK:
+                pbar.update(1)
+            elif task.size:
+                estimate.update(task.size)
+                g.STATE.reporter.event(
+                    "transfer_progress",
+                    done_bytes=estimate.done_bytes,
+                    total_bytes=estimate.total_bytes,
+                    eta=estimate.eta(),
+                )
+
+        scheduler.run(on_done)
+
+    save_transfer_rate(estimate)
+
+    if not g.STATE.continue_upload:
+        sly.logger.debug("Uploading of images was interrupted by the user.")
+
+    sly.logger.debug("Finished uploading datasets.")
+
+    save_batch_metrics()
+
+    # Stopping validation processes, they are not needed until the next upload.
+    shutdown_validation_pool()
+
+    if g.STATE.continue_upload and not g.STATE.failed_images:
+        # Transfer is finished, there is nothing to resume.
+        g.STATE.ledger.clear()
+
+    g.STATE.reporter.event(
+        "transfer_finished",
+        uploaded_annotated_images=g.STATE.uploaded_annotated_images,
+        uploaded_tagged_images=g.STATE.uploaded_tagged_images,
+        saved_bytes=g.STATE.saved_bytes,
+        failed_images=g.STATE.failed_images,
+        cancelled=not g.STATE.continue_upload,
+    )
+
+
+def unfinished_transfer() -> Optional[str]:
+    """Checks if there is an unfinished transfer, which was interrupted by the restart.
+
+    :return: name of the target team of the unfinished transfer, None if there is nothing to resume
+    :rtype: Optional[str]
+    """
+    if not g.STATE.ledger.has_records():
+        return
+    if not os.path.exists(g.DIFFERENCES_PLAN) and not os.path.exists(
+        g.LEGACY_DIFFERENCES_JSON
+    ):
+        return
+
+    team_name = g.STATE.ledger.get_info("target_team_name")
+    if team_name:
+        sly.logger.info(
+            f"Found unfinished transfer to the team {team_name}, it can be resumed."
+        )
+    return team_name
+
+
+def build_transfer_graph(plan_path: str) -> Scheduler:
+    """Builds the graph of the transfer from the plan: team -> workspace -> project ->
+    project meta and target dataset -> work units -> finished dataset. Missing team,
+    workspaces and projects are created once by their own tasks, project meta is pushed
+    once per project and the work units of different datasets run at the same time.
+    Datasets with many images are split into work units of WORK_UNIT_SIZE images, so
+    idle workers take units of large datasets instead of waiting for them at the end.
+    Only IDs and offsets are kept in the graph, records are read from the plan by the units.
+
+    :param plan_path: path to the file with the transfer plan
+    :type plan_path: str
+    :return: scheduler with the tasks of the transfer
+    :rtype: Scheduler
+    """
+    scheduler = Scheduler(
+        g.SCHEDULER_WORKERS,
+        should_continue=lambda: g.STATE.continue_upload,
+        name="transfer scheduler",
+    )
+    policy = PriorityPolicy(g.STATE.transfer_policy, g.STATE.pinned_projects)
+
+    # Units of the same dataset usually run together, so recent records are kept in memory.
+    read_record = lru_cache(maxsize=g.SCHEDULER_WORKERS)(partial(read_dataset, plan_path))
+
+    def prepare_dataset(
+        offset: int, known_project_id: Optional[int], project_id: Optional[int] = None
+    ) -> int:
+        dataset = read_record(offset)
+        if dataset["create_target"]:
+            # Creating target dataset only if it has images to upload.
+            target_dataset_id = ensure_target_dataset(
+                project_id or known_project_id, dataset["dataset"]
+            )
+        else:
+            target_dataset_id = dataset["target_id"]
+
+        sly.logger.debug(
+            f"Source dataset ID: {dataset['source_id']}. Target dataset ID: {target_dataset_id}."
+        )
+        return target_dataset_id
+
+    def transfer_unit(
+        offset: int,
+        group: str,
+        start: int,
+        end: int,
+        target_dataset_id: int,
+        project_metas: ProjectMetas,
+    ):
+        dataset = read_record(offset)
+        names = (dataset["workspace"], dataset["project"], dataset["dataset"])
+        source_dataset_id = dataset["source_id"]
+
+        columns = {column: values[start:end] for column, values in dataset[group].items()}
+        images = get_image_data(columns, str(source_dataset_id))
+        if images is None:
+            sly.logger.error(f"Failed to get images data for dataset {names[2]}.")
+            return
+
+        replaced_images = dataset["replaced_images"]
+        if replaced_images:
+            # Replacements are uploaded under temporary names, since the changed images are
+            # removed only after the whole dataset is transferred.
+            images = images._replace(
+                names=[
+                    replacement_name(name) if name in replaced_images else name
+                    for name in images.names
+                ]
+            )
+
+        # If source and target are the same instance, images are copied on the server side.
+        transfer = copy_images if g.STATE.same_instance else transfer_images
+        transferred = transfer(
+            images, source_dataset_id, target_dataset_id, project_metas, names
+        )
+
+        # Updating counter for annotated or tagged images.
+        with g.STATE.lock:
+            if group == "annotated_images":
+                g.STATE.uploaded_annotated_images += transferred
+            else:
+                g.STATE.uploaded_tagged_images += transferred
+
+        sly.logger.debug(
+            f"Transferred {transferred} of images {start}-{end} from {group} "
+            f"to dataset {names[2]}."
+        )
+
+    def finish_dataset(offset: int, target_dataset_id: int, *results):
+        dataset = read_record(offset)
+
+        if dataset["replaced_images"]:
+            # Changed images are replaced only after their replacements are transferred.
+            replace_images(dataset, target_dataset_id)
+
+        # Removing directory with downloaded images after uploading them.
+        directory = os.path.join(g.IMAGES_DIR, str(dataset["source_id"]))
+        rmtree(directory, ignore_errors=True)
+        sly.logger.debug(f"Removed directory {directory} after uploading images.")
+
+    team_task = None
+    workspace_tasks = {}
+    # Task which resolves ID of the target project and ID of the project, if it's known.
+    projects = {}
+    meta_tasks = {}
+
+    for (workspace_name, project_name, dataset_name, dataset), entry in zip(
+        read_plan(plan_path), load_index(plan_path)
+    ):
+        offset = entry[-1]
+        units = split_work_units(dataset)
+        dataset_size = sum(unit[-1] for unit in units)
+        if not units:
+            sly.logger.debug(f"Dataset {dataset_name} has no new images, skipping it.")
+            continue
+
+        project_key = (workspace_name, project_name)
+        if project_key not in projects:
+            known_project_id = dataset.get("target_project_id")
+            project_task = None
+            if known_project_id is None:
+                if team_task is None:
+                    team_task = scheduler.add("team", ensure_target_team, kind="team")
+                if workspace_name not in workspace_tasks:
+                    workspace_tasks[workspace_name] = scheduler.add(
+                        f"workspace {workspace_name}",
+                        partial(ensure_target_workspace, workspace_name),
+                        deps=[team_task],
+                        kind="workspace",
+                    )
+                project_task = scheduler.add(
+                    f"project {workspace_name}/{project_name}",
+                    partial(ensure_target_project, project_name),
+                    deps=[workspace_tasks[workspace_name]],
+                    kind="project",
+                )
+            projects[project_key] = (project_task, known_project_id)
+
+            # Project meta is updated once, before any images of the project are transferred.
+            meta_args = [dataset["source_id"], None, dataset.get("source_project_id")]
+            if project_task is None:
+                meta_args.append(known_project_id)
+            meta_tasks[project_key] = scheduler.add(
+                f"meta of project {workspace_name}/{project_name}",
+                partial(update_project_meta, *meta_args),
+                deps=[project_task],
+                kind="meta",
+            )
+
+        project_task, known_project_id = projects[project_key]
+        full_name = f"{workspace_name}/{project_name}/{dataset_name}"
+
+        dataset_task = scheduler.add(
+            f"dataset {full_name}",
+            partial(prepare_dataset, offset, known_project_id),
+            deps=[project_task],
+            kind="target_dataset",
+        )
+        unit_tasks = [
+            scheduler.add(
+                f"images {start}-{end} of {group} in {full_name}",
+                partial(transfer_unit, offset, group, start, end),
+                deps=[dataset_task, meta_tasks[project_key]],
+                kind="unit",
+                priority=policy.priority(project_name, dataset_size, unit_size),
+                size=unit_size,
+            )
+            for group, start, end, unit_size in units
+        ]
+        scheduler.add(
+            f"finish {full_name}",
+            partial(finish_dataset, offset),
+            deps=[dataset_task, *unit_tasks],
+            kind=DATASET_TASK,
+        )
+
+    # Creation of projects and updates of metas follow the priorities of their work units.
+    scheduler.propagate_priorities()
+
+    sly.logger.debug(
+        f"Built transfer graph with {len(scheduler.tasks)} tasks "
+        f"for {scheduler.count(DATASET_TASK)} datasets."
+    )
+
+    return scheduler
+
+
+def transfer_images(
+    images: ImagesData,
+    source_dataset_id: int,
+    target_dataset_id: int,
+    project_metas: ProjectMetas,
+    names: Tuple[str, str, str],
+) -> int:
+    """Transfers images with annotations from the source dataset to the target dataset in batches.
+    Batches are passed through the pipeline: download -> normalize -> upload -> attach annotations,
+    stages are connected with bounded queues, so the next batch is downloaded while the previous
+    one is uploaded. Several batches are uploaded at the same time and each batch carries its own
+    annotations, so they are attached right after the batch is uploaded.
+    Returns the number of transferred images.
+
+    :param images: ImagesData namedtuple with lists of image ids, names, paths and metas
+    :type images: ImagesData
+    :param source_dataset_id: ID of the source dataset in Supervisely instance
+    :type source_dataset_id: int
+    :param target_dataset_id: ID of the target dataset in Supervisely instance
+    :type target_dataset_id: int
+    :param project_metas: cached metas of the source and target projects
+    :type project_metas: ProjectMetas
+    :param names: names of the workspace, project and dataset (for logging and errors)
+    :type names: Tuple[str, str, str]
+    :return: number of transferred images
+    :rtype: int
+    """
+    workspace_name, project_name, dataset_name = names
+
+    # Skipping images, which were transferred before the restart.
+    finished, unannotated_images, unannotated_ids, images = split_recorded_images(
+        images, target_dataset_id, dataset_name
+    )
+
+    if g.STATE.deduplicate_by_hash:
+        # Images which content is already on the target instance are added by hashes.
+        existing_images, missing_images = split_existing_images(images)
+        sly.logger.debug(
+            f"{len(existing_images.ids)} images from dataset {dataset_name} are already "
+            "on the target instance and will be added by hashes."
+        )
+    else:
+        existing_images, missing_images = select_images(images, []), images
+
+    batches = chain(
+        make_batches(unannotated_images, ATTACH_ONLY, unannotated_ids),
+        make_batches(existing_images, UPLOAD_HASHES),
+        make_batches(missing_images, UPLOAD_BYTES),
+    )
+
+    def download_stage(batch: TransferBatch) -> TransferBatch:
+        if batch.mode != UPLOAD_BYTES:
+            # Only annotations are needed for the images, which bytes are not transferred.
+            data = None
+        elif g.STATE.in_memory_transfer:
+            data = download_images_to_memory(
+                batch.images, source_dataset_id, dataset_name
+            )
+        else:
+            data = download_images(batch.images, source_dataset_id, dataset_name)
+        annotations = download_annotations(
+            source_dataset_id,
+            batch.images.ids,
+            batch.images.updated_at,
+            project_metas,
+        )
+
+        batch = batch._replace(data=data, annotations=annotations)
+        mask = [
+            (data is None or item is not None) and annotation is not None
+            for item, annotation in zip(data or annotations, annotations)
+        ]
+        return drop_failed(batch, mask, dataset_name)
+
+    def normalize_stage(batch: TransferBatch) -> TransferBatch:
+        if not g.STATE.normalize_image_metadata:
+            return batch
+        metas = normalize_image_metadata(
+            batch.images.metas,
+            batch.images.ids,
+            batch.images.names,
+            workspace_name,
+            project_name,
+            dataset_name,
+        )
+        return batch._replace(images=batch.images._replace(metas=metas))
+
+    def upload_stage(batch: TransferBatch) -> TransferBatch:
+        if batch.mode == ATTACH_ONLY:
+            return batch
+
+        if batch.mode == UPLOAD_HASHES:
+            uploaded_ids = upload_images_by_hashes(
+                batch.images, target_dataset_id, dataset_name
+            )
+        else:
+            try:
+                uploaded_ids = upload_images_batch(
+                    batch.images, batch.data, target_dataset_id, dataset_name
+                )
+            finally:
+                # Releasing memory and removing images from the disk to keep only queued batches.
+                release_images_data(batch.data)
+
+        batch = batch._replace(data=None, uploaded_ids=uploaded_ids)
+        mask = [image_id is not None for image_id in uploaded_ids]
+        batch = drop_failed(batch, mask, dataset_name)
+        g.STATE.ledger.record_uploaded(
+            target_dataset_id, batch.images.ids, batch.uploaded_ids
+        )
+        return batch
+
+    def attach_stage(batch: TransferBatch) -> TransferBatch:
+        results = attach_annotations(
+            batch.uploaded_ids, batch.annotations, target_dataset_id, dataset_name
+        )
+
+        # Images without annotations stay in the ledger as uploaded and will be repaired.
+        batch = drop_failed(batch, results, dataset_name)
+        g.STATE.ledger.record_annotated(target_dataset_id, batch.images.ids)
+        return batch
+
+    # Batches are uploaded by several threads and annotations of each batch are attached
+    # as soon as it's uploaded, so one slow batch doesn't stall the others.
+    pipeline = Pipeline(
+        [download_stage, normalize_stage, upload_stage, attach_stage],
+        queue_size=g.PIPELINE_QUEUE_SIZE,
+        should_continue=lambda: g.STATE.continue_upload,
+        name=f"transfer of dataset {dataset_name}",
+        workers=[1, 1, g.UPLOAD_WORKERS, g.UPLOAD_WORKERS],
+    )
+    transferred_batches = pipeline.run(batches)
+
+    return finished + sum(len(batch.uploaded_ids) for batch in transferred_batches)
+
+
+def copy_images(
+    images: ImagesData,
+    source_dataset_id: int,
+    target_dataset_id: int,
+    project_metas: ProjectMetas,
+    names: Tuple[str, str, str],
+) -> int:
+    """Copies images with annotations to the target dataset on the server side, when source
+    and target datasets are on the same instance. Information about the source images is read
+    with the source API and images are added to the target dataset by it, so no image bytes
+    are transferred through the app and the target API doesn't need access to the source team.
+    Annotations are read with the source API (or from the cache) and attached with the target API.
+    Returns the number of copied images.
+
+    :param images: ImagesData namedtuple with lists of image ids, names, paths, metas, hashes and sizes
+    :type images: ImagesData
+    :param source_dataset_id: ID of the source dataset in Supervisely instance
+    :type source_dataset_id: int
+    :param target_dataset_id: ID of the target dataset in Supervisely instance
+    :type target_dataset_id: int
+    :param project_metas: cached metas of the source and target projects
+    :type project_metas: ProjectMetas
+    :param names: names of the workspace, project and dataset (for logging and errors)
+    :type names: Tuple[str, str, str]
+    :return: number of copied images
+    :rtype: int
+    """
+    workspace_name, project_name, dataset_name = names
+
+    # Skipping images, which were copied before the restart.
+    copied, unannotated_images, unannotated_ids, images = split_recorded_images(
+        images, target_dataset_id, dataset_name
+    )
+
+    batches = chain(
+        make_batches(unannotated_images, ATTACH_ONLY, unannotated_ids),
+        make_batches(images, UPLOAD_BYTES),
+    )
+
+    images_controller = g.STATE.batch_controllers["copy_images"]
+
+    def copy_annotations(batch: TransferBatch) -> TransferBatch:
+        annotations = download_annotations(
+            source_dataset_id,
+            batch.images.ids,
+            batch.images.updated_at,
+            project_metas,
+        )
+        batch = batch._replace(annotations=annotations)
+        batch = drop_failed(
+            batch, [annotation is not None for annotation in annotations], dataset_name
+        )
+
+        results = attach_annotations(
+            batch.uploaded_ids, batch.annotations, target_dataset_id, dataset_name
+        )
+
+        # Images without annotations stay in the ledger as uploaded and will be repaired.
+        batch = drop_failed(batch, results, dataset_name)
+        g.STATE.ledger.record_annotated(target_dataset_id, batch.images.ids)
+        return batch
+
+    def copy_stage(batch: TransferBatch) -> TransferBatch:
+        if batch.mode == ATTACH_ONLY:
+            return copy_annotations(batch)
+
+        metas = batch.images.metas
+        if g.STATE.normalize_image_metadata:
+            metas = normalize_image_metadata(
+                metas,
+                batch.images.ids,
+                batch.images.names,
+                workspace_name,
+                project_name,
+                dataset_name,
+            )
+
+        def copy(indices: List[int]) -> List[int]:
+            source_ids = [batch.images.ids[idx] for idx in indices]
+
+            # Source images are read with the source API, the target token may have
+            # no access to the source team.
+            with g.STATE.source_limit:
+                infos = g.source_api.image.get_info_by_id_batch(source_ids)
+
+            with g.STATE.target_limit:
+                copied_batch = g.STATE.target_api.image.upload_ids(
+                    target_dataset_id,
+                    [batch.images.names[idx] for idx in indices],
+                    source_ids,
+                    metas=[metas[idx] for idx in indices],
+                    infos=infos,
+                )
+            return [image.id for image in copied_batch]
+
+        def recover(indices: List[int]) -> List[Optional[int]]:
+            return find_uploaded_images(
+                target_dataset_id, [batch.images.names[idx] for idx in indices]
+            )
+
+        copied_ids = images_controller.run(
+            list(range(len(batch.images.ids))), copy, recover=recover
+        )
+        batch = batch._replace(uploaded_ids=copied_ids)
+        mask = [image_id is not None for image_id in copied_ids]
+        batch = drop_failed(batch, mask, dataset_name)
+        g.STATE.ledger.record_uploaded(
+            target_dataset_id, batch.images.ids, batch.uploaded_ids
+        )
+
+        batch = copy_annotations(batch)
+
+        sly.logger.debug(
+            f"Copied {len(batch.uploaded_ids)} images with annotations to dataset {dataset_name}."
+        )
+        return batch
+
+    # Batches are copied by several threads, each batch is copied with its annotations.
+    pipeline = Pipeline(
+        [copy_stage],
+        queue_size=g.PIPELINE_QUEUE_SIZE,
+        should_continue=lambda: g.STATE.continue_upload,
+        name=f"copying of dataset {dataset_name}",
+        workers=[g.UPLOAD_WORKERS],
+    )
+    copied_batches = pipeline.run(batches)
+
+    return copied + sum(len(batch.uploaded_ids) for batch in copied_batches)
+
+
+def split_work_units(dataset: dict) -> List[Tuple[str, int, int, int]]:
+    """Splits images of the dataset into work units of WORK_UNIT_SIZE images.
+
+    :param dataset: record of the dataset from the transfer plan
+    :type dataset: dict
+    :return: list of units: group of the images, start and end indices and size of the images in bytes
+    :rtype: List[Tuple[str, int, int, int]]
+    """
+    units = []
+    for group in IMAGE_GROUPS:
+        sizes = dataset[group]["sizes"]
+        for start in range(0, len(sizes), g.WORK_UNIT_SIZE):
+            end = min(start + g.WORK_UNIT_SIZE, len(sizes))
+            units.append((group, start, end, sum(size or 0 for size in sizes[start:end])))
+    return units
+
+
+def ensure_target_team() -> int:
+    """Finds or creates the target team and returns its ID."""
+    api = g.STATE.target_api
+    index = g.STATE.target_index
+    team_name = g.STATE.target_team_name
+
+    if index.team_id is None:
+        target_team = api.team.get_info_by_name(team_name) or api.team.create(team_name)
+        index.set_team(target_team.id)
+        sly.logger.debug(f"Team {team_name} is ready with ID {target_team.id}.")
+
+    return index.team_id
+
+
+def ensure_target_workspace(workspace_name: str, team_id: int) -> int:
+    """Creates the workspace in the target team, if it doesn't exist. Returns its ID.
+
+    :param workspace_name: name of the workspace in the target team
+    :type workspace_name: str
+    :param team_id: ID of the target team
+    :type team_id: int
+    :return: ID of the target workspace
+    :rtype: int
+    """
+    index = g.STATE.target_index
+
+    target_workspace = index.workspace(workspace_name)
+    if not target_workspace:
+        target_workspace = g.STATE.target_api.workspace.create(team_id, workspace_name)
+        index.add_workspace(target_workspace)
+        sly.logger.debug(
+            f"Workspace {workspace_name} is created with ID {target_workspace.id}."
+        )
+
+    return target_workspace.id
+
+
+def ensure_target_project(project_name: str, workspace_id: int) -> int:
+    """Creates the project in the target workspace, if it doesn't exist. Returns its ID.
+
+    :param project_name: name of the project in the target workspace
+    :type project_name: str
+    :param workspace_id: ID of the target workspace
+    :type workspace_id: int
+    :return: ID of the target project
+    :rtype: int
+    """
+    index = g.STATE.target_index
+
+    target_project = index.project(workspace_id, project_name)
+    if not target_project:
+        target_project = g.STATE.target_api.project.create(workspace_id, project_name)
+        index.add_project(target_project)
+        sly.logger.debug(
+            f"Project {project_name} is created with ID {target_project.id}."
+        )
+
+    return target_project.id
+
+
+def ensure_target_dataset(project_id: int, dataset_name: str) -> int:
+    """Creates the dataset in the target project, if it was not found while comparing.
+    Returns its ID.
+
+    :param project_id: ID of the target project
+    :type project_id: int
+    :param dataset_name: name of the dataset in the target project
+    :type dataset_name: str
+    :return: ID of the target dataset
+    :rtype: int
+    """
+    index = g.STATE.target_index
+
+    target_dataset = index.dataset(project_id, dataset_name)
+    if not target_dataset:
+        target_dataset = g.STATE.target_api.dataset.create(project_id, dataset_name)
+        index.add_dataset(target_dataset)
+        sly.logger.debug(
+            f"Dataset {dataset_name} is created with ID {target_dataset.id}."
+        )
+
+    return target_dataset.id
+
+
+def replacement_name(name: str) -> str:
+    """Returns the temporary name of the image, which replaces the changed image with the name.
+
+    :param name: name of the changed image
+    :type name: str
+    :return: temporary name with the same extension
+    :rtype: str
+    """
+    root, ext = os.path.splitext(name)
+    return f"{root}{REPLACEMENT_SUFFIX}{ext}"
+
+
+def replace_images(dataset: dict, target_dataset_id: int):
+    """Replaces changed images in the target dataset with the images, which were uploaded
+    under temporary names: changed images are removed and the replacements get their names.
+    Only replacements, which the ledger records as transferred with annotations, are used, so
+    changed images stay if their replacements failed. Target dataset is listed first and
+    images which were already removed or renamed are skipped, so the step can be repeated
+    after the restart.
+
+    :param dataset: record of the dataset from the transfer plan
+    :type dataset: dict
+    :param target_dataset_id: ID of the target dataset
+    :type target_dataset_id: int
+    """
+    replaced_images = dataset["replaced_images"]
+    dataset_name = dataset["dataset"]
+
+    source_ids = {
+        name: image_id
+        for group in IMAGE_GROUPS
+        for image_id, name in zip(dataset[group]["ids"], dataset[group]["names"])
+        if name in replaced_images
+    }
+    records = g.STATE.ledger.get(target_dataset_id, list(source_ids.values()))
+    replacements = {
+        name: records[source_id][0]
+        for name, source_id in source_ids.items()
+        if records.get(source_id, (None, None))[1] == ledger.ANNOTATED
+    }
+    if not replacements:
+        sly.logger.debug(f"No changed images to replace in dataset {dataset_name}.")
+        return
+
+    with g.STATE.target_limit:
+        target_images = g.STATE.target_client.list_images(target_dataset_id)
+    names_by_id = {image.id: image.name for image in target_images}
+
+    removed_ids = [
+        replaced_images[name]
+        for name in replacements
+        if replaced_images[name] in names_by_id
+    ]
+    for batch_ids in sly.batched(removed_ids, batch_size=g.BATCH_SIZE):
+        with g.STATE.target_limit:
+            g.STATE.target_api.image.remove_batch(batch_ids)
+
+    renamed = 0
+    for name, image_id in replacements.items():
+        if image_id not in names_by_id:
+            sly.logger.warning(
+                f"Replacement of the image {name} with ID {image_id} is not found "
+                f"in target dataset {dataset_name}."
+            )
+            continue
+        if names_by_id[image_id] != name:
+            with g.STATE.target_limit:
+                g.STATE.target_api.post("images.editInfo", {"id": image_id, "name": name})
+            renamed += 1
+
+    sly.logger.debug(
+        f"Removed {len(removed_ids)} changed images and renamed {renamed} replacements "
+        f"in target dataset {dataset_name}."
+    )
+
+
+def download_images(
+    images: ImagesData, source_dataset_id: int, dataset_name: str
+) -> List[Optional[str]]:
+    """Download the batch of images from the source dataset to the local directory.
+
+    :param images: ImagesData namedtuple with lists of image ids, names, paths, metas, hashes and sizes
+    :type images: ImagesData
+    :param source_dataset_id: ID of the source dataset in Supervisely instance
+    :type source_dataset_id: int
+    :param dataset_name: name of the dataset (for convinient logging)
+    :type dataset_name: str
+    :return: list of paths to the downloaded images, None for the images which failed to download
+    :rtype: List[Optional[str]]
+    """
+    controller = g.STATE.batch_controllers["download_images"]
+
+    def download(batch: List[Tuple[int, str]]) -> List[bool]:
+        batch_ids, batch_paths = zip(*batch)
+        with g.STATE.source_limit:
+            g.source_api.image.download_paths(
+                source_dataset_id, list(batch_ids), list(batch_paths)
+            )
+        return [True] * len(batch)
+
+    # Waiting for the bandwidth, which is shared by all work units of the transfer.
+    g.STATE.source_bandwidth.consume(sum(size or 0 for size in images.sizes))
+
+    results = controller.run(
+        list(zip(images.ids, images.paths)), download, sizes=images.sizes
+    )
+
+    sly.logger.debug(f"Downloaded {len(images.ids)} images from dataset {dataset_name}.")
+
+    return [path if result else None for path, result in zip(images.paths, results)]
+
+
+def make_batches(
+    images: ImagesData, mode: str, uploaded_ids: Optional[List[int]] = None
+) -> Iterator[TransferBatch]:
+    """Splits images into batches for the transfer pipeline.
+
+    :param images: ImagesData namedtuple with lists of image ids, names, paths, metas, hashes and sizes
+    :type images: ImagesData
+    :param mode: mode of the batches (UPLOAD_BYTES, UPLOAD_HASHES or ATTACH_ONLY)
+    :type mode: str
+    :param uploaded_ids: IDs of the images in the target dataset, if they were uploaded before
+    :type uploaded_ids: Optional[List[int]]
+    :return: generator of batches
+    :rtype: Iterator[TransferBatch]
+    """
+    # Size of the pipeline batches follows the adaptive batch size of the image downloads.
+    controller = g.STATE.batch_controllers["download_images"]
+
+    start = 0
+    while start < len(images.ids):
+        end = start + controller.batch_size
+        batch_images = ImagesData(*[field[start:end] for field in images])
+        batch_uploaded_ids = uploaded_ids[start:end] if uploaded_ids else None
+        yield TransferBatch(batch_images, mode, None, None, batch_uploaded_ids)
+        start = end
+
+
+def drop_failed(
+    batch: TransferBatch, mask: List[bool], dataset_name: str
+) -> TransferBatch:
+    """Removes the images which failed to be processed (after all retries) from the batch,
+    so the rest of the batch can be transferred.
+
+    :param batch: batch of images in the transfer pipeline
+    :type batch: TransferBatch
+    :param mask: list of flags, False for the images which failed to be processed
+    :type mask: List[bool]
+    :param dataset_name: name of the dataset (for convinient logging)
+    :type dataset_name: str
+    :return: batch without failed images
+    :rtype: TransferBatch
+    """
+    if all(mask):
+        return batch
+
+    failed_ids = [image_id for image_id, flag in zip(batch.images.ids, mask) if not flag]
+    sly.logger.error(
+        f"Images with IDs {failed_ids} from dataset {dataset_name} failed to transfer "
+        "and were skipped."
+    )
+    with g.STATE.lock:
+        g.STATE.failed_images += len(failed_ids)
+
+    if batch.data is not None:
+        # Releasing downloaded data of the skipped images.
+        release_images_data(
+            [item for item, flag in zip(batch.data, mask) if not flag and item is not None]
+        )
+
+    def select(values: Optional[list]) -> Optional[list]:
+        if values is None:
+            return
+        return [value for value, flag in zip(values, mask) if flag]
+
+    return batch._replace(
+        images=select_images(batch.images, mask),
+        data=select(batch.data),
+        annotations=select(batch.annotations),
+        uploaded_ids=select(batch.uploaded_ids),
+    )
+
+
+def split_recorded_images(
+    images: ImagesData, target_dataset_id: int, dataset_name: str
+) -> Tuple[int, ImagesData, List[int], ImagesData]:
+    """Checks the transfer ledger for the images, which were transferred before the restart.
+    Finished images are skipped, images which were uploaded without annotations are returned
+    with their IDs in the target dataset, so only annotations will be attached to them.
+
+    :param images: ImagesData namedtuple with lists of image ids, names, paths, metas, hashes and sizes
+    :type images: ImagesData
+    :param target_dataset_id: ID of the target dataset in Supervisely instance
+    :type target_dataset_id: int
+    :param dataset_name: name of the dataset (for convinient logging)
+    :type dataset_name: str
+    :return: number of finished images, ImagesData of images without annotations, their IDs
+        in the target dataset and ImagesData of images which were not transferred
+    :rtype: Tuple[int, ImagesData, List[int], ImagesData]
+    """
+    records = g.STATE.ledger.get(target_dataset_id, images.ids)
+
+    finished = sum(status == ledger.ANNOTATED for _, status in records.values())
+    unannotated_mask = [
+        records.get(image_id, (None, None))[1] == ledger.UPLOADED for image_id in images.ids
+    ]
+    remaining_mask = [image_id not in records for image_id in images.ids]
+
+    unannotated_images = select_images(images, unannotated_mask)
+    unannotated_ids = [records[image_id][0] for image_id in unannotated_images.ids]
+
+    if records:
+        sly.logger.info(
+            f"Resuming transfer of dataset {dataset_name}: {finished} images are finished, "
+            f"{len(unannotated_ids)} images need annotations."
+        )
+
+    return finished, unannotated_images, unannotated_ids, select_images(images, remaining_mask)
+
+
+def select_images(images: ImagesData, mask: List[bool]) -> ImagesData:
+    """Returns ImagesData with the images for which mask is True.
+
+    :param images: ImagesData namedtuple with lists of image ids, names, paths, metas, hashes and sizes
+    :type images: ImagesData
+    :param mask: list of flags for the images
+    :type mask: List[bool]
+    :return: ImagesData namedtuple with selected images
+    :rtype: ImagesData
+    """
+    return ImagesData(
+        *[[value for value, flag in zip(field, mask) if flag] for field in images]
+    )
+
+
+def split_existing_images(images: ImagesData) -> Tuple[ImagesData, ImagesData]:
+    """Checks hashes of the images on the target instance with one bulk request and splits
+    images into the ones which content is already on the target instance and missing ones.
+
+    :param images: ImagesData namedtuple with lists of image ids, names, paths, metas, hashes and sizes
+    :type images: ImagesData
+    :return: tuple with ImagesData of existing and missing images
+    :rtype: Tuple[ImagesData, ImagesData]
+    """
+    hashes = list({image_hash for image_hash in images.hashes if image_hash})
+    existing_hashes = set()
+    if hashes:
+        existing_hashes = set(g.STATE.target_api.image.check_existing_hashes(hashes))
+
+    mask = [image_hash in existing_hashes for image_hash in images.hashes]
+    return select_images(images, mask), select_images(images, [not flag for flag in mask])
+
+
+def download_images_to_memory(
+    images: ImagesData, source_dataset_id: int, dataset_name: str
+) -> List[Union[bytes, str]]:
+    """Download the batch of images from the source dataset to memory. If the memory budget
+    is exceeded, images are saved to the local directory instead.
+
+    :param images: ImagesData namedtuple with lists of image ids, names, paths and metas
+    :type images: ImagesData
+    :param source_dataset_id: ID of the source dataset in Supervisely instance
+    :type source_dataset_id: int
+    :param dataset_name: name of the dataset (for convinient logging)
+    :type dataset_name: str
+    :return: list with bytes of the images or paths to the images, which were saved to disk,
+        None for the images which failed to download
+    :rtype: List[Union[bytes, str, None]]
+    """
+    controller = g.STATE.batch_controllers["download_images"]
+
+    def download(batch_ids: List[int]) -> List[bytes]:
+        with g.STATE.source_limit:
+            return g.STATE.source_client.download_images(source_dataset_id, batch_ids)
+
+    # Waiting for the bandwidth, which is shared by all work units of the transfer.
+    g.STATE.source_bandwidth.consume(sum(size or 0 for size in images.sizes))
+
+    images_bytes = controller.run(images.ids, download, sizes=images.sizes)
+
+    data = []
+    for image_bytes, path in zip(images_bytes, images.paths):
+        if image_bytes is None:
+            data.append(None)
+        elif g.STATE.memory_budget.acquire(len(image_bytes)):
+            data.append(image_bytes)
+        else:
+            # Spilling image to the disk if the memory budget is exceeded.
+            with open(path, "wb") as f:
+                f.write(image_bytes)
+            data.append(path)
+
+    spilled = sum(isinstance(item, str) for item in data)
+    sly.logger.debug(
+        f"Downloaded {len(data)} images from dataset {dataset_name} to memory, "
+        f"{spilled} of them were saved to disk."
+    )
+
+    return data
+
+
+def release_images_data(data: List[Union[bytes, str]]):
+    """Releases memory budget for the images kept in memory and removes images saved on disk.
+
+    :param data: list with bytes of the images or paths to the images
+    :type data: List[Union[bytes, str]]
+    """
+    for item in data:
+        if isinstance(item, bytes):
+            g.STATE.memory_budget.release(len(item))
+        elif item is not None:
+            sly.fs.silent_remove(item)
+
+
+def update_project_meta(
+    source_dataset_id: int,
+    target_dataset_id: int,
+    source_project_id: Optional[int] = None,
+    target_project_id: Optional[int] = None,
+) -> ProjectMetas:
+    """Updates the meta in target instance with the meta from source instance. Returns the metas
+    of the source project and the target project after the update.
+    Metas are cached by project ID and the target meta is updated only if its content differs
+    from the source meta, so it's done at most once per project.
+
+    :param source_dataset_id: the id of the source dataset
+    :type source_dataset_id: int
+    :param target_dataset_id: the id of the target dataset
+    :type target_dataset_id: int
+    :param source_project_id: the id of the source project, if it's known
+    :type source_project_id: Optional[int]
+    :param target_project_id: the id of the target project, if it's known
+    :type target_project_id: Optional[int]
+    :return: cached metas of the source and target projects
+    :rtype: ProjectMetas
+    """
+    if source_project_id is None:
+        source_project_id = g.source_api.dataset.get_info_by_id(
+            source_dataset_id
+        ).project_id
+
+    sly.logger.debug(f"Retrieved source project ID: {source_project_id}.")
+
+    # Retrieving project meta from the cache or from the source instance.
+    source_entry = g.STATE.source_meta_cache.get(source_project_id)
+
+    sly.logger.debug(
+        f"Successfully retrieved project meta for dataset {source_dataset_id}."
+    )
+
+    if target_project_id is None:
+        target_project_id = g.STATE.target_api.dataset.get_info_by_id(
+            target_dataset_id
+        ).project_id
+
+    sly.logger.debug(f"Retrieved target project ID: {target_project_id}.")
+
+    # Updating project meta in target instance, if it differs from the source meta.
+    target_entry = g.STATE.target_meta_cache.push(target_project_id, source_entry)
+
+    sly.logger.debug(
+        f"Project meta for dataset {target_dataset_id} is up to date."
+    )
+
+    return ProjectMetas(source_entry, target_entry)
+
+
+def download_annotations(
+    source_dataset_id: int,
+    image_ids: List[int],
+    updated_at: List[Optional[str]],
+    project_metas: ProjectMetas,
+) -> List[Optional[dict]]:
+    """Download annotations for the images in the source dataset.
+
+    :param source_dataset_id: the id of the source dataset
+    :type source_dataset_id: int
+    :param image_ids: list of ids of images
+    :type image_ids: List[int]
+    :param updated_at: updated_at of the images in the same order as image IDs, cached
+        annotations of the images which were updated after the comparison are not used
+    :type updated_at: List[Optional[str]]
+    :param project_metas: cached metas of the source and target projects
+    :type project_metas: ProjectMetas
+    :return: list of annotation JSONs for the target project, None for the annotations
+        which failed to download or validate
+    :rtype: List[Optional[dict]]
+    """
+    sly.logger.debug(
+        f"Starting download of annotations from dataset with id {source_dataset_id}."
+    )
+
+    # Reading annotations, which were downloaded on comparison, from the cache.
+    cached_jsons = {}
+    for image_id, image_updated_at in zip(image_ids, updated_at):
+        annotation_json = g.STATE.annotation_cache.get(image_id, image_updated_at)
+        if annotation_json is not None:
+            cached_jsons[image_id] = annotation_json
+
+    missing_ids = [image_id for image_id in image_ids if image_id not in cached_jsons]
+
+    sly.logger.debug(
+        f"Found {len(cached_jsons)} annotations in cache, {len(missing_ids)} will be downloaded."
+    )
+
+    # Retrieving AnnotationInfo objects for the images, which are missing in the cache.
+    if missing_ids:
+        controller = g.STATE.batch_controllers["download_annotations"]
+
+        def download(batch_ids: List[int]) -> List[dict]:
+            with g.STATE.source_limit:
+                annotation_infos = g.STATE.source_client.download_annotations(
+                    source_dataset_id, batch_ids
+                )
+            return [annotation_info.annotation for annotation_info in annotation_infos]
+
+        missing_jsons = controller.run(missing_ids, download)
+        for image_id, annotation_json in zip(missing_ids, missing_jsons):
+            if annotation_json is not None:
+                cached_jsons[image_id] = annotation_json
+
+    # Converting AnnotationInfo objects to JSON in the order of the image IDs.
+    annotation_jsons = [cached_jsons.get(image_id) for image_id in image_ids]
+
+    if g.STATE.validate_annotations and g.VALIDATION_WORKERS > 0:
+        # Full Annotation objects are built in the pool of processes.
+        annotation_jsons = validate_annotations_in_pool(
+            annotation_jsons,
+            project_metas.source.json,
+            project_metas.source.fingerprint,
+            g.VALIDATION_WORKERS,
+            g.VALIDATION_CHUNK_SIZE,
+        )
+    elif g.STATE.validate_annotations:
+        # Full Annotation objects are built only if the validation is requested.
+        annotation_jsons = validate_annotations(
+            annotation_jsons, project_metas.source.json, project_metas.source.fingerprint
+        )
+
+    # Replacing IDs of classes and tags with IDs from the target project meta.
+    class_ids, tag_ids = meta_ids(project_metas.target.json)
+    annotations = [
+        remap_annotation(json, class_ids, tag_ids) if json is not None else None
+        for json in annotation_jsons
+    ]
+
+    sly.logger.debug(
+        f"Downloaded {len(annotations)} annotations from dataset with id {source_dataset_id}."
+    )
+
+    return annotations
+
+
+def upload_images_batch(
+    images: ImagesData,
+    data: List[Union[bytes, str]],
+    target_dataset_id: int,
+    dataset_name: str,
+) -> List[int]:
+    """Upload the batch of downloaded images to the target dataset. Images are uploaded
+    from memory or from disk, depending on the type of the data item.
+
+    :param images: ImagesData namedtuple with lists of image ids, names, paths and metas
+    :type images: ImagesData
+    :param data: list with bytes of the images or paths to the images on disk
+    :type data: List[Union[bytes, str]]
+    :param target_dataset_id: ID of the target dataset in Supervisely instance
+    :type target_dataset_id: int
+    :param dataset_name: name of the dataset (for convinient logging)
+    :type dataset_name: str
+    :return: list of IDs of the uploaded images in the target dataset, None for the images
+        which failed to upload
+    :rtype: List[Optional[int]]
+    """
+    controller = g.STATE.batch_controllers["upload_images"]
+
+    def upload(indices: List[int]) -> List[int]:
+        names = [images.names[idx] for idx in indices]
+        metas = [images.metas[idx] for idx in indices]
+        items = [data[idx] for idx in indices]
+
+        if all(isinstance(item, str) for item in items):
+            with g.STATE.target_limit:
+                uploaded_batch = g.STATE.target_api.image.upload_paths(
+                    target_dataset_id, names, items, metas=metas
+                )
+        else:
+            # Images which were saved to disk because of the memory budget are read back.
+            images_bytes = [read_image_bytes(item) for item in items]
+            hashes = [get_bytes_hash(image_bytes) for image_bytes in images_bytes]
+
+            # Uploading image bytes and adding images to the dataset by their hashes.
+            with g.STATE.target_limit:
+                uploaded_batch = g.STATE.target_client.upload_images(
+                    target_dataset_id, names, images_bytes, hashes, metas
+                )
+
+        # Getting list of image ids for the uploaded images, None for the failed ones.
+        return [image.id if image is not None else None for image in uploaded_batch]
+
+    # Waiting for the bandwidth, which is shared by all work units of the transfer.
+    g.STATE.target_bandwidth.consume(sum(size or 0 for size in images.sizes))
+
+    def recover(indices: List[int]) -> List[Optional[int]]:
+        return find_uploaded_images(
+            target_dataset_id, [images.names[idx] for idx in indices]
+        )
+
+    uploaded_ids = controller.run(
+        list(range(len(images.ids))), upload, sizes=images.sizes, recover=recover
+    )
+
+    sly.logger.debug(f"Uploaded {len(images.names)} images to dataset {dataset_name}.")
+
+    return uploaded_ids
+
+
+def upload_images_by_hashes(
+    images: ImagesData, target_dataset_id: int, dataset_name: str
+) -> List[int]:
+    """Adds the batch of images, which content is already on the target instance, to the target
+    dataset by hashes without transferring bytes. Sizes of the images are counted as saved bytes.
+
+    :param images: ImagesData namedtuple with lists of image ids, names, paths, metas, hashes and sizes
+    :type images: ImagesData
+    :param target_dataset_id: ID of the target dataset in Supervisely instance
+    :type target_dataset_id: int
+    :param dataset_name: name of the dataset (for convinient logging)
+    :type dataset_name: str
+    :return: list of IDs of the uploaded images in the target dataset, None for the images
+        which failed to upload
+    :rtype: List[Optional[int]]
+    """
+    controller = g.STATE.batch_controllers["upload_hashes"]
+
+    def upload(indices: List[int]) -> List[int]:
+        with g.STATE.target_limit:
+            uploaded_batch = g.STATE.target_api.image.upload_hashes(
+                target_dataset_id,
+                [images.names[idx] for idx in indices],
+                [images.hashes[idx] for idx in indices],
+                metas=[images.metas[idx] for idx in indices],
+            )
+        return [image.id for image in uploaded_batch]
+
+    def recover(indices: List[int]) -> List[Optional[int]]:
+        return find_uploaded_images(
+            target_dataset_id, [images.names[idx] for idx in indices]
+        )
+
+    uploaded_ids = controller.run(list(range(len(images.ids))), upload, recover=recover)
+
+    saved_bytes = sum(
+        size or 0
+        for size, image_id in zip(images.sizes, uploaded_ids)
+        if image_id is not None
+    )
+    with g.STATE.lock:
+        g.STATE.saved_bytes += saved_bytes
+
+    sly.logger.debug(
+        f"Added {len(images.names)} images to dataset {dataset_name} by hashes, "
+        f"saved {saved_bytes} bytes."
+    )
+
+    return uploaded_ids
+
+
+def find_uploaded_images(target_dataset_id: int, names: List[str]) -> List[Optional[int]]:
+    """Finds images with the names in the target dataset. Adding images to the dataset is not
+    idempotent, so before the failed upload is retried, images which were added by it are found
+    and not uploaded again. Only the images of the batch are listed, not the whole dataset.
+
+    :param target_dataset_id: ID of the target dataset in Supervisely instance
+    :type target_dataset_id: int
+    :param names: names of the images
+    :type names: List[str]
+    :return: list of IDs of the images in the target dataset, None for the missing images
+    :rtype: List[Optional[int]]
+    """
+    with g.STATE.target_limit:
+        target_images = g.STATE.target_api.image.get_list(
+            target_dataset_id,
+            filters=[{"field": "name", "operator": "in", "value": names}],
+        )
+    ids_by_name = {image.name: image.id for image in target_images}
+    return [ids_by_name.get(name) for name in names]
+
+
+def read_image_bytes(item: Union[bytes, str]) -> bytes:
+    """Returns bytes of the image kept in memory or saved on disk."""
+    if isinstance(item, bytes):
+        return item
+    with open(item, "rb") as f:
+        return f.read()
+
+
+def attach_annotations(
+    uploaded_image_ids: List[int],
+    annotations: List[dict],
+    target_dataset_id: int,
+    dataset_name: str,
+) -> List[bool]:
+    """Upload annotation JSONs for the uploaded images to the target dataset.
+
+    :param uploaded_image_ids: list of IDs of the uploaded images in the target dataset
+    :type uploaded_image_ids: List[int]
+    :param annotations: list of annotation JSONs in the same order as image IDs
+    :type annotations: List[dict]
+    :param target_dataset_id: ID of the target dataset in Supervisely instance
+    :type target_dataset_id: int
+    :param dataset_name: name of the dataset (for convinient logging)
+    :type dataset_name: str
+    :return: list of flags, False for the annotations which failed to upload
+    :rtype: List[bool]
+    """
+    controller = g.STATE.batch_controllers["upload_annotations"]
+
+    def upload(indices: List[int]) -> List[bool]:
+        with g.STATE.target_limit:
+            g.STATE.target_client.upload_annotations(
+                target_dataset_id,
+                [uploaded_image_ids[idx] for idx in indices],
+                [annotations[idx] for idx in indices],
+            )
+        return [True] * len(indices)
+
+    results = controller.run(list(range(len(uploaded_image_ids))), upload)
+
+    sly.logger.debug(
+        f"Uploaded {len(annotations)} annotations to dataset {dataset_name}."
+    )
+
+    return [result is not None for result in results]
+
+
+def get_image_data(images: Dict[str, list], directory: str) -> ImagesData:
+    """Reads image IDs, names and metas from the plan and prepares paths to the images.
+
+    :param images: lists of values for each field of the images from the plan
+    :type images: Dict[str, list]
+    :param directory: name of the directory for the images of the dataset in IMAGES_DIR,
+        ID of the source dataset is used, since datasets in different projects can have same names
+    :type directory: str
+    :return: ImagesData namedtuple, containing lists of image ids, names, paths and metas
+    :rtype: ImagesData
+    """
+    image_ids = images["ids"]
+    image_names = images["names"]
+    image_metas = images["metas"]
+    image_hashes = images["hashes"]
+    image_sizes = images["sizes"]
+    # Plans, which were saved by the previous version of the app, don't have updated_at.
+    image_updated_at = images.get("updated_at") or [None] * len(image_ids)
+
+    sly.logger.debug(f"Readed {len(image_ids)} image IDs and names.")
+
+    if len(image_ids) == len(image_names) == len(image_metas):
+        # Checking if all three lists have the same length.
+        sly.logger.debug("All three lists have the same length.")
+    else:
+        sly.logger.error(
+            "At least one of the lists (ids, names, metas) has different length."
+        )
+        g.STATE.reporter.error(
+            "Bad image data",
+            "There was an error while reading image data. Try to load image data again.",
+        )
+        return
+
+    # Creating list of paths to the images in the local directory.
+    paths = [
+        os.path.join(g.IMAGES_DIR, directory, image_name)
+        for image_name in image_names
+    ]
+    os.makedirs(os.path.join(g.IMAGES_DIR, directory), exist_ok=True)
+
+    # Creating namedtuple with the lists of image ids, names, paths and metas.
+    images_data = ImagesData(
+        image_ids,
+        image_names,
+        paths,
+        image_metas,
+        image_hashes,
+        image_sizes,
+        image_updated_at,
+    )
+
+    return images_data
+
+
+def normalize_image_metadata(
+    image_metas: List[Dict],
+    image_ids,
+    image_names,
+    workspace_name,
+    project_name,
+    dataset_name,
+) -> List[Dict]:
+    """Updates the image metadata dict to match the format of the target dataset (Assets).
+
+    :param image_metas: list of dicts with image metadata
+    :type image_metas: List[Dict]
+    :return: updated list of dicts with image metadata
+    :rtype: List[Dict]
+
+    :Assets instance metadtata format:
+    TARGET_METADATA_FIELDS = ["URL", "License", "Author"]
+
+    :Possible metadata fields in the source dataset:
+    SOURCE_URL_FIELDS = ["Flickr image URL", "Pexels image URL", "Source URL", "URL"]
+    SOURCE_AUTHOR_FIELDS = ["Flickr owner id", "Photographer name", "Author"]
+    SOURCE_LICENSE_FIELDS = ["License", "license", None]
+    """
+
+    new_image_metas = []
+
+    for image_meta, image_id, image_name in zip(image_metas, image_ids, image_names):
+        new_image_meta = {}
+        new_image_meta["URL"] = (
+            image_meta.get("Flickr image URL")
+            or image_meta.get("Pexels image URL")
+            or image_meta.get("Source URL")
+            or image_meta.get("URL")
+        )
+        new_image_meta["Author"] = (
+            image_meta.get("Flickr owner id")
+            or image_meta.get("Photographer name")
+            or image_meta.get("Author")
+        )
+
+        new_image_meta["License"] = (
+            image_meta.get("License") or image_meta.get("license") or "Pexels license"
+        )
+
+        if any(value is None for value in new_image_meta.values()):
+            error = (
+                f"Image missing at least one metadata field. "
+                f"Workspace: {workspace_name}, project: {project_name}, dataset: {dataset_name}, "
+                f"image id: {image_id}, image name: {image_name}."
+            )
+
+            sly.logger.error(error)
+            g.STATE.reporter.error("Missing metadata field", error)
+
+        new_image_metas.append(new_image_meta)
+
+    return new_image_metas
+
+
+def save_batch_metrics():
+    """Logs the metrics of the batch controllers and saves them to the JSON file."""
+    metrics = [
+        controller.metrics() for controller in g.STATE.batch_controllers.values()
+    ]
+    for endpoint_metrics in metrics:
+        sly.logger.info(f"Batch metrics: {endpoint_metrics}")
+
+    with open(g.BATCH_METRICS_JSON, "w", encoding="utf-8") as f:
+        json.dump(metrics, f, indent=4)
+
+    sly.logger.debug(f"Batch metrics were saved to {g.BATCH_METRICS_JSON}.")
+
+
+def expected_transfer_rate() -> Optional[float]:
+    """Returns the transfer rate of the last upload in bytes per second, limited by the
+    bandwidth limit, None if it's unknown."""
+    rate = None
+    if os.path.exists(g.TRANSFER_RATE_JSON):
+        with open(g.TRANSFER_RATE_JSON, "r", encoding="utf-8") as f:
+            rate = json.load(f).get("bytes_per_second")
+
+    if g.TRANSFER_BANDWIDTH_BYTES:
+        rate = min(rate or g.TRANSFER_BANDWIDTH_BYTES, g.TRANSFER_BANDWIDTH_BYTES)
+
+    return rate
+
+
+def save_transfer_rate(estimate: TransferEstimate):
+    """Saves the measured transfer rate, so it can be used to estimate the next upload.
+
+    :param estimate: estimate of the finished upload
+    :type estimate: TransferEstimate
+    """
+    if not estimate.done_bytes:
+        return
+
+    with open(g.TRANSFER_RATE_JSON, "w", encoding="utf-8") as f:
+        json.dump({"bytes_per_second": estimate.rate()}, f)
+
+    sly.logger.debug(f"Transfer rate {format_size(estimate.rate())}/s was saved.")
+
+
+def format_duration(seconds: float) -> str:
+    """Returns the duration in human readable format."""
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours} h {minutes} min"
+    if minutes:
+        return f"{minutes} min {seconds} s"
+    return f"{seconds} s"
+
+
+def format_size(size: int) -> str:
+    """Returns human-readable size in bytes.
+
+    :param size: size in bytes
+    :type size: int
+    :return: size with units
+    :rtype: str
+    """
+    for unit in ["B", "KB", "MB", "GB"]:
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
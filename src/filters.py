@@ -0,0 +1,414 @@
+import re
+
+from collections import Counter, namedtuple
+from typing import Callable, List, Optional
+
+import supervisely as sly
+
+# Token of the filter expression: kind of the token, its value and position in the expression.
+Token = namedtuple("Token", ["kind", "value", "position"])
+
+# Summary of the annotation, which is calculated once and used by all predicates:
+# number of objects of each class, geometry types of the objects and values of the tags.
+AnnotationSummary = namedtuple("AnnotationSummary", ["classes", "geometries", "tags"])
+
+TOKEN_PATTERN = re.compile(
+    r"""
+    (?P<space>\s+)
+    |(?P<number>-?\d+(?:\.\d+)?)
+    |(?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+    |(?P<op>==|!=|>=|<=|>|<)
+    |(?P<punct>[()\[\],.])
+    |(?P<name>[A-Za-z_][A-Za-z0-9_]*)
+    """,
+    re.VERBOSE,
+)
+
+KEYWORDS = ["and", "or", "not", "in"]
+
+# Marker of the value, which is unknown until the annotation is downloaded.
+_UNKNOWN = object()
+
+# Marker of the missing tag or metadata key, which is different from the tag without value
+# (or the key with null value): "tag.x == null" is true only if the tag exists.
+_MISSING = object()
+
+# Fields which are available in the images listing, they are checked before the annotations
+# are downloaded.
+LISTING_FIELDS = {
+    "name": lambda image: image.name,
+    "width": lambda image: image.width,
+    "height": lambda image: image.height,
+    "size": lambda image: image.size,
+    "labels": lambda image: image.labels_count,
+}
+
+# Fields of the annotation, which contain sets of values: expression "class == 'car'"
+# is true if any object of the image has class "car".
+SET_FIELDS = {
+    "class": lambda summary: set(summary.classes),
+    "geometry": lambda summary: summary.geometries,
+    "tag": lambda summary: set(summary.tags),
+}
+
+# Operators for the single values.
+OPERATORS = {
+    "==": lambda left, right: left == right,
+    "!=": lambda left, right: left != right,
+    ">": lambda left, right: left > right,
+    ">=": lambda left, right: left >= right,
+    "<": lambda left, right: left < right,
+    "<=": lambda left, right: left <= right,
+    "in": lambda left, right: left in right,
+    "not in": lambda left, right: left not in right,
+}
+
+# Operators for the sets of values.
+SET_OPERATORS = {
+    "==": lambda values, right: right in values,
+    "!=": lambda values, right: right not in values,
+    "in": lambda values, right: bool(values.intersection(right)),
+    "not in": lambda values, right: not values.intersection(right),
+}
+
+
+class FilterError(ValueError):
+    """Raised if the filter expression can't be parsed."""
+
+
+class ImageFilter:
+    """Filter of the images, compiled from the expression. Expression consists of comparisons,
+    combined with "and", "or", "not" and parentheses, for example:
+    class in ("car", "person") and objects["car"] >= 2 and width >= 1024 and meta.license == "CC0"
+
+    Available fields:
+    name, width, height, size, labels (number of labels) - fields of the images listing;
+    meta.<key> or meta["<key>"] - field of the image metadata;
+    class, geometry, tag - class names, geometry types and tag names of the image (true if any matches);
+    tag.<name> or tag["<name>"] - value of the image tag (null for the tag without value);
+    objects - number of objects, objects.<class> or objects["<class>"] - number of objects of the class.
+
+    :param expression: filter expression
+    :type expression: str
+    :param predicate: compiled predicate
+    :type predicate: Callable
+    :param needs_annotation: True if the expression uses fields of the annotation
+    :type needs_annotation: bool
+    """
+
+    def __init__(self, expression: str, predicate: Callable, needs_annotation: bool):
+        self.expression = expression
+        self.needs_annotation = needs_annotation
+        self._predicate = predicate
+
+    def matches_listing(self, image: sly.ImageInfo) -> Optional[bool]:
+        """Checks the image using only the fields from the images listing.
+
+        :param image: object with information about image
+        :type image: sly.ImageInfo
+        :return: True or False if the result is known without annotation, None otherwise
+        :rtype: Optional[bool]
+        """
+        return self._predicate(image, None)
+
+    def matches(self, image: sly.ImageInfo, annotation: dict) -> bool:
+        """Checks the image with its annotation.
+
+        :param image: object with information about image
+        :type image: sly.ImageInfo
+        :param annotation: annotation JSON
+        :type annotation: dict
+        :return: True if the image matches the filter, False otherwise
+        :rtype: bool
+        """
+        return bool(self._predicate(image, summarize_annotation(annotation)))
+
+
+def compile_filter(expression: str) -> ImageFilter:
+    """Compiles the filter expression into the ImageFilter.
+
+    :param expression: filter expression
+    :type expression: str
+    :raises FilterError: if the expression can't be parsed
+    :return: compiled filter
+    :rtype: ImageFilter
+    """
+    parser = Parser(tokenize(expression))
+    predicate = parser.parse()
+
+    sly.logger.debug(
+        f"Compiled filter expression {expression}, "
+        f"annotations are needed: {parser.needs_annotation}."
+    )
+
+    return ImageFilter(expression, predicate, parser.needs_annotation)
+
+
+def summarize_annotation(annotation: dict) -> AnnotationSummary:
+    """Collects classes, geometry types and tags of the annotation in one pass.
+
+    :param annotation: annotation JSON
+    :type annotation: dict
+    :return: summary of the annotation
+    :rtype: AnnotationSummary
+    """
+    classes = Counter()
+    geometries = set()
+    for obj in annotation["objects"]:
+        classes[obj["classTitle"]] += 1
+        geometries.add(obj["geometryType"])
+
+    tags = {tag["name"]: tag.get("value") for tag in annotation["tags"]}
+
+    return AnnotationSummary(classes, geometries, tags)
+
+
+def tokenize(expression: str) -> List[Token]:
+    """Splits the filter expression into tokens.
+
+    :param expression: filter expression
+    :type expression: str
+    :raises FilterError: if the expression contains unknown characters
+    :return: list of tokens
+    :rtype: List[Token]
+    """
+    tokens = []
+    position = 0
+    while position < len(expression):
+        match = TOKEN_PATTERN.match(expression, position)
+        if match is None:
+            raise FilterError(
+                f"Unexpected character {expression[position]!r} at position {position}."
+            )
+
+        kind, value = match.lastgroup, match.group()
+        if kind == "number":
+            value = float(value) if "." in value else int(value)
+        elif kind == "string":
+            value = re.sub(r"\\(.)", r"\1", value[1:-1])
+        elif kind == "name" and value in KEYWORDS:
+            kind = "keyword"
+
+        if kind != "space":
+            tokens.append(Token(kind, value, position))
+        position = match.end()
+
+    tokens.append(Token("end", None, position))
+    return tokens
+
+
+class Parser:
+    """Recursive descent parser of the filter expression, which builds the predicate
+    from the closures. Predicate receives the image and the annotation summary (None if
+    the annotation is not downloaded yet) and returns True, False or None if the result
+    can't be known without annotation.
+
+    Grammar:
+    expression := conjunction ("or" conjunction)*
+    conjunction := negation ("and" negation)*
+    negation := "not" negation | "(" expression ")" | comparison
+    comparison := field operator value | field ["not"] "in" "(" value ("," value)* ")"
+    field := name | name "." name | name "[" string "]"
+
+    :param tokens: list of tokens
+    :type tokens: List[Token]
+    """
+
+    def __init__(self, tokens: List[Token]):
+        self.tokens = tokens
+        self.position = 0
+        self.needs_annotation = False
+
+    def parse(self) -> Callable:
+        """Parses the whole expression and returns the predicate."""
+        predicate = self.expression()
+        self.expect("end")
+        return predicate
+
+    def peek(self) -> Token:
+        return self.tokens[self.position]
+
+    def advance(self) -> Token:
+        token = self.tokens[self.position]
+        self.position += 1
+        return token
+
+    def accept(self, kind: str, value=None) -> Optional[Token]:
+        token = self.peek()
+        if token.kind == kind and (value is None or token.value == value):
+            return self.advance()
+
+    def expect(self, kind: str, value=None) -> Token:
+        token = self.accept(kind, value)
+        if token is None:
+            token = self.peek()
+            expected = value or kind
+            found = "end of expression" if token.kind == "end" else repr(token.value)
+            raise FilterError(
+                f"Expected {expected} at position {token.position}, found {found}."
+            )
+        return token
+
+    def expression(self) -> Callable:
+        predicates = [self.conjunction()]
+        while self.accept("keyword", "or"):
+            predicates.append(self.conjunction())
+        if len(predicates) == 1:
+            return predicates[0]
+
+        def any_of(image, summary):
+            # Three-valued logic: unknown result is None.
+            result = False
+            for predicate in predicates:
+                value = predicate(image, summary)
+                if value:
+                    return True
+                if value is None:
+                    result = None
+            return result
+
+        return any_of
+
+    def conjunction(self) -> Callable:
+        predicates = [self.negation()]
+        while self.accept("keyword", "and"):
+            predicates.append(self.negation())
+        if len(predicates) == 1:
+            return predicates[0]
+
+        def all_of(image, summary):
+            # Three-valued logic: unknown result is None.
+            result = True
+            for predicate in predicates:
+                value = predicate(image, summary)
+                if value is False:
+                    return False
+                if value is None:
+                    result = None
+            return result
+
+        return all_of
+
+    def negation(self) -> Callable:
+        if self.accept("keyword", "not"):
+            predicate = self.negation()
+
+            def negate(image, summary):
+                value = predicate(image, summary)
+                return None if value is None else not value
+
+            return negate
+
+        if self.accept("punct", "("):
+            predicate = self.expression()
+            self.expect("punct", ")")
+            return predicate
+
+        return self.comparison()
+
+    def comparison(self) -> Callable:
+        field_token = self.peek()
+        getter, is_set = self.field()
+
+        if self.accept("keyword", "not"):
+            self.expect("keyword", "in")
+            operator = "not in"
+        elif self.accept("keyword", "in"):
+            operator = "in"
+        else:
+            operator = self.expect("op").value
+
+        if operator in ("in", "not in"):
+            value = self.values()
+        else:
+            value = self.value()
+
+        operators = SET_OPERATORS if is_set else OPERATORS
+        if operator not in operators:
+            raise FilterError(
+                f"Operator {operator} can't be used with field {field_token.value!r} "
+                f"at position {field_token.position}."
+            )
+        compare = operators[operator]
+
+        def predicate(image, summary):
+            left = getter(image, summary)
+            if left is _UNKNOWN:
+                return None
+            if left is _MISSING:
+                # Missing values match only negative comparisons.
+                return operator in ("!=", "not in")
+            try:
+                return compare(left, value)
+            except TypeError:
+                # Values of different types (e.g. string and number) don't match.
+                return False
+
+        return predicate
+
+    def field(self):
+        """Parses the field and returns its getter and True if the field is a set of values."""
+        token = self.expect("name")
+        name = token.value
+
+        key = None
+        if self.accept("punct", "."):
+            key = self.expect("name").value
+        elif self.accept("punct", "["):
+            key = self.expect("string").value
+            self.expect("punct", "]")
+
+        if key is None and name in LISTING_FIELDS:
+            listing_getter = LISTING_FIELDS[name]
+            return lambda image, summary: listing_getter(image), False
+
+        if name == "meta" and key is not None:
+            return lambda image, summary: (image.meta or {}).get(key, _MISSING), False
+
+        if key is None and name in SET_FIELDS:
+            set_getter = SET_FIELDS[name]
+            return self.annotation_getter(set_getter), True
+
+        if name == "tag" and key is not None:
+            return (
+                self.annotation_getter(lambda summary: summary.tags.get(key, _MISSING)),
+                False,
+            )
+
+        if name == "objects":
+            if key is None:
+                return (
+                    self.annotation_getter(lambda summary: sum(summary.classes.values())),
+                    False,
+                )
+            return self.annotation_getter(lambda summary: summary.classes[key]), False
+
+        raise FilterError(f"Unknown field {name!r} at position {token.position}.")
+
+    def annotation_getter(self, getter: Callable) -> Callable:
+        """Wraps the getter of the annotation field, so it returns unknown value
+        if the annotation is not downloaded yet."""
+        self.needs_annotation = True
+
+        def get(image, summary):
+            if summary is None:
+                return _UNKNOWN
+            return getter(summary)
+
+        return get
+
+    def value(self):
+        token = self.advance()
+        if token.kind in ("number", "string"):
+            return token.value
+        if token.kind == "name" and token.value in ("true", "false", "null"):
+            return {"true": True, "false": False, "null": None}[token.value]
+        raise FilterError(f"Expected value at position {token.position}.")
+
+    def values(self) -> tuple:
+        self.expect("punct", "(")
+        values = [self.value()]
+        while self.accept("punct", ","):
+            values.append(self.value())
+        self.expect("punct", ")")
+        return tuple(values)
@@ -1,12 +1,25 @@
 import os
+import threading
 from collections import defaultdict
 
 import supervisely as sly
 
 from dotenv import load_dotenv
 
+from src.annotation_cache import AnnotationCache
+from src.api_factory import create_api
+from src.async_api import AsyncApi
+from src.batching import BatchController
+from src.ledger import TransferLedger
+from src.meta_cache import ProjectMetaCache
+from src.pipeline import MemoryBudget
+from src.reporting import Reporter
+from src.scheduler import SMALLEST_FIRST, BandwidthLimiter
+
 ABSOLUTE_PATH = os.path.dirname(__file__)
-TMP_DIR = os.path.join(ABSOLUTE_PATH, "tmp")
+# Directory for the plan, the ledger and the downloaded files, separate directories
+# allow several headless transfers to run on the same machine.
+TMP_DIR = os.getenv("WORK_DIR", os.path.join(ABSOLUTE_PATH, "tmp"))
 
 # Directory where temporary downloaded images will be stored.
 IMAGES_DIR = os.path.join(TMP_DIR, "images")
@@ -14,6 +27,9 @@ IMAGES_DIR = os.path.join(TMP_DIR, "images")
 # Path to the .env file, if the app is started from the team files.
 ENV_FILE = os.path.join(ABSOLUTE_PATH, "target.env")
 
+# Directory where annotations downloaded on comparison will be cached for the upload.
+ANNOTATIONS_CACHE_DIR = os.path.join(TMP_DIR, "annotations")
+
 os.makedirs(TMP_DIR, exist_ok=True)
 os.makedirs(IMAGES_DIR, exist_ok=True)
 
@@ -24,12 +40,19 @@ INSTANCES = {
     "Custom": "Custom",
 }
 
-# Indices of the fields in the image metadata to avoid hardcoding.
-INDICES = {"images_ids": 0, "image_names": 1, "image_metas": 13}
-
 load_dotenv("local.env")
 load_dotenv(os.path.expanduser("~/supervisely.env"))
-source_api: sly.Api = sly.Api.from_env()
+
+# Maximum number of connections to one instance in the HTTP session of each thread, time
+# in seconds for which the results of the read API calls (e.g. get_info_by_id) are cached
+# and maximum number of the cached results.
+API_POOL_SIZE = int(os.getenv("API_POOL_SIZE", 32))
+API_CACHE_TTL = int(os.getenv("API_CACHE_TTL", 30))
+API_CACHE_SIZE = int(os.getenv("API_CACHE_SIZE", 10000))
+
+source_api: sly.Api = create_api(
+    pool_size=API_POOL_SIZE, cache_ttl=API_CACHE_TTL, cache_size=API_CACHE_SIZE
+)
 
 TEAM_ID = sly.io.env.team_id()
 
@@ -38,11 +61,97 @@ DEFAULT_TEAM_NAME = "primitives"
 DEFAULT_TAG_NAME = "inference"
 DEFAULT_ANNOTATION_TYPES = ["bitmap"]
 
-# Path to the JSON file which is generated after comparsion of the teams is finished.
-DIFFERENCES_JSON = os.path.join(TMP_DIR, "team_differences.json")
+# Path to the transfer plan, which is written dataset by dataset while comparing the teams.
+DIFFERENCES_PLAN = os.path.join(TMP_DIR, "team_differences.jsonl")
+# Path to the JSON file with differences, which was saved by the previous versions of the app.
+LEGACY_DIFFERENCES_JSON = os.path.join(TMP_DIR, "team_differences.json")
 ERROR_JSON = os.path.join(TMP_DIR, "error.json")
 
+# Path to the database with records of transferred images, which is used to resume the transfer.
+LEDGER_DB = os.path.join(TMP_DIR, "transfer_ledger.sqlite")
+
+# Path to the JSON file with metrics of the API batches, which is saved after the upload.
+BATCH_METRICS_JSON = os.path.join(TMP_DIR, "batch_metrics.json")
+
+# Path to the JSON file with the transfer rate of the last upload, which is used to estimate
+# the duration of the next upload.
+TRANSFER_RATE_JSON = os.path.join(TMP_DIR, "transfer_rate.json")
+
 BATCH_SIZE = 100
+
+# Limits of the adaptive batch size, desired duration of one API call in seconds,
+# maximum payload of one batch and number of retries for the failed batch.
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", 500))
+BATCH_TARGET_LATENCY = int(os.getenv("BATCH_TARGET_LATENCY", 10))
+BATCH_MAX_BYTES = int(os.getenv("BATCH_MAX_MB", 256)) * 1024 * 1024
+BATCH_RETRIES = int(os.getenv("BATCH_RETRIES", 3))
+
+# API endpoints, which are called in batches with adaptive size.
+BATCH_ENDPOINTS = [
+    "download_images",
+    "download_annotations",
+    "upload_images",
+    "upload_hashes",
+    "upload_annotations",
+    "copy_images",
+]
+
+# If True, images are transferred in memory and IMAGES_DIR is used only when the memory
+# budget is exceeded, otherwise all images are downloaded to IMAGES_DIR.
+IN_MEMORY_TRANSFER = os.getenv("IN_MEMORY_TRANSFER", "true").lower() in ("true", "1")
+MEMORY_BUDGET_BYTES = int(os.getenv("MEMORY_BUDGET_MB", 1024)) * 1024 * 1024
+
+# If True, images which content is already on the target instance are added by hashes.
+DEDUPLICATE_BY_HASH = os.getenv("DEDUPLICATE_BY_HASH", "true").lower() in ("true", "1")
+
+# If True, annotations are validated by building full Annotation objects before the upload,
+# otherwise annotation JSONs are uploaded as is, with IDs of classes and tags remapped.
+VALIDATE_ANNOTATIONS = os.getenv("VALIDATE_ANNOTATIONS", "false").lower() in ("true", "1")
+# Number of processes which validate annotations (0 to validate in the upload thread)
+# and number of annotations which are validated by the process at once.
+VALIDATION_WORKERS = int(os.getenv("VALIDATION_WORKERS", os.cpu_count() or 1))
+VALIDATION_CHUNK_SIZE = int(os.getenv("VALIDATION_CHUNK_SIZE", 25))
+
+# Number of batches which can wait between the stages of the transfer pipeline.
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", 2))
+
+# Number of batches of one dataset which are uploaded at the same time.
+UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", 4))
+
+# Number of work units which are transferred at the same time and maximum number of images
+# in one work unit, large datasets are split into several units.
+SCHEDULER_WORKERS = int(os.getenv("SCHEDULER_WORKERS", 4))
+WORK_UNIT_SIZE = int(os.getenv("WORK_UNIT_SIZE", 1000))
+
+# Limit of the image bytes, which are downloaded and uploaded per second (0 for unlimited).
+TRANSFER_BANDWIDTH_BYTES = int(os.getenv("TRANSFER_BANDWIDTH_MB", 0)) * 1024 * 1024
+
+# Order of the work units (plan, smallest_first or byte_balanced) and comma-separated names
+# of the projects, which are transferred before all other projects.
+TRANSFER_PRIORITY_POLICY = os.getenv("TRANSFER_PRIORITY_POLICY", SMALLEST_FIRST)
+PINNED_PROJECTS = [
+    name.strip() for name in os.getenv("PINNED_PROJECTS", "").split(",") if name.strip()
+]
+
+# Number of datasets which are compared at the same time.
+COMPARE_WORKERS = int(os.getenv("COMPARE_WORKERS", 8))
+
+# Number of annotations which are downloaded at once while filtering images and number of
+# threads which download chunks of annotations for one dataset.
+FILTER_CHUNK_SIZE = int(os.getenv("FILTER_CHUNK_SIZE", 500))
+FILTER_WORKERS = int(os.getenv("FILTER_WORKERS", 1))
+
+# Maximum number of simultaneous requests to each of the instances.
+SOURCE_API_CONCURRENCY = int(os.getenv("SOURCE_API_CONCURRENCY", 8))
+TARGET_API_CONCURRENCY = int(os.getenv("TARGET_API_CONCURRENCY", 8))
+# If True, listing of images and transfer of images and annotations are done with asynchronous
+# requests from one event loop (requires aiohttp), maximum number of connections to each instance.
+ASYNC_HTTP = os.getenv("ASYNC_HTTP", "true").lower() in ("true", "1")
+ASYNC_HTTP_CONNECTIONS = int(os.getenv("ASYNC_HTTP_CONNECTIONS", 100))
+# Size limit of the annotations cache and the time after which cached annotations are stale.
+ANNOTATIONS_CACHE_MAX_BYTES = int(os.getenv("ANNOTATIONS_CACHE_MAX_MB", 2048)) * 1024 * 1024
+ANNOTATIONS_CACHE_TTL = int(os.getenv("ANNOTATIONS_CACHE_TTL", 24 * 60 * 60))
+
 GEOMETRIES = ["bitmap", "polygon", "polyline", "rectangle"]
 
 
@@ -56,6 +165,8 @@ class State:
         self.target_api_key = None
         # API object for the target instance, icludes API key and instance address.
         self.target_api = None
+        # True if the target instance is the same as the source instance.
+        self.same_instance = False
         # If the app was SUCCESSFULLY launched from the TeamFiles.
         self.from_team_files = False
         # False if the cancel button was clicked, True otherwise.
@@ -65,6 +176,14 @@ class State:
 
         self.normalize_image_metadata = True
 
+        # If True, comparison doesn't create anything in the target instance,
+        # missing team, workspaces, projects and datasets are created on upload.
+        self.read_only_comparison = True
+
+        # If True, target images with the same names, but different content (hash or size)
+        # will be replaced with the source images, otherwise they will be skipped.
+        self.replace_changed_images = False
+
         # Counters for GUI widgets.
         self.annotated_images = 0
         self.tagged_images = 0
@@ -85,8 +204,86 @@ class State:
         # Annotation types for filtering images.
         self.annotation_types = []
 
+        # Determines if the images should be filtered by the expression, the expression itself
+        # and the compiled filter. If set, the expression is used instead of annotation types
+        # and tag name, matched images are counted as annotated.
+        self.filter_by_expression = False
+        self.filter_expression = ""
+        self.image_filter = None
+
         self.error_report = defaultdict(list)
 
+        # Number of datasets which are compared at the same time.
+        self.compare_workers = COMPARE_WORKERS
+
+        # Limits for the simultaneous requests to the source and target instances.
+        self.source_limit = threading.BoundedSemaphore(SOURCE_API_CONCURRENCY)
+        self.target_limit = threading.BoundedSemaphore(TARGET_API_CONCURRENCY)
+
+        # Asynchronous clients for the most used endpoints, target client is created after
+        # connecting to the target.
+        self.source_client = AsyncApi(source_api, ASYNC_HTTP_CONNECTIONS, enabled=ASYNC_HTTP)
+        self.target_client = None
+
+        # Limits for the image bytes, which are downloaded from the source instance
+        # and uploaded to the target instance, shared by all work units of the transfer.
+        self.source_bandwidth = BandwidthLimiter(TRANSFER_BANDWIDTH_BYTES)
+        self.target_bandwidth = BandwidthLimiter(TRANSFER_BANDWIDTH_BYTES)
+
+        # Order of the work units of the transfer and names of the projects, which are transferred first.
+        self.transfer_policy = TRANSFER_PRIORITY_POLICY
+        self.pinned_projects = PINNED_PROJECTS
+
+        # Indices of workspaces, projects and datasets in source and target teams.
+        self.source_index = None
+        self.target_index = None
+
+        # Caches of the project metas, target cache is created after connecting to the target.
+        self.source_meta_cache = ProjectMetaCache(source_api)
+        self.target_meta_cache = None
+
+        # Annotations downloaded on comparison, which are reused on upload.
+        self.annotation_cache = AnnotationCache(
+            ANNOTATIONS_CACHE_DIR, ANNOTATIONS_CACHE_MAX_BYTES, ANNOTATIONS_CACHE_TTL
+        )
+
+        # Determines if images are transferred in memory and the limit for the image bytes in memory.
+        self.in_memory_transfer = IN_MEMORY_TRANSFER
+        self.memory_budget = MemoryBudget(MEMORY_BUDGET_BYTES)
+
+        # Determines if images are added by hashes, when their content is already on the
+        # target instance, and the number of bytes which were not transferred because of it.
+        self.deduplicate_by_hash = DEDUPLICATE_BY_HASH
+        self.saved_bytes = 0
+
+        # Determines if annotations are validated against the project meta before the upload.
+        self.validate_annotations = VALIDATE_ANNOTATIONS
+
+        # Records of transferred images, which are used to resume the interrupted transfer.
+        self.ledger = TransferLedger(LEDGER_DB)
+
+        # Controllers of the batch size and retries for each API endpoint.
+        self.batch_controllers = {
+            endpoint: BatchController(
+                endpoint,
+                BATCH_SIZE,
+                max_size=MAX_BATCH_SIZE,
+                target_latency=BATCH_TARGET_LATENCY,
+                max_bytes=BATCH_MAX_BYTES,
+                retries=BATCH_RETRIES,
+            )
+            for endpoint in BATCH_ENDPOINTS
+        }
+        # Number of images which failed to transfer after all retries.
+        self.failed_images = 0
+
+        # Receives progress and events of the comparison and the transfer,
+        # replaced by the GUI with the reporter which updates the widgets.
+        self.reporter = Reporter()
+
+        # Lock for the counters, which are updated from the comparison threads.
+        self.lock = threading.Lock()
+
     def reset_counters(self):
         """Resets counters for GUI widgets."""
         self.annotated_images = 0
@@ -100,6 +297,27 @@ class State:
 STATE = State()
 
 
+def is_same_instance(source_address: str, target_address: str) -> bool:
+    """Checks if the addresses of the source and target instances point to the same instance.
+
+    :param source_address: address of the source instance
+    :type source_address: str
+    :param target_address: address of the target instance
+    :type target_address: str
+    :return: True if the instances are the same, False otherwise
+    :rtype: bool
+    """
+
+    def normalize(address: str) -> str:
+        address = address.strip().lower().rstrip("/")
+        for prefix in ["https://", "http://", "www."]:
+            if address.startswith(prefix):
+                address = address[len(prefix) :]
+        return address
+
+    return normalize(source_address) == normalize(target_address)
+
+
 def key_from_file():
     """Tries to load Target API key and the instance address from the team files."""
     try:
@@ -0,0 +1,161 @@
+import threading
+
+from typing import Dict, List, Optional
+
+import supervisely as sly
+
+
+class HierarchyIndex:
+    """In-memory index of workspaces, projects and datasets of the team in Supervisely instance.
+    Each level is listed once with bulk get_list calls (one call per parent entity) and all
+    lookups by name or ID are answered from memory. Entities, which are created by the app,
+    are added to the index with add_* methods, so the index is never listed again.
+
+    :param api: API object of the instance
+    :type api: sly.Api
+    :param team_id: ID of the team, None if the team doesn't exist (yet)
+    :type team_id: int
+    """
+
+    def __init__(self, api: sly.Api, team_id: Optional[int]):
+        self._api = api
+        self.team_id = team_id
+
+        # Entities by names, for the workspaces mapped to the team, for projects and datasets
+        # mapped to the parent IDs. Parent which is missing in the dict was not listed yet.
+        self._workspaces: Optional[Dict[str, sly.WorkspaceInfo]] = None
+        self._projects: Dict[int, Dict[str, sly.ProjectInfo]] = {}
+        self._datasets: Dict[int, Dict[str, sly.DatasetInfo]] = {}
+
+        # Names of the workspaces by IDs, to avoid get_info_by_id calls.
+        self._workspace_names: Dict[int, str] = {}
+
+        self._lock = threading.RLock()
+
+    def workspaces(self) -> List[sly.WorkspaceInfo]:
+        """Returns the list of workspaces in the team, lists them on the first call.
+
+        :return: list of workspaces in the team
+        :rtype: List[sly.WorkspaceInfo]
+        """
+        with self._lock:
+            if self._workspaces is None:
+                self._workspaces = {}
+                if self.team_id is not None:
+                    for workspace in self._api.workspace.get_list(self.team_id):
+                        self._add(self._workspaces, workspace)
+                sly.logger.debug(
+                    f"Indexed {len(self._workspaces)} workspaces in team {self.team_id}."
+                )
+            return list(self._workspaces.values())
+
+    def projects(self, workspace_id: Optional[int]) -> List[sly.ProjectInfo]:
+        """Returns the list of projects in the workspace, lists them on the first call.
+
+        :param workspace_id: ID of the workspace, None for a workspace which doesn't exist
+        :type workspace_id: int
+        :return: list of projects in the workspace
+        :rtype: List[sly.ProjectInfo]
+        """
+        if workspace_id is None:
+            return []
+        with self._lock:
+            if workspace_id not in self._projects:
+                self._projects[workspace_id] = {}
+                for project in self._api.project.get_list(workspace_id):
+                    self._add(self._projects[workspace_id], project)
+                sly.logger.debug(
+                    f"Indexed {len(self._projects[workspace_id])} projects "
+                    f"in workspace {workspace_id}."
+                )
+            return list(self._projects[workspace_id].values())
+
+    def datasets(self, project_id: Optional[int]) -> List[sly.DatasetInfo]:
+        """Returns the list of datasets in the project, lists them on the first call.
+
+        :param project_id: ID of the project, None for a project which doesn't exist
+        :type project_id: int
+        :return: list of datasets in the project
+        :rtype: List[sly.DatasetInfo]
+        """
+        if project_id is None:
+            return []
+        with self._lock:
+            if project_id not in self._datasets:
+                self._datasets[project_id] = {}
+                for dataset in self._api.dataset.get_list(project_id):
+                    self._add(self._datasets[project_id], dataset)
+                sly.logger.debug(
+                    f"Indexed {len(self._datasets[project_id])} datasets "
+                    f"in project {project_id}."
+                )
+            return list(self._datasets[project_id].values())
+
+    def workspace(self, name: str) -> Optional[sly.WorkspaceInfo]:
+        """Returns the workspace with specified name or None if it doesn't exist."""
+        self.workspaces()
+        with self._lock:
+            return self._workspaces.get(name)
+
+    def project(self, workspace_id: Optional[int], name: str) -> Optional[sly.ProjectInfo]:
+        """Returns the project with specified name in the workspace or None if it doesn't exist."""
+        self.projects(workspace_id)
+        with self._lock:
+            return self._projects.get(workspace_id, {}).get(name)
+
+    def dataset(self, project_id: Optional[int], name: str) -> Optional[sly.DatasetInfo]:
+        """Returns the dataset with specified name in the project or None if it doesn't exist."""
+        self.datasets(project_id)
+        with self._lock:
+            return self._datasets.get(project_id, {}).get(name)
+
+    def workspace_name(self, workspace_id: int) -> str:
+        """Returns the name of the workspace with specified ID.
+
+        :param workspace_id: ID of the workspace
+        :type workspace_id: int
+        :return: name of the workspace
+        :rtype: str
+        """
+        self.workspaces()
+        with self._lock:
+            return self._workspace_names[workspace_id]
+
+    def set_team(self, team_id: int):
+        """Sets the ID of the team, which was found or created after the index was built.
+        Workspaces of the team will be listed on the next lookup, since the existing team
+        can already have them.
+
+        :param team_id: ID of the team
+        :type team_id: int
+        """
+        with self._lock:
+            self.team_id = team_id
+            self._workspaces = None
+            self._workspace_names = {}
+
+    def add_workspace(self, workspace: sly.WorkspaceInfo):
+        """Adds created workspace to the index."""
+        self.workspaces()
+        with self._lock:
+            self._add(self._workspaces, workspace)
+            self._projects[workspace.id] = {}
+
+    def add_project(self, project: sly.ProjectInfo):
+        """Adds created project to the index."""
+        self.projects(project.workspace_id)
+        with self._lock:
+            self._add(self._projects[project.workspace_id], project)
+            self._datasets[project.id] = {}
+
+    def add_dataset(self, dataset: sly.DatasetInfo):
+        """Adds created dataset to the index."""
+        self.datasets(dataset.project_id)
+        with self._lock:
+            self._add(self._datasets[dataset.project_id], dataset)
+
+    def _add(self, entities: dict, info):
+        """Adds entity to the dict by its name and remembers names of the workspaces by IDs."""
+        entities[info.name] = info
+        if isinstance(info, sly.WorkspaceInfo):
+            self._workspace_names[info.id] = info.name
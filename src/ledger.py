@@ -0,0 +1,135 @@
+import sqlite3
+import threading
+import time
+
+from typing import Dict, List, Optional, Tuple
+
+# Image bytes were uploaded to the target dataset, but the annotation is not attached yet.
+UPLOADED = "uploaded"
+# Image was uploaded and the annotation was attached, nothing left to do.
+ANNOTATED = "annotated"
+
+
+class TransferLedger:
+    """Durable record of transferred images, stored in SQLite database. For each source image
+    it keeps ID of the image in the target dataset and the status of the transfer, so the
+    interrupted transfer can be resumed: finished images are skipped and images which were
+    uploaded without annotations are repaired.
+
+    :param path: path to the SQLite database file
+    :type path: str
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+
+        with self._lock, self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS images ("
+                "source_id INTEGER NOT NULL, "
+                "target_dataset_id INTEGER NOT NULL, "
+                "target_id INTEGER NOT NULL, "
+                "status TEXT NOT NULL, "
+                "updated_at REAL NOT NULL, "
+                "PRIMARY KEY (source_id, target_dataset_id))"
+            )
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value TEXT)"
+            )
+
+    def record_uploaded(
+        self, target_dataset_id: int, source_ids: List[int], target_ids: List[int]
+    ):
+        """Records that images were uploaded to the target dataset without annotations.
+
+        :param target_dataset_id: ID of the target dataset
+        :type target_dataset_id: int
+        :param source_ids: IDs of the source images
+        :type source_ids: List[int]
+        :param target_ids: IDs of the uploaded images in the target dataset
+        :type target_ids: List[int]
+        """
+        now = time.time()
+        rows = [
+            (source_id, target_dataset_id, target_id, UPLOADED, now)
+            for source_id, target_id in zip(source_ids, target_ids)
+        ]
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO images VALUES (?, ?, ?, ?, ?)", rows
+            )
+
+    def record_annotated(self, target_dataset_id: int, source_ids: List[int]):
+        """Records that annotations were attached to the uploaded images.
+
+        :param target_dataset_id: ID of the target dataset
+        :type target_dataset_id: int
+        :param source_ids: IDs of the source images
+        :type source_ids: List[int]
+        """
+        now = time.time()
+        rows = [(ANNOTATED, now, source_id, target_dataset_id) for source_id in source_ids]
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "UPDATE images SET status = ?, updated_at = ? "
+                "WHERE source_id = ? AND target_dataset_id = ?",
+                rows,
+            )
+
+    def get(
+        self, target_dataset_id: int, source_ids: List[int]
+    ) -> Dict[int, Tuple[int, str]]:
+        """Returns target image IDs and statuses of the source images, which were recorded
+        for the target dataset.
+
+        :param target_dataset_id: ID of the target dataset
+        :type target_dataset_id: int
+        :param source_ids: IDs of the source images
+        :type source_ids: List[int]
+        :return: tuples with target image ID and status, mapped to source image IDs
+        :rtype: Dict[int, Tuple[int, str]]
+        """
+        records = {}
+        with self._lock:
+            # SQLite limits the number of variables in one query.
+            for idx in range(0, len(source_ids), 500):
+                chunk = source_ids[idx : idx + 500]
+                placeholders = ", ".join("?" * len(chunk))
+                cursor = self._connection.execute(
+                    "SELECT source_id, target_id, status FROM images "
+                    f"WHERE target_dataset_id = ? AND source_id IN ({placeholders})",
+                    [target_dataset_id, *chunk],
+                )
+                for source_id, target_id, status in cursor:
+                    records[source_id] = (target_id, status)
+        return records
+
+    def has_records(self) -> bool:
+        """Returns True if the ledger has records of the unfinished transfer."""
+        with self._lock:
+            cursor = self._connection.execute("SELECT 1 FROM images LIMIT 1")
+            return cursor.fetchone() is not None
+
+    def set_info(self, key: str, value: str):
+        """Stores the value of the transfer setting, which is needed to resume the transfer."""
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO info VALUES (?, ?)", (key, value)
+            )
+
+    def get_info(self, key: str) -> Optional[str]:
+        """Returns the value of the transfer setting or None if it was not stored."""
+        with self._lock:
+            cursor = self._connection.execute(
+                "SELECT value FROM info WHERE key = ?", (key,)
+            )
+            row = cursor.fetchone()
+            return row[0] if row else None
+
+    def clear(self):
+        """Removes all records from the ledger, after the transfer is finished."""
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM images")
+            self._connection.execute("DELETE FROM info")
@@ -0,0 +1,108 @@
+import hashlib
+import json
+import threading
+
+from collections import defaultdict, namedtuple
+from typing import Dict
+
+import supervisely as sly
+
+# Entry of the cache: meta JSON as it was received from the instance, parsed meta
+# and fingerprint of the meta content.
+MetaEntry = namedtuple("MetaEntry", ["json", "meta", "fingerprint"])
+
+
+def meta_fingerprint(meta_json: dict) -> str:
+    """Returns fingerprint of the project meta content. IDs of classes and tags are different
+    on each instance, so they are removed before hashing.
+
+    :param meta_json: project meta JSON
+    :type meta_json: dict
+    :return: fingerprint of the meta
+    :rtype: str
+    """
+
+    def strip_ids(value):
+        if isinstance(value, dict):
+            return {key: strip_ids(item) for key, item in value.items() if key != "id"}
+        if isinstance(value, list):
+            return [strip_ids(item) for item in value]
+        return value
+
+    content = json.dumps(strip_ids(meta_json), sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class ProjectMetaCache:
+    """Thread-safe cache of the project metas of one instance, keyed by project ID.
+    Each meta is downloaded and parsed only once per run.
+
+    :param api: API object for the instance
+    :type api: sly.Api
+    """
+
+    def __init__(self, api: sly.Api):
+        self.api = api
+
+        self._entries: Dict[int, MetaEntry] = {}
+        # Fingerprints of the metas, which were pushed to the projects in this run.
+        self._pushed: Dict[int, str] = {}
+        # Locks for each project, so the same meta is not downloaded twice at the same time.
+        self._locks = defaultdict(threading.Lock)
+        self._lock = threading.Lock()
+
+    def get(self, project_id: int) -> MetaEntry:
+        """Returns cached meta of the project, downloads it if it's not cached yet.
+
+        :param project_id: ID of the project
+        :type project_id: int
+        :return: entry with meta JSON, parsed meta and fingerprint
+        :rtype: MetaEntry
+        """
+        with self._project_lock(project_id):
+            entry = self._entries.get(project_id)
+            if entry is None:
+                meta_json = self.api.project.get_meta(project_id)
+                entry = MetaEntry(
+                    meta_json, sly.ProjectMeta.from_json(meta_json), meta_fingerprint(meta_json)
+                )
+                self._entries[project_id] = entry
+                sly.logger.debug(f"Project meta of project {project_id} is cached.")
+            return entry
+
+    def push(self, project_id: int, source_entry: MetaEntry) -> MetaEntry:
+        """Updates the meta of the project with the source meta, only if the content of the
+        metas is different and the same meta was not pushed to this project before.
+
+        :param project_id: ID of the project
+        :type project_id: int
+        :param source_entry: cached meta, which should be in the project
+        :type source_entry: MetaEntry
+        :return: entry with the meta of the project after the update
+        :rtype: MetaEntry
+        """
+        entry = self.get(project_id)
+
+        with self._project_lock(project_id):
+            if source_entry.fingerprint in (entry.fingerprint, self._pushed.get(project_id)):
+                sly.logger.debug(f"Project meta of project {project_id} is up to date.")
+                return self._entries[project_id]
+
+            self.api.project.update_meta(project_id, source_entry.meta)
+            self._pushed[project_id] = source_entry.fingerprint
+            # Meta is downloaded again to get IDs of the classes and tags in the project.
+            self._entries.pop(project_id, None)
+            sly.logger.debug(f"Project meta of project {project_id} is updated.")
+
+        return self.get(project_id)
+
+    def clear(self):
+        """Removes all cached metas, so they will be downloaded again in the next run."""
+        with self._lock:
+            self._entries.clear()
+            self._pushed.clear()
+
+    def _project_lock(self, project_id: int) -> threading.Lock:
+        """Returns the lock of the project."""
+        with self._lock:
+            return self._locks[project_id]
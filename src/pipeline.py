@@ -0,0 +1,179 @@
+import threading
+
+from queue import Queue
+from typing import Callable, Iterable, List, Optional
+
+import supervisely as sly
+
+# Marker which is passed through the queues after the last item.
+_END = object()
+
+
+class Pipeline:
+    """Runs items through the sequence of stages, each stage works in its own thread and
+    stages are connected with bounded queues. While one item is processed by the stage,
+    the next one is processed by the previous stage, so the queue size sets a hard limit
+    on the number of items which are in memory (or on disk) at the same time.
+
+    Stage is a function which receives the item and returns the processed item, which will
+    be passed to the next stage. If the stage returns None, the item is dropped. Stage can
+    be processed by several threads, then items may pass it out of order, but the results
+    are returned in the order of the items.
+
+    :param stages: list of functions which are applied to the items
+    :type stages: List[Callable]
+    :param queue_size: maximum number of items in each queue between stages
+    :type queue_size: int
+    :param should_continue: function which returns False if the pipeline should be stopped
+    :type should_continue: Optional[Callable[[], bool]]
+    :param name: name of the pipeline (for convinient logging)
+    :type name: str
+    :param workers: number of threads for each stage, one thread per stage by default
+    :type workers: Optional[List[int]]
+    """
+
+    def __init__(
+        self,
+        stages: List[Callable],
+        queue_size: int,
+        should_continue: Optional[Callable[[], bool]] = None,
+        name: str = "pipeline",
+        workers: Optional[List[int]] = None,
+    ):
+        self.stages = stages
+        self.queue_size = queue_size
+        self.should_continue = should_continue or (lambda: True)
+        self.name = name
+        self.workers = workers or [1] * len(stages)
+
+        self._error = None
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+
+    def run(self, items: Iterable) -> list:
+        """Runs all items through the stages and returns the list of items, which were
+        returned by the last stage. Exception in any stage stops the pipeline and is raised.
+
+        :param items: items to process, can be a generator
+        :type items: Iterable
+        :return: list of processed items
+        :rtype: list
+        """
+        queues = [Queue(maxsize=self.queue_size) for _ in range(len(self.stages) + 1)]
+        results = []
+
+        threads = []
+        for idx, (stage, workers) in enumerate(zip(self.stages, self.workers)):
+            # Number of threads of the stage, which are still running.
+            running = [workers]
+            for _ in range(workers):
+                threads.append(
+                    threading.Thread(
+                        target=self._work,
+                        args=(stage, queues[idx], queues[idx + 1], running),
+                        daemon=True,
+                    )
+                )
+        for thread in threads:
+            thread.start()
+
+        collector = threading.Thread(
+            target=self._collect, args=(queues[-1], results), daemon=True
+        )
+        collector.start()
+
+        for position, item in enumerate(items):
+            if self._stopped.is_set() or not self.should_continue():
+                sly.logger.debug(f"The {self.name} was stopped, no more items are queued.")
+                break
+            queues[0].put((position, item))
+        queues[0].put(_END)
+
+        for thread in threads:
+            thread.join()
+        collector.join()
+
+        if self._error is not None:
+            raise self._error
+
+        # Restoring the order of the items, which could be changed by the parallel stages.
+        return [item for _, item in sorted(results, key=lambda result: result[0])]
+
+    def _work(
+        self, stage: Callable, input_queue: Queue, output_queue: Queue, running: List[int]
+    ):
+        """Takes items from the input queue, processes them and puts to the output queue.
+        The last finished thread of the stage passes the end marker to the next stage."""
+        while True:
+            entry = input_queue.get()
+            if entry is _END:
+                with self._lock:
+                    running[0] -= 1
+                    is_last = running[0] == 0
+                if is_last:
+                    output_queue.put(_END)
+                else:
+                    # Passing the end marker to the other threads of the stage.
+                    input_queue.put(_END)
+                return
+
+            if self._stopped.is_set():
+                # Draining the queue, so the previous stage is not blocked.
+                continue
+
+            position, item = entry
+            try:
+                result = stage(item)
+            except Exception as e:
+                sly.logger.error(f"Stage {stage.__name__} of the {self.name} failed: {e}")
+                self._error = e
+                self._stopped.set()
+                continue
+
+            if result is not None:
+                output_queue.put((position, result))
+
+    def _collect(self, queue: Queue, results: list):
+        """Collects the items which were processed by the last stage."""
+        while True:
+            entry = queue.get()
+            if entry is _END:
+                return
+            results.append(entry)
+
+
+class MemoryBudget:
+    """Thread-safe counter of bytes which are kept in memory. If the budget is exceeded,
+    the caller should store the data somewhere else (e.g. on disk).
+
+    :param max_bytes: maximum number of bytes which can be kept in memory
+    :type max_bytes: int
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.used_bytes = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, size: int) -> bool:
+        """Reserves the specified number of bytes, if they fit into the budget.
+
+        :param size: number of bytes to reserve
+        :type size: int
+        :return: True if the bytes were reserved, False if the budget is exceeded
+        :rtype: bool
+        """
+        with self._lock:
+            if self.used_bytes + size > self.max_bytes:
+                return False
+            self.used_bytes += size
+            return True
+
+    def release(self, size: int):
+        """Releases the specified number of previously reserved bytes.
+
+        :param size: number of bytes to release
+        :type size: int
+        """
+        with self._lock:
+            self.used_bytes = max(self.used_bytes - size, 0)
@@ -0,0 +1,264 @@
+import json
+import os
+import threading
+
+from typing import Dict, Iterator, List, Tuple
+
+import supervisely as sly
+
+# Name and version of the plan format, which are stored in the first line of the plan.
+PLAN_FORMAT = "dev-assets-transfer-plan"
+PLAN_VERSION = 2
+
+# Fields of the images which are needed for the upload, mapped to the fields of ImageInfo.
+# Images are stored in columns: one list of values for each field.
+IMAGE_FIELDS = {
+    "ids": "id",
+    "names": "name",
+    "hashes": "hash",
+    "sizes": "size",
+    "metas": "meta",
+    "updated_at": "updated_at",
+}
+
+# Lists of images in the dataset differences, which are stored in the plan.
+IMAGE_GROUPS = ["annotated_images", "tagged_images"]
+
+
+def compact_images(images: List[sly.ImageInfo]) -> Dict[str, list]:
+    """Converts the list of images to columns with the fields which are needed for the upload.
+    Images can be ImageInfo objects or lists with the same order of the fields (from JSON).
+
+    :param images: list of objects with information about images
+    :type images: List[sly.ImageInfo]
+    :return: lists of values for each field of the images
+    :rtype: Dict[str, list]
+    """
+    columns = {}
+    for column, field in IMAGE_FIELDS.items():
+        idx = sly.ImageInfo._fields.index(field)
+        columns[column] = [image[idx] for image in images]
+    return columns
+
+
+def compact_dataset(dataset_differences: dict) -> dict:
+    """Converts differences of the dataset to the compact record of the plan, with IDs of the
+    datasets instead of full information and with images stored in columns.
+
+    :param dataset_differences: information about difference between source and target dataset
+    :type dataset_differences: dict
+    :return: compact record of the dataset
+    :rtype: dict
+    """
+    source = dataset_differences["source"]
+    target = dataset_differences.get("target")
+    project_idx = sly.DatasetInfo._fields.index("project_id")
+
+    record = {
+        "source_id": source[0],
+        "target_id": target[0] if target else None,
+        "source_project_id": source[project_idx],
+        "target_project_id": target[project_idx] if target else None,
+        "create_target": dataset_differences.get("create_target", False),
+        "replaced_images": dataset_differences.get("replaced_images", {}),
+        "summary": dataset_differences.get("summary", {}),
+    }
+    for group in IMAGE_GROUPS:
+        record[group] = compact_images(dataset_differences.get(group, []))
+    return record
+
+
+class PlanWriter:
+    """Thread-safe writer of the transfer plan. Differences of each dataset are written to
+    the file as one compact JSON line as soon as the dataset is compared, so the differences
+    of the whole team are never kept in memory. Offsets of the lines are saved to the index
+    file on close, so any dataset can be read without reading the whole plan.
+
+    :param path: path to the file with the transfer plan
+    :type path: str
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.datasets = 0
+
+        self._lock = threading.Lock()
+        self._index = []
+        self._file = open(path, "wb")
+
+        # Index of the previous plan doesn't match the new one.
+        sly.fs.silent_remove(index_path(path))
+
+        header = {"format": PLAN_FORMAT, "version": PLAN_VERSION}
+        self._offset = self._file.write(encode_line(header))
+
+    def write(
+        self,
+        workspace_name: str,
+        project_name: str,
+        dataset_name: str,
+        dataset_differences: dict,
+    ):
+        """Appends differences of the dataset to the plan.
+
+        :param workspace_name: name of the workspace
+        :type workspace_name: str
+        :param project_name: name of the project
+        :type project_name: str
+        :param dataset_name: name of the dataset
+        :type dataset_name: str
+        :param dataset_differences: information about difference between source and target dataset
+        :type dataset_differences: dict
+        """
+        record = {
+            "workspace": workspace_name,
+            "project": project_name,
+            "dataset": dataset_name,
+            **compact_dataset(dataset_differences),
+        }
+        # Serializing outside of the lock, so the threads are blocked only for writing.
+        line = encode_line(record)
+
+        with self._lock:
+            self._index.append([workspace_name, project_name, dataset_name, self._offset])
+            self._offset += self._file.write(line)
+            self.datasets += 1
+
+    def close(self):
+        """Flushes and closes the file with the plan and saves the index of the datasets."""
+        with self._lock:
+            self._file.close()
+            with open(index_path(self.path), "w", encoding="utf-8") as f:
+                json.dump({"version": PLAN_VERSION, "datasets": self._index}, f)
+        sly.logger.debug(f"Saved plan with {self.datasets} datasets to {self.path}.")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def encode_line(record: dict) -> bytes:
+    """Encodes the record to one line of the plan."""
+    line = json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+    return (line + "\n").encode("utf-8")
+
+
+def index_path(path: str) -> str:
+    """Returns path to the index file of the plan."""
+    return f"{path}.index"
+
+
+def check_header(line: bytes, path: str):
+    """Checks that the first line of the file is the header of the supported plan version.
+
+    :param line: first line of the file
+    :type line: bytes
+    :param path: path to the file with the transfer plan (for the error message)
+    :type path: str
+    :raises ValueError: if the file is not a plan or its version is not supported
+    """
+    try:
+        header = json.loads(line)
+    except ValueError:
+        header = None
+
+    if not isinstance(header, dict) or header.get("format") != PLAN_FORMAT:
+        raise ValueError(f"File {path} is not a transfer plan.")
+    if header.get("version") != PLAN_VERSION:
+        raise ValueError(
+            f"Transfer plan {path} has version {header.get('version')}, "
+            f"but only version {PLAN_VERSION} is supported."
+        )
+
+
+def read_plan(path: str) -> Iterator[Tuple[str, str, str, dict]]:
+    """Lazily reads the transfer plan, only one dataset is kept in memory at a time.
+
+    :param path: path to the file with the transfer plan
+    :type path: str
+    :return: generator of workspace, project and dataset names with dataset records
+    :rtype: Iterator[Tuple[str, str, str, dict]]
+    """
+    with open(path, "rb") as f:
+        check_header(f.readline(), path)
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            yield record["workspace"], record["project"], record["dataset"], record
+
+
+def load_index(path: str) -> List[Tuple[str, str, str, int]]:
+    """Returns names and offsets of the datasets in the plan. If the index file is missing
+    (e.g. the comparison was interrupted), it's rebuilt by scanning the plan.
+
+    :param path: path to the file with the transfer plan
+    :type path: str
+    :return: list of workspace, project and dataset names with offsets of the records
+    :rtype: List[Tuple[str, str, str, int]]
+    """
+    if os.path.exists(index_path(path)):
+        with open(index_path(path), "r", encoding="utf-8") as f:
+            index = json.load(f)
+        if index.get("version") == PLAN_VERSION:
+            return [tuple(entry) for entry in index["datasets"]]
+
+    sly.logger.debug(f"Index of the plan {path} is missing, rebuilding it.")
+
+    entries = []
+    with open(path, "rb") as f:
+        header = f.readline()
+        check_header(header, path)
+        offset = len(header)
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                entries.append(
+                    (record["workspace"], record["project"], record["dataset"], offset)
+                )
+            offset += len(line)
+    return entries
+
+
+def read_dataset(path: str, offset: int) -> dict:
+    """Reads the record of one dataset from the plan by its offset from the index.
+
+    :param path: path to the file with the transfer plan
+    :type path: str
+    :param offset: offset of the record in the file
+    :type offset: int
+    :return: record of the dataset
+    :rtype: dict
+    """
+    with open(path, "rb") as f:
+        f.seek(offset)
+        return json.loads(f.readline())
+
+
+def convert_legacy_plan(json_path: str, path: str) -> int:
+    """Converts team_differences.json of the previous versions of the app (nested dicts of
+    workspaces, projects and datasets with full ImageInfo lists) to the plan.
+
+    :param json_path: path to the legacy JSON file
+    :type json_path: str
+    :param path: path to the plan which will be written
+    :type path: str
+    :return: number of converted datasets
+    :rtype: int
+    """
+    with open(json_path, "r", encoding="utf-8") as f:
+        team_differences = json.load(f)
+
+    with PlanWriter(path) as plan_writer:
+        for workspace_name, projects in team_differences.items():
+            for project_name, datasets in projects.items():
+                for dataset_name, dataset in datasets.items():
+                    plan_writer.write(workspace_name, project_name, dataset_name, dataset)
+
+    sly.logger.info(
+        f"Converted {plan_writer.datasets} datasets from {json_path} to the plan {path}."
+    )
+    return plan_writer.datasets
+
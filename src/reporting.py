@@ -0,0 +1,117 @@
+import threading
+import time
+
+from contextlib import contextmanager
+from typing import Iterator
+
+import supervisely as sly
+
+# Stages of the work, which report their progress.
+COMPARE_STAGE = "compare"
+UPLOAD_STAGE = "upload"
+
+
+class ProgressTracker:
+    """Counts finished items of one stage and passes the progress to the reporter.
+    Has the same update() method as the progress bar widget, so the engine works with both.
+
+    :param reporter: reporter which receives the progress
+    :type reporter: Reporter
+    :param stage: stage of the work, e.g. COMPARE_STAGE
+    :type stage: str
+    :param message: description of the work
+    :type message: str
+    :param total: number of items in the stage
+    :type total: int
+    """
+
+    def __init__(self, reporter: "Reporter", stage: str, message: str, total: int):
+        self.reporter = reporter
+        self.stage = stage
+        self.message = message
+        self.total = total
+        self.done = 0
+
+    def update(self, count: int = 1):
+        """Adds the number of finished items."""
+        self.done += count
+        self.reporter.on_progress(self)
+
+
+class Reporter:
+    """Receives progress and events of the comparison and the transfer, so the engine doesn't
+    depend on how they are shown. This reporter writes them to the log as structured records
+    with the "event" field (used by the headless runs), the GUI replaces it with the reporter,
+    which updates the widgets.
+
+    :param interval: minimum time in seconds between two progress records of the same stage
+    :type interval: float
+    """
+
+    def __init__(self, interval: float = 5):
+        self.interval = interval
+
+        # Time of the last progress record of each stage.
+        self._reported = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def progress(self, stage: str, message: str, total: int) -> Iterator[ProgressTracker]:
+        """Reports the progress of the stage, yields the object with update() method.
+
+        :param stage: stage of the work, e.g. COMPARE_STAGE
+        :type stage: str
+        :param message: description of the work
+        :type message: str
+        :param total: number of items in the stage
+        :type total: int
+        """
+        tracker = ProgressTracker(self, stage, message, total)
+        self.event("progress_started", stage=stage, text=message, total=total)
+        yield tracker
+        self.event(
+            "progress_finished", stage=stage, text=message, done=tracker.done, total=total
+        )
+
+    def on_progress(self, tracker: ProgressTracker):
+        """Writes the progress record, if the interval has passed since the previous one
+        or the stage is finished.
+
+        :param tracker: progress of the stage
+        :type tracker: ProgressTracker
+        """
+        now = time.monotonic()
+        with self._lock:
+            last = self._reported.get(tracker.stage)
+            if tracker.done < tracker.total and last and now - last < self.interval:
+                return
+            self._reported[tracker.stage] = now
+
+        self.event(
+            "progress",
+            stage=tracker.stage,
+            text=tracker.message,
+            done=tracker.done,
+            total=tracker.total,
+        )
+
+    def event(self, name: str, **fields):
+        """Reports the event with the fields, e.g. finished comparison of the dataset.
+
+        Fields are added to the log record, so they should not use the names of the
+        attributes of logging.LogRecord (e.g. "message" or "name").
+
+        :param name: name of the event
+        :type name: str
+        """
+        sly.logger.info(name, extra={"event": name, **fields})
+
+    def error(self, title: str, description: str):
+        """Reports the error, which doesn't stop the work, but should be seen by the user.
+
+        :param title: short title of the error
+        :type title: str
+        :param description: description of the error
+        :type description: str
+        """
+        sly.logger.error(description, extra={"event": "error", "title": title})
@@ -0,0 +1,378 @@
+import heapq
+import itertools
+import threading
+import time
+
+from collections import defaultdict
+from queue import Queue
+from typing import Callable, Iterable, List, Optional, Tuple
+
+import supervisely as sly
+
+# Marker which is put to the queue of finished tasks after the last worker exits.
+_END = object()
+
+# Policies of the order of the work units: order of the plan, units of the smallest datasets
+# first, units of all projects interleaved, so each project gets the same share of bytes.
+PLAN_ORDER = "plan"
+SMALLEST_FIRST = "smallest_first"
+BYTE_BALANCED = "byte_balanced"
+PRIORITY_POLICIES = [PLAN_ORDER, SMALLEST_FIRST, BYTE_BALANCED]
+
+
+class Task:
+    """Unit of work in the scheduler graph. Task is started when all its dependencies are
+    finished, the function receives results of the dependencies as positional arguments
+    in the order of the dependencies.
+
+    :param name: name of the task (for convinient logging)
+    :type name: str
+    :param func: function which does the work
+    :type func: Callable
+    :param kind: kind of the task, e.g. "project" or "dataset"
+    :type kind: str
+    :param priority: tasks with lower priority are started first, tuples are compared element-wise
+    :type priority: tuple
+    :param size: size of the work in bytes (for the estimations)
+    :type size: int
+    """
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable,
+        kind: str = "task",
+        priority: tuple = (),
+        size: int = 0,
+    ):
+        self.name = name
+        self.func = func
+        self.kind = kind
+        self.priority = priority
+        self.size = size
+
+        self.result = None
+        self.deps: List["Task"] = []
+        self.dependents: List["Task"] = []
+        # Number of dependencies, which are not finished yet.
+        self.waiting = 0
+
+    def __repr__(self) -> str:
+        return f"Task({self.kind}: {self.name})"
+
+
+class Scheduler:
+    """Runs the graph of tasks in the pool of worker threads. Task becomes ready when all its
+    dependencies are finished, ready tasks are kept in one queue ordered by priority, so any
+    idle worker takes the next task, independent branches of the graph run at the same time
+    and large pieces of work, split into several tasks, are shared between all workers.
+
+    Exception in any task stops the scheduler: running tasks are finished, no new tasks are
+    started and the exception is raised from run().
+
+    :param workers: number of worker threads
+    :type workers: int
+    :param should_continue: function which returns False if the scheduler should be stopped
+    :type should_continue: Optional[Callable[[], bool]]
+    :param name: name of the scheduler (for convinient logging)
+    :type name: str
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        should_continue: Optional[Callable[[], bool]] = None,
+        name: str = "scheduler",
+    ):
+        self.workers = workers
+        self.should_continue = should_continue or (lambda: True)
+        self.name = name
+        self.tasks: List[Task] = []
+
+        self._ready = []
+        self._counter = itertools.count()
+        self._running = 0
+        self._finished = 0
+        self._error = None
+        self._condition = threading.Condition()
+
+    def add(
+        self,
+        name: str,
+        func: Callable,
+        deps: Iterable[Optional[Task]] = (),
+        kind: str = "task",
+        priority: tuple = (),
+        size: int = 0,
+    ) -> Task:
+        """Adds the task to the graph, the task will be started after all its dependencies.
+
+        :param name: name of the task
+        :type name: str
+        :param func: function which receives results of the dependencies and does the work
+        :type func: Callable
+        :param deps: tasks which should be finished before this task, None values are ignored
+        :type deps: Iterable[Optional[Task]]
+        :param kind: kind of the task
+        :type kind: str
+        :param priority: tasks with lower priority are started first
+        :type priority: tuple
+        :param size: size of the work in bytes
+        :type size: int
+        :return: added task
+        :rtype: Task
+        """
+        task = Task(name, func, kind, priority, size)
+        for dependency in deps:
+            if dependency is None:
+                continue
+            dependency.dependents.append(task)
+            task.deps.append(dependency)
+            task.waiting += 1
+        self.tasks.append(task)
+        return task
+
+    def count(self, kind: str) -> int:
+        """Returns the number of tasks of the specified kind."""
+        return sum(1 for task in self.tasks if task.kind == kind)
+
+    def total_size(self) -> int:
+        """Returns the total size of the work of all tasks in bytes."""
+        return sum(task.size for task in self.tasks)
+
+    def propagate_priorities(self):
+        """Sets priority of each task without priority to the highest priority of its dependents,
+        so the tasks which the urgent work is waiting for (e.g. creation of the project) are
+        started first. Dependents without priority (e.g. final tasks of the datasets) are
+        ignored. Dependencies are always added before the task, so one reversed pass
+        is enough."""
+        for task in reversed(self.tasks):
+            if task.priority != ():
+                continue
+            priorities = [
+                dependent.priority
+                for dependent in task.dependents
+                if dependent.priority != ()
+            ]
+            if priorities:
+                task.priority = min(priorities)
+
+    def run(self, on_done: Optional[Callable[[Task], None]] = None):
+        """Runs all tasks and waits until they are finished. Callback is called in the calling
+        thread after each finished task, so it's safe to update widgets from it.
+
+        :param on_done: function which is called with the finished task
+        :type on_done: Optional[Callable[[Task], None]]
+        """
+        done_queue = Queue()
+
+        with self._condition:
+            for task in self.tasks:
+                if task.waiting == 0:
+                    self._push(task)
+
+        started = time.monotonic()
+        threads = [
+            threading.Thread(target=self._work, args=(done_queue,), daemon=True)
+            for _ in range(self.workers)
+        ]
+        for thread in threads:
+            thread.start()
+
+        exited = 0
+        while exited < len(threads):
+            task = done_queue.get()
+            if task is _END:
+                exited += 1
+            elif on_done is not None:
+                on_done(task)
+
+        for thread in threads:
+            thread.join()
+
+        sly.logger.debug(
+            f"The {self.name} finished {self._finished} of {len(self.tasks)} tasks "
+            f"in {time.monotonic() - started:.1f} seconds."
+        )
+
+        if self._error is not None:
+            raise self._error
+
+    def _push(self, task: Task):
+        """Adds the task to the ready queue, should be called under the condition."""
+        heapq.heappush(self._ready, (task.priority, next(self._counter), task))
+        self._condition.notify()
+
+    def _next(self) -> Optional[Task]:
+        """Waits for the next ready task, returns None if there is nothing left to do."""
+        with self._condition:
+            while True:
+                stopped = self._error is not None or not self.should_continue()
+                if stopped:
+                    return
+                if self._ready:
+                    self._running += 1
+                    return heapq.heappop(self._ready)[2]
+                if self._running == 0:
+                    # Nothing is ready and nothing is running, so nothing will become ready.
+                    return
+                self._condition.wait(timeout=1)
+
+    def _work(self, done_queue: Queue):
+        """Takes ready tasks and runs them, releases dependent tasks after each finished task."""
+        try:
+            while True:
+                task = self._next()
+                if task is None:
+                    return
+
+                try:
+                    task.result = task.func(*[dependency.result for dependency in task.deps])
+                except Exception as e:
+                    sly.logger.error(f"Task {task.name} of the {self.name} failed: {e}")
+                    with self._condition:
+                        self._running -= 1
+                        if self._error is None:
+                            self._error = e
+                        self._condition.notify_all()
+                    return
+
+                with self._condition:
+                    self._running -= 1
+                    self._finished += 1
+                    for dependent in task.dependents:
+                        dependent.waiting -= 1
+                        if dependent.waiting == 0:
+                            self._push(dependent)
+                    self._condition.notify_all()
+
+                done_queue.put(task)
+        finally:
+            done_queue.put(_END)
+
+
+class BandwidthLimiter:
+    """Thread-safe token bucket, which limits the number of bytes transferred per second.
+
+    :param bytes_per_second: maximum average rate, 0 for unlimited
+    :type bytes_per_second: int
+    """
+
+    def __init__(self, bytes_per_second: int):
+        self.bytes_per_second = bytes_per_second
+
+        self._available = float(bytes_per_second)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, size: int):
+        """Waits until the specified number of bytes can be transferred.
+
+        :param size: number of bytes which are going to be transferred
+        :type size: int
+        """
+        if self.bytes_per_second <= 0 or size <= 0:
+            return
+
+        with self._lock:
+            now = time.monotonic()
+            self._available = min(
+                self.bytes_per_second,
+                self._available + (now - self._updated) * self.bytes_per_second,
+            )
+            self._updated = now
+            # Bytes are reserved right away, the caller waits until the debt is paid off.
+            self._available -= size
+            delay = -self._available / self.bytes_per_second
+
+        if delay > 0:
+            time.sleep(delay)
+
+
+class PriorityPolicy:
+    """Calculates priorities of the work units for the scheduler. Units of the pinned projects
+    are always started first, the rest of the order depends on the policy:
+    PLAN_ORDER - units are started in the order of the plan;
+    SMALLEST_FIRST - units of the smallest datasets are started first, so most datasets
+    are finished early;
+    BYTE_BALANCED - units of different projects are interleaved by the number of bytes,
+    which were scheduled for each project before the unit, so all projects progress evenly.
+
+    :param policy: name of the policy, one of PRIORITY_POLICIES
+    :type policy: str
+    :param pinned_projects: names of the projects, which should be transferred first
+    :type pinned_projects: Iterable[str]
+    """
+
+    def __init__(self, policy: str, pinned_projects: Iterable[str] = ()):
+        if policy not in PRIORITY_POLICIES:
+            raise ValueError(
+                f"Unknown priority policy {policy}, expected one of {PRIORITY_POLICIES}."
+            )
+        self.policy = policy
+        self.pinned_projects = set(pinned_projects)
+
+        # Number of bytes, which were scheduled for each project.
+        self._scheduled = defaultdict(int)
+
+    def priority(self, project_name: str, dataset_size: int, unit_size: int) -> Tuple[int, int]:
+        """Returns priority of the next work unit of the project. Units should be passed
+        in the order of the plan.
+
+        :param project_name: name of the project
+        :type project_name: str
+        :param dataset_size: size of all images of the dataset in bytes
+        :type dataset_size: int
+        :param unit_size: size of the images of the unit in bytes
+        :type unit_size: int
+        :return: priority of the unit, lower is started first
+        :rtype: Tuple[int, int]
+        """
+        rank = 0 if project_name in self.pinned_projects else 1
+
+        if self.policy == SMALLEST_FIRST:
+            value = dataset_size
+        elif self.policy == BYTE_BALANCED:
+            value = self._scheduled[project_name]
+            self._scheduled[project_name] += unit_size
+        else:
+            value = 0
+
+        return rank, value
+
+
+class TransferEstimate:
+    """Estimates the remaining time of the transfer from the number of bytes, which are
+    already transferred. Before the first work unit is finished, the expected rate is used.
+
+    :param total_bytes: number of bytes, which are going to be transferred
+    :type total_bytes: int
+    :param expected_rate: expected number of bytes per second (e.g. from the previous run)
+    :type expected_rate: Optional[float]
+    """
+
+    def __init__(self, total_bytes: int, expected_rate: Optional[float] = None):
+        self.total_bytes = total_bytes
+        self.expected_rate = expected_rate
+        self.done_bytes = 0
+
+        self._started = time.monotonic()
+
+    def update(self, size: int):
+        """Adds the number of transferred bytes."""
+        self.done_bytes += size
+
+    def rate(self) -> Optional[float]:
+        """Returns the measured number of bytes per second or the expected one."""
+        elapsed = time.monotonic() - self._started
+        if self.done_bytes and elapsed > 0:
+            return self.done_bytes / elapsed
+        return self.expected_rate
+
+    def eta(self) -> Optional[float]:
+        """Returns the estimated number of seconds until the end of the transfer,
+        None if the rate is unknown."""
+        rate = self.rate()
+        if not rate:
+            return
+        return max(self.total_bytes - self.done_bytes, 0) / rate
@@ -12,6 +12,7 @@ from supervisely.app.widgets import (
 )
 
 import src.globals as g
+import src.engine as engine
 import src.ui.compare as compare
 import src.ui.update as update
 
@@ -87,14 +88,7 @@ def connect_to_target():
             g.STATE.instance = instance_select.get_value()
 
     try:
-        g.STATE.target_api = sly.Api(
-            server_address=g.STATE.instance,
-            token=g.STATE.target_api_key,
-            ignore_task_id=True,
-        )
-        g.STATE.target_api.team.get_info_by_name(g.DEFAULT_TEAM_NAME)
-        sly.logger.info("The connection to the Target API was successful.")
-
+        engine.connect_target(g.STATE.instance, g.STATE.target_api_key)
     except (ValueError, requests.exceptions.HTTPError):
         g.STATE.target_api_key = None
         sly.logger.warning("The connection to the Target API failed.")
@@ -125,6 +119,9 @@ def connect_to_target():
     check_key_button.hide()
     compare.card.unlock()
 
+    # Offering to resume the transfer, if it was interrupted by the restart of the app.
+    update.offer_resume()
+
 
 @change_instance_button.click
 def change_instance():
@@ -10,6 +10,8 @@ from supervisely.app.widgets import (
 import src.globals as g
 import src.ui.compare as compare
 
+from src.scheduler import BYTE_BALANCED, PLAN_ORDER, SMALLEST_FIRST
+
 # Field with checkbox for using default settings.
 default_settings_checkbox = Checkbox(content="Use default settings", checked=True)
 default_settings_field = Field(
@@ -45,21 +47,92 @@ tagged_images_checkbox = Checkbox(content="Filter by tag name")
 tag_name_input = Input(minlength=1, placeholder="Enter tag name")
 tag_name_input.hide()
 
+expression_checkbox = Checkbox(content="Filter by expression")
+filter_expression_input = Input(
+    minlength=1,
+    placeholder='class in ("car", "person") and objects["car"] >= 2 and width >= 1024',
+)
+filter_expression_input.hide()
+
 # Field with widgets for filtering images.
 filter_settings_field = Field(
     title="Filter images",
-    description="Images can be filtered by annotation types or by tag names.",
+    description=(
+        "Images can be filtered by annotation types, by tag names or by the expression. "
+        "Expression can use fields name, width, height, size, labels, meta.<key>, class, geometry, "
+        "tag, tag.<name>, objects, objects.<class>, combined with and, or, not. "
+        "If the expression is set, it's used instead of annotation types and tag name."
+    ),
     content=Container(
         [
             annotated_images_checkbox,
             annotation_type_select,
             tagged_images_checkbox,
             tag_name_input,
+            expression_checkbox,
+            filter_expression_input,
         ]
     ),
 )
 filter_settings_field.hide()
 
+# Field with checkbox for comparison without creating entities in the target instance.
+read_only_checkbox = Checkbox(content="Read-only comparison", checked=True)
+read_only_field = Field(
+    title="Read-only comparison",
+    description=(
+        "If checked, comparison doesn't create anything in the target instance. "
+        "Missing workspaces, projects and datasets will be created only if they have images to upload."
+    ),
+    content=read_only_checkbox,
+)
+
+# Field with checkbox for replacing target images, which content was changed.
+replace_changed_checkbox = Checkbox(content="Replace changed images")
+replace_changed_field = Field(
+    title="Replace changed images",
+    description=(
+        "If checked, images in the target dataset with the same names, but different content "
+        "will be replaced with the images from the source dataset. Otherwise they will be skipped."
+    ),
+    content=replace_changed_checkbox,
+)
+
+# Field with checkbox for validating annotations before the upload.
+validate_annotations_checkbox = Checkbox(
+    content="Validate annotations", checked=g.VALIDATE_ANNOTATIONS
+)
+validate_annotations_field = Field(
+    title="Validate annotations",
+    description=(
+        "If checked, annotations are checked against the project meta before the upload. "
+        "Otherwise they are uploaded as is, which is much faster for bitmap annotations."
+    ),
+    content=validate_annotations_checkbox,
+)
+
+# Field with widgets for the order of the transfer.
+transfer_policy_select = Select(
+    items=[
+        Select.Item(PLAN_ORDER, "Order of comparison"),
+        Select.Item(SMALLEST_FIRST, "Smallest datasets first"),
+        Select.Item(BYTE_BALANCED, "Interleave projects by size"),
+    ],
+)
+transfer_policy_select.set_value(g.TRANSFER_PRIORITY_POLICY)
+pinned_projects_input = Input(
+    value=", ".join(g.PINNED_PROJECTS), placeholder="Enter comma-separated project names"
+)
+transfer_order_field = Field(
+    title="Transfer order",
+    description=(
+        "Order in which the images are transferred. Smallest datasets first finishes most "
+        "datasets early, interleaving gives all projects the same share of the bandwidth. "
+        "Images of the listed projects are transferred before all other projects."
+    ),
+    content=Container([transfer_policy_select, pinned_projects_input]),
+)
+
 card = Card(
     title="2️⃣ Settings",
     description="Settings for data comparsion and update.",
@@ -68,6 +141,10 @@ card = Card(
             default_settings_field,
             filter_settings_field,
             normalize_metadata_field,
+            read_only_field,
+            replace_changed_field,
+            validate_annotations_field,
+            transfer_order_field,
         ]
     ),
 )
@@ -89,6 +166,7 @@ def default_settings(is_checked: bool):
         g.STATE.default_settings = True
         g.STATE.filter_by_annotation_type = True
         g.STATE.filter_by_tag_name = True
+        g.STATE.filter_by_expression = False
 
         compare.target_team_field.hide()
         compare.target_team_input.set_value(g.DEFAULT_TEAM_NAME)
@@ -100,6 +178,7 @@ def default_settings(is_checked: bool):
         g.STATE.default_settings = False
         g.STATE.filter_by_annotation_type = False
         g.STATE.filter_by_tag_name = False
+        g.STATE.filter_by_expression = False
 
         compare.target_team_field.show()
         compare.target_team_input.set_value("")
@@ -137,3 +216,53 @@ def tagged_filter(is_checked: bool):
     else:
         tag_name_input.hide()
         g.STATE.filter_by_tag_name = False
+
+
+@expression_checkbox.value_changed
+def expression_filter(is_checked: bool):
+    """Handles click on checkbox for filtering images by the expression. Shows or
+    hides the widget for entering the expression and changes global filter_by_expression
+    state.
+
+    :param is_checked: state of checkbox
+    :type is_checked: bool
+    """
+    if is_checked:
+        filter_expression_input.show()
+        g.STATE.filter_by_expression = True
+    else:
+        filter_expression_input.hide()
+        g.STATE.filter_by_expression = False
+
+
+@read_only_checkbox.value_changed
+def read_only_comparison(is_checked: bool):
+    """Handles click on checkbox for read-only comparison. Changes global
+    read_only_comparison state.
+
+    :param is_checked: state of checkbox
+    :type is_checked: bool
+    """
+    g.STATE.read_only_comparison = is_checked
+
+
+@replace_changed_checkbox.value_changed
+def replace_changed_images(is_checked: bool):
+    """Handles click on checkbox for replacing changed images. Changes global
+    replace_changed_images state.
+
+    :param is_checked: state of checkbox
+    :type is_checked: bool
+    """
+    g.STATE.replace_changed_images = is_checked
+
+
+@validate_annotations_checkbox.value_changed
+def validate_annotations(is_checked: bool):
+    """Handles click on checkbox for validating annotations. Changes global
+    validate_annotations state.
+
+    :param is_checked: state of checkbox
+    :type is_checked: bool
+    """
+    g.STATE.validate_annotations = is_checked
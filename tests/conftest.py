@@ -0,0 +1,14 @@
+import supervisely as sly
+
+
+def make_info(info_class, **values):
+    """Creates the info namedtuple of the SDK (e.g. sly.ImageInfo) with the values
+    of the fields, other fields are None."""
+    fields = {field: None for field in info_class._fields}
+    fields.update(values)
+    return info_class(**fields)
+
+
+def image_info(**values) -> sly.ImageInfo:
+    """Creates sly.ImageInfo with the values of the fields, other fields are None."""
+    return make_info(sly.ImageInfo, **values)
@@ -0,0 +1,86 @@
+import pytest
+import requests
+
+from src.api_factory import create_api
+from src.batching import BatchController
+
+
+class FakeSessions:
+    """Replaces the sessions of the threads, returns prepared responses."""
+
+    def __init__(self, *status_codes):
+        self.status_codes = list(status_codes)
+        self.calls = []
+
+    def request(self, method, url, **kwargs):
+        self.calls.append((method, url, kwargs))
+        response = requests.Response()
+        response.status_code = self.status_codes.pop(0)
+        response._content = b"{}"
+        response.url = url
+        return response
+
+
+def api_with(*status_codes):
+    api = create_api("https://example.invalid", "a" * 128, cache_ttl=0)
+    api.retry_sleep_sec = 0
+    api.sessions = FakeSessions(*status_codes)
+    return api
+
+
+def test_post_is_sent_to_public_api():
+    api = api_with(200)
+    api.additional_fields = {"context": 1}
+
+    api.post("projects.info", {"id": 5})
+
+    method, url, kwargs = api.sessions.calls[0]
+    assert method == "POST"
+    assert url == "https://example.invalid/public/api/v3/projects.info"
+    assert kwargs["json"] == {"id": 5, "context": 1}
+
+
+def test_get_is_sent_to_public_and_private_api():
+    api = api_with(200, 200)
+
+    api.get("images.info", {"id": 5})
+    api.get("status", {}, use_public_api=False)
+
+    assert [call[1] for call in api.sessions.calls] == [
+        "https://example.invalid/public/api/v3/images.info",
+        "https://example.invalid/status",
+    ]
+    assert api.sessions.calls[0][2]["params"] == {"id": 5}
+
+
+def test_transient_errors_are_retried():
+    api = api_with(503, 200)
+
+    response = api.post("projects.info", {"id": 5})
+
+    assert response.status_code == 200
+    assert len(api.sessions.calls) == 2
+
+
+def test_error_of_the_last_attempt_is_raised():
+    api = api_with(503, 503)
+
+    with pytest.raises(requests.exceptions.HTTPError) as error:
+        api.post("projects.info", {"id": 5}, retries=2)
+
+    assert error.value.response.status_code == 503
+    assert len(api.sessions.calls) == 2
+
+
+def test_requests_under_batch_controller_are_sent_once():
+    api = api_with(503, 200, 200)
+    batch_controller = BatchController("test", 8, retries=2, backoff=0)
+
+    results = batch_controller.run(
+        [5], lambda batch: [api.post("projects.info", {"id": batch[0]}).status_code]
+    )
+
+    # The first attempt of the API call fails and the controller retries it.
+    assert results == [200]
+    assert len(api.sessions.calls) == 2
+    assert batch_controller.metrics()["retries"] == 1
@@ -0,0 +1,144 @@
+import pytest
+import requests
+
+from src.batching import BatchController, inside_batch_call
+
+
+def http_error(status_code: int) -> requests.exceptions.HTTPError:
+    response = requests.Response()
+    response.status_code = status_code
+    return requests.exceptions.HTTPError(f"{status_code} Error", response=response)
+
+
+def controller(batch_size: int = 8, retries: int = 1) -> BatchController:
+    return BatchController("test", batch_size, retries=retries, backoff=0)
+
+
+def test_batches_are_limited_by_size():
+    calls = []
+
+    def process(batch):
+        calls.append(list(batch))
+        return [item * 10 for item in batch]
+
+    batch_controller = controller(batch_size=3)
+    # Fast calls grow the batch size, so it's fixed for the test.
+    batch_controller.max_size = 3
+    results = batch_controller.run(list(range(7)), process)
+
+    assert results == [item * 10 for item in range(7)]
+    assert calls == [[0, 1, 2], [3, 4, 5], [6]]
+
+
+def test_batches_are_limited_by_payload():
+    calls = []
+
+    def process(batch):
+        calls.append(list(batch))
+        return batch
+
+    batch_controller = controller()
+    batch_controller.max_bytes = 100
+    batch_controller.run([1, 2, 3, 4], process, sizes=[60, 30, 60, 200])
+
+    assert calls == [[1, 2], [3], [4]]
+
+
+def test_failed_item_is_isolated_by_splitting():
+    def process(batch):
+        if 5 in batch:
+            raise http_error(400)
+        return batch
+
+    batch_controller = controller()
+    results = batch_controller.run(list(range(8)), process)
+
+    assert results == [0, 1, 2, 3, 4, None, 6, 7]
+    assert batch_controller.metrics()["failed_items"] == 1
+
+
+def test_batch_size_is_kept_on_errors_of_the_items():
+    def process(batch):
+        if 5 in batch:
+            raise http_error(400)
+        return batch
+
+    batch_controller = controller()
+    batch_controller.run(list(range(8)), process)
+
+    assert batch_controller.batch_size == 8
+
+
+def test_batch_size_shrinks_on_transient_errors():
+    batch_controller = controller()
+    sizes = []
+
+    def process(batch):
+        sizes.append(batch_controller.batch_size)
+        if len(sizes) == 1:
+            raise http_error(503)
+        return batch
+
+    results = batch_controller.run(list(range(8)), process)
+
+    assert results == list(range(8))
+    # Batch size was halved before the retry.
+    assert sizes == [8, 4]
+
+
+def test_batch_size_shrinks_on_too_large_payload():
+    def process(batch):
+        if len(batch) > 2:
+            raise http_error(413)
+        return batch
+
+    batch_controller = controller()
+    results = batch_controller.run(list(range(8)), process)
+
+    assert results == list(range(8))
+    assert batch_controller.batch_size < 8
+
+
+def test_other_errors_are_raised():
+    def process(batch):
+        raise KeyError("bug")
+
+    batch_controller = controller()
+    with pytest.raises(KeyError):
+        batch_controller.run([1, 2, 3], process)
+    assert batch_controller.batch_size == 8
+
+
+def test_processed_items_are_not_sent_again():
+    processed = set()
+    calls = []
+
+    def process(batch):
+        calls.append(list(batch))
+        if len(calls) == 1:
+            # The first call adds part of the items and fails.
+            processed.update(batch[:2])
+            raise requests.exceptions.ConnectionError("Connection reset")
+        processed.update(batch)
+        return batch
+
+    def recover(batch):
+        return [item if item in processed else None for item in batch]
+
+    results = controller().run([1, 2, 3, 4], process, recover=recover)
+
+    assert results == [1, 2, 3, 4]
+    assert calls == [[1, 2, 3, 4], [3, 4]]
+
+
+def test_calls_of_the_function_are_marked():
+    marks = []
+
+    def process(batch):
+        marks.append(inside_batch_call())
+        return batch
+
+    controller().run([1, 2, 3], process)
+
+    assert marks == [True]
+    assert not inside_batch_call()
@@ -0,0 +1,49 @@
+from src.diff import diff_images, same_content
+from tests.conftest import image_info
+
+
+def image(image_id: int, name: str, image_hash: str = None, size: int = 100):
+    return image_info(id=image_id, name=name, hash=image_hash, size=size)
+
+
+def test_diff_buckets():
+    source_images = [
+        image(1, "new.jpg", "h1"),
+        image(2, "same.jpg", "h2"),
+        image(3, "changed.jpg", "h3"),
+        image(4, "renamed.jpg", "h4"),
+    ]
+    target_images = [
+        image(11, "same.jpg", "h2"),
+        image(12, "changed.jpg", "old"),
+        image(13, "other_name.jpg", "h4"),
+    ]
+
+    diff = diff_images(source_images, target_images)
+
+    assert [img.id for img in diff.new] == [1]
+    assert [img.id for img in diff.identical] == [2]
+    assert [img.id for img in diff.changed] == [3]
+    assert [img.id for img in diff.renamed] == [4]
+    assert diff.changed_targets == {"changed.jpg": 12}
+
+
+def test_diff_of_empty_target():
+    source_images = [image(1, "a.jpg", "h1"), image(2, "b.jpg", "h2")]
+
+    diff = diff_images(source_images, [])
+
+    assert diff.new == source_images
+    assert not diff.identical and not diff.changed and not diff.renamed
+
+
+def test_images_without_hash_are_compared_by_size():
+    assert same_content(image(1, "a.jpg", size=10), image(2, "a.jpg", "h", size=10))
+    assert not same_content(image(1, "a.jpg", size=10), image(2, "a.jpg", size=20))
+
+
+def test_images_without_hash_are_not_renamed():
+    diff = diff_images([image(1, "a.jpg")], [image(2, "b.jpg")])
+
+    assert [img.id for img in diff.new] == [1]
+    assert not diff.renamed
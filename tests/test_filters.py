@@ -0,0 +1,94 @@
+import pytest
+
+from src.filters import FilterError, compile_filter
+from tests.conftest import image_info
+
+
+def image(**values):
+    fields = dict(name="image.jpg", width=1024, height=768, size=1000, labels_count=3)
+    return image_info(**{**fields, **values})
+
+
+def annotation(objects=(), tags=()) -> dict:
+    return {
+        "objects": [
+            {"classTitle": class_title, "geometryType": geometry}
+            for class_title, geometry in objects
+        ],
+        "tags": list(tags),
+    }
+
+
+ANNOTATION = annotation(
+    objects=[("car", "bitmap"), ("car", "rectangle"), ("person", "polygon")],
+    tags=[{"name": "inference"}, {"name": "score", "value": 0.9}],
+)
+
+
+@pytest.mark.parametrize(
+    "expression, expected",
+    [
+        ('class == "car"', True),
+        ('class != "car"', False),
+        ('class in ("dog", "person")', True),
+        ('class not in ("dog", "cat")', True),
+        ('geometry == "bitmap"', True),
+        ('objects["car"] >= 2', True),
+        ("objects.person > 1", False),
+        ("objects == 3", True),
+        ("tag.score > 0.5", True),
+        ('tag["score"] == 0.9', True),
+        ('tag == "inference"', True),
+        ("width >= 1024 and height < 768", False),
+        ("width >= 1024 or height < 768", True),
+        ('not (class == "dog")', True),
+        ('meta.license == "CC0"', True),
+        ('name == "image.jpg" and labels == 3', True),
+    ],
+)
+def test_expression_evaluation(expression, expected):
+    image_filter = compile_filter(expression)
+    assert image_filter.matches(image(meta={"license": "CC0"}), ANNOTATION) is expected
+
+
+def test_tag_without_value_is_not_missing():
+    assert compile_filter("tag.inference == null").matches(image(), ANNOTATION)
+    assert not compile_filter("tag.inference != null").matches(image(), ANNOTATION)
+
+
+def test_missing_tag_matches_only_negative_comparisons():
+    assert not compile_filter("tag.missing == null").matches(image(), ANNOTATION)
+    assert compile_filter("tag.missing != null").matches(image(), ANNOTATION)
+    assert compile_filter('tag.missing not in ("a", "b")').matches(image(), ANNOTATION)
+    assert not compile_filter("tag.missing > 0").matches(image(), ANNOTATION)
+
+
+def test_values_of_different_types_do_not_match():
+    assert not compile_filter('width > "big"').matches(image(), ANNOTATION)
+
+
+def test_listing_fields_are_checked_without_annotation():
+    image_filter = compile_filter("width >= 1024")
+
+    assert not image_filter.needs_annotation
+    assert image_filter.matches_listing(image()) is True
+    assert image_filter.matches_listing(image(width=100)) is False
+
+
+def test_annotation_fields_are_unknown_without_annotation():
+    image_filter = compile_filter('width >= 1024 and class == "car"')
+
+    assert image_filter.needs_annotation
+    assert image_filter.matches_listing(image()) is None
+    # Result is known if the listing fields already don't match.
+    assert image_filter.matches_listing(image(width=100)) is False
+    assert compile_filter('width >= 1024 or class == "car"').matches_listing(image())
+
+
+@pytest.mark.parametrize(
+    "expression",
+    ["width >", "class ~ 1", "unknown == 1", '(class == "car"', "class > 1", "width == 1 and"],
+)
+def test_invalid_expressions(expression):
+    with pytest.raises(FilterError):
+        compile_filter(expression)
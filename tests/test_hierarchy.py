@@ -0,0 +1,20 @@
+from unittest import mock
+
+import supervisely as sly
+
+from src.hierarchy import HierarchyIndex
+from tests.conftest import make_info
+
+
+def test_workspaces_of_the_found_team_are_listed():
+    api = mock.Mock()
+    api.workspace.get_list.return_value = [make_info(sly.WorkspaceInfo, id=7, name="ws")]
+
+    # Team was not found when the index was built (e.g. after read-only comparison).
+    index = HierarchyIndex(api, None)
+    assert index.workspace("ws") is None
+
+    index.set_team(3)
+
+    assert index.workspace("ws").id == 7
+    api.workspace.get_list.assert_called_once_with(3)
@@ -0,0 +1,76 @@
+import os
+
+import supervisely as sly
+
+from src.plan import (
+    PlanWriter,
+    index_path,
+    load_index,
+    read_dataset,
+    read_plan,
+)
+from tests.conftest import image_info, make_info
+
+
+def differences(dataset_id: int, image_ids: list) -> dict:
+    images = [
+        image_info(id=image_id, name=f"{image_id}.jpg", hash=f"h{image_id}", size=10)
+        for image_id in image_ids
+    ]
+    return {
+        "source": make_info(sly.DatasetInfo, id=dataset_id, project_id=1),
+        "target": None,
+        "create_target": True,
+        "annotated_images": images,
+        "tagged_images": [],
+    }
+
+
+def write_plan(path: str):
+    with PlanWriter(path) as plan_writer:
+        plan_writer.write("ws", "project", "first", differences(10, [1, 2]))
+        plan_writer.write("ws", "project", "second", differences(20, [3]))
+
+
+def test_datasets_are_read_by_offsets(tmp_path):
+    path = str(tmp_path / "plan.jsonl")
+    write_plan(path)
+
+    index = load_index(path)
+
+    assert [entry[:3] for entry in index] == [
+        ("ws", "project", "first"),
+        ("ws", "project", "second"),
+    ]
+    record = read_dataset(path, index[1][3])
+    assert record["source_id"] == 20
+    assert record["annotated_images"]["ids"] == [3]
+    assert record["annotated_images"]["names"] == ["3.jpg"]
+
+
+def test_index_is_rebuilt_if_missing(tmp_path):
+    path = str(tmp_path / "plan.jsonl")
+    write_plan(path)
+    saved_index = load_index(path)
+
+    # Index is not saved if the comparison was interrupted.
+    os.remove(index_path(path))
+
+    assert load_index(path) == saved_index
+    for (_, _, dataset_name, offset), (_, _, _, record) in zip(
+        load_index(path), read_plan(path)
+    ):
+        assert read_dataset(path, offset) == record
+        assert record["dataset"] == dataset_name
+
+
+def test_index_of_previous_plan_is_replaced(tmp_path):
+    path = str(tmp_path / "plan.jsonl")
+    write_plan(path)
+
+    with PlanWriter(path) as plan_writer:
+        plan_writer.write("ws", "project", "third", differences(30, [4]))
+
+    index = load_index(path)
+    assert [entry[2] for entry in index] == ["third"]
+    assert read_dataset(path, index[0][3])["source_id"] == 30
@@ -0,0 +1,118 @@
+import threading
+
+import pytest
+
+from src.scheduler import Scheduler
+
+
+def test_tasks_receive_results_of_dependencies():
+    scheduler = Scheduler(workers=4)
+    first = scheduler.add("first", lambda: 1)
+    second = scheduler.add("second", lambda: 2)
+    total = scheduler.add("total", lambda a, b: a + b, deps=[first, second])
+    scheduler.add("double", lambda value: value * 2, deps=[total, None])
+
+    scheduler.run()
+
+    assert [task.result for task in scheduler.tasks] == [1, 2, 3, 6]
+
+
+def test_dependencies_are_finished_first():
+    order = []
+    lock = threading.Lock()
+
+    def record(name):
+        def run(*results):
+            with lock:
+                order.append(name)
+
+        return run
+
+    scheduler = Scheduler(workers=4)
+    project = scheduler.add("project", record("project"))
+    datasets = [
+        scheduler.add(f"dataset {idx}", record(f"dataset {idx}"), deps=[project])
+        for idx in range(3)
+    ]
+    scheduler.add("finish", record("finish"), deps=datasets)
+
+    scheduler.run()
+
+    assert order[0] == "project"
+    assert order[-1] == "finish"
+    assert sorted(order[1:-1]) == ["dataset 0", "dataset 1", "dataset 2"]
+
+
+def test_ready_tasks_are_started_by_priority():
+    order = []
+    scheduler = Scheduler(workers=1)
+    for name, priority in [("low", (2,)), ("high", (0,)), ("middle", (1,))]:
+        scheduler.add(name, lambda name=name: order.append(name), priority=priority)
+
+    scheduler.run()
+
+    assert order == ["high", "middle", "low"]
+
+
+def test_error_stops_the_scheduler():
+    started = []
+    scheduler = Scheduler(workers=1)
+
+    def fail():
+        raise RuntimeError("failed")
+
+    failed = scheduler.add("fail", fail, priority=(0,))
+    scheduler.add("dependent", lambda result: started.append("dependent"), deps=[failed])
+    scheduler.add("other", lambda: started.append("other"), priority=(1,))
+
+    with pytest.raises(RuntimeError, match="failed"):
+        scheduler.run()
+
+    # Dependent task is never started and no new tasks are started after the error.
+    assert started == []
+
+
+def test_finished_tasks_are_reported():
+    scheduler = Scheduler(workers=2)
+    first = scheduler.add("first", lambda: None, kind="unit")
+    scheduler.add("second", lambda result: None, deps=[first], kind="dataset")
+    done = []
+
+    scheduler.run(lambda task: done.append(task.name))
+
+    assert done == ["first", "second"]
+    assert scheduler.count("dataset") == 1
+
+
+def test_stopped_scheduler_does_not_start_tasks():
+    started = []
+    scheduler = Scheduler(workers=2, should_continue=lambda: False)
+    scheduler.add("task", lambda: started.append("task"))
+
+    scheduler.run()
+
+    assert started == []
+
+
+def test_priorities_are_propagated_to_dependencies():
+    scheduler = Scheduler(workers=1)
+    project = scheduler.add("project", lambda: None)
+    meta = scheduler.add("meta", lambda result: None, deps=[project])
+    dataset = scheduler.add("dataset", lambda result: None, deps=[project])
+    first_unit = scheduler.add(
+        "unit 1", lambda *results: None, deps=[dataset, meta], priority=(1, 5)
+    )
+    second_unit = scheduler.add(
+        "unit 2", lambda *results: None, deps=[dataset, meta], priority=(0, 1)
+    )
+    # Final task of the dataset has no priority and doesn't lower the priority of the dataset.
+    finish = scheduler.add(
+        "finish", lambda *results: None, deps=[dataset, first_unit, second_unit]
+    )
+
+    scheduler.propagate_priorities()
+
+    assert dataset.priority == (0, 1)
+    assert meta.priority == (0, 1)
+    assert project.priority == (0, 1)
+    assert finish.priority == ()